@@ -1,13 +1,145 @@
-from django.contrib import admin
-from .models import Employee, UserProfile
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.views.main import ALL_VAR, IS_POPUP_VAR, ORDER_VAR, PAGE_VAR, TO_FIELD_VAR
+from django.db.models import Q
+from django.template.response import TemplateResponse
+from . import analytics, audit, lookups
+from .bulk import bulk_delete, bulk_update
+from .constants import EmployeeConstants
+from .forms import BulkUpdateForm
+from .models import Department, Employee, EmployeeHistory, Position, UserProfile
+from .pagination import CappedCountPaginator
+from .search import search_filter
+
+class LookupFieldListFilter(admin.RelatedFieldListFilter):
+    """Department or position filter whose choices come from memory rather than a query."""
+
+    def field_choices(self, field, request, model_admin):
+        return [(obj.pk, obj.name) for obj in lookups.TABLES[field.name].all()]
+
 
 @admin.register(Employee)
 class EmployeeAdmin(admin.ModelAdmin):
-    list_display = ('employee_id', 'name', 'department', 'position', 'salary', 'hire_date', 'email')
+    """
+    Employees; every changelist query is served by an index or memory.
+
+    Only indexed columns are sortable, search goes through the FTS5 index
+    and filter choices come from memory. The number of matches is read
+    from EmployeeStats when only the department and position filters are
+    used; otherwise counting stops at ADMIN_COUNT_LIMIT rows.
+    """
+    list_display = ('employee_id', 'name', 'department_name', 'position_name', 'salary', 'hire_date', 'email',
+                    'created_by', 'updated_by')
+    list_select_related = ('created_by', 'updated_by')
     search_fields = ('employee_id', 'name', 'email')
-    list_filter = ('department', 'position')
+    list_filter = (('department', LookupFieldListFilter), ('position', LookupFieldListFilter))
+    ordering = ('-created_at', '-id')
+    sortable_by = ('employee_id', 'salary', 'hire_date', 'email')
+    paginator = CappedCountPaginator
+    show_full_result_count = False
+    actions = ['bulk_update_selected']
+
+    # Changelist parameters -> the EmployeeStats column they filter on
+    COUNTED_FILTERS = {'department__id__exact': 'department', 'position__id__exact': 'position'}
+    IGNORED_PARAMS = (ALL_VAR, ORDER_VAR, PAGE_VAR, IS_POPUP_VAR, TO_FIELD_VAR)
+
+    def summary_count(self, request):
+        """Number of employees the changelist shows, from EmployeeStats, or None if it depends on more than the lookup filters."""
+        filters = {}
+        for param, value in request.GET.items():
+            if param in self.IGNORED_PARAMS:
+                continue
+            if param not in self.COUNTED_FILTERS or not value.isdigit():
+                return None
+            filters[self.COUNTED_FILTERS[param]] = int(value)
+        return analytics.headcount(**filters)
+
+    def get_queryset(self, request):
+        # The changelist orders by the sorted column, then by -pk; the default
+        # ordering in between would keep the (column, id) indexes from serving it
+        return super().get_queryset(request).order_by()
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return self.paginator(queryset, per_page, orphans, allow_empty_first_page,
+                              count=self.summary_count(request), count_limit=settings.ADMIN_COUNT_LIMIT)
+
+    def bulk_update_selected(self, request, queryset):
+        """Change department, position or salary of the selected employees in one UPDATE."""
+        form = BulkUpdateForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            count = bulk_update(queryset, request.user, **form.cleaned_data)
+            self.message_user(request, EmployeeConstants.MSG_BULK_UPDATE_SUCCESS % count, messages.SUCCESS)
+            return None
+        return TemplateResponse(request, 'admin/employees/employee/bulk_update.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Update selected employees',
+            'opts': self.model._meta,
+            'form': form,
+            'queryset': queryset,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+        })
+    bulk_update_selected.short_description = 'Update selected employees'
+
+    def department_name(self, obj):
+        return lookups.name_of('department', obj.department_id)
+    department_name.short_description = 'Department'
+
+    def position_name(self, obj):
+        return lookups.name_of('position', obj.position_id)
+    position_name.short_description = 'Position'
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change:
+            # form.initial holds the values from before the edit
+            audit.record_update(obj, audit.snapshot(form.initial), request.user)
+
+    def delete_model(self, request, obj):
+        audit.record_delete(obj, request.user)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        """Delete the selected employees with a single DELETE statement."""
+        bulk_delete(queryset, request.user)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Search through the FTS5 index instead of LIKE '%term%' scans."""
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        queryset = queryset.filter(
+            search_filter(search_term) | Q(employee_id=search_term)
+        )
+        return queryset, False
+
+@admin.register(Department, Position)
+class LookupAdmin(admin.ModelAdmin):
+    """Departments and positions; employees are assigned to existing ones only."""
+    list_display = ('name',)
+    search_fields = ('name',)
     ordering = ('name',)
 
+@admin.register(EmployeeHistory)
+class EmployeeHistoryAdmin(admin.ModelAdmin):
+    """Read-only view of the employee change history."""
+    list_display = ('changed_at', 'employee_code', 'action', 'changed_by', 'changes')
+    list_filter = ('action',)
+    search_fields = ('=employee_code',)
+    list_select_related = ('changed_by',)
+    ordering = ('-changed_at', '-id')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'name', 'emp_id')
@@ -0,0 +1,166 @@
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.db.models import Max, Min, Sum
+
+from . import lookups
+from .models import EmployeeStats, HiringStats
+
+CENTS = Decimal('0.01')
+
+REFRESH_MINMAX_SQL = """
+    UPDATE employee_stats SET
+        min_salary = (SELECT MIN(e.salary) FROM employees_employee e
+                      WHERE e.department_id = employee_stats.department_id
+                        AND e.position_id = employee_stats.position_id),
+        max_salary = (SELECT MAX(e.salary) FROM employees_employee e
+                      WHERE e.department_id = employee_stats.department_id
+                        AND e.position_id = employee_stats.position_id),
+        minmax_stale = 0
+    WHERE minmax_stale = 1
+"""
+
+EXPECTED_STATS_SQL = """
+    SELECT department_id, position_id, COUNT(*), SUM(CAST(ROUND(salary * 100) AS INTEGER)),
+           MIN(salary), MAX(salary)
+    FROM employees_employee GROUP BY department_id, position_id
+"""
+
+EXPECTED_HIRING_SQL = """
+    SELECT strftime('%Y-%m', hire_date), department_id, COUNT(*)
+    FROM employees_employee GROUP BY 1, department_id
+"""
+
+
+def _cents_to_decimal(cents):
+    return (Decimal(cents or 0) / 100).quantize(CENTS)
+
+
+def _salary(value):
+    return None if value is None else Decimal(str(value)).quantize(CENTS)
+
+
+def refresh_stale_minmax():
+    """
+    Recompute min/max salary for the groups whose extreme value left the group.
+
+    Runs on the primary database; returns the number of refreshed groups.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(REFRESH_MINMAX_SQL)
+        return cursor.rowcount
+
+
+def _with_averages(rows):
+    for row in lookups.name_values(list(rows)):
+        row['salary_total'] = _cents_to_decimal(row.pop('salary_total_cents'))
+        row['avg_salary'] = (
+            (row['salary_total'] / row['headcount']).quantize(CENTS) if row['headcount'] else None
+        )
+        yield row
+
+
+def fresh_stats():
+    """
+    EmployeeStats after refreshing stale min/max values.
+
+    Pass the result to both summaries to refresh only once per page.
+
+    Only writes when a group is flagged stale, so a clean read stays a plain
+    SELECT that the replica can serve. Once stale groups were seen, read from
+    the primary, which has the refreshed values the replica cannot have yet.
+    """
+    if not EmployeeStats.objects.filter(minmax_stale=True).exists():
+        return EmployeeStats.objects.all()
+    refresh_stale_minmax()
+    return EmployeeStats.objects.using(DEFAULT_DB_ALIAS)
+
+
+def department_summary(stats=None):
+    rows = (stats if stats is not None else fresh_stats()).values('department').annotate(
+        headcount=Sum('headcount'),
+        salary_total_cents=Sum('salary_total_cents'),
+        min_salary=Min('min_salary'),
+        max_salary=Max('max_salary'),
+    ).order_by()
+    return sorted(_with_averages(rows), key=lambda row: row['department'] or '')
+
+
+def position_summary(stats=None):
+    rows = (stats if stats is not None else fresh_stats()).values(
+        'department', 'position', 'headcount', 'salary_total_cents', 'min_salary', 'max_salary'
+    )
+    return sorted(_with_averages(rows), key=lambda row: (row['department'] or '', row['position'] or ''))
+
+
+def headcount(department=None, position=None):
+    """Number of employees, of one department and/or position when given (ids), summed from EmployeeStats."""
+    stats = EmployeeStats.objects.all()
+    if department is not None:
+        stats = stats.filter(department_id=department)
+    if position is not None:
+        stats = stats.filter(position_id=position)
+    return stats.aggregate(total=Sum('headcount'))['total'] or 0
+
+
+def hiring_trend(months=24):
+    """Hires per month over the most recent ``months`` months with hires, oldest first."""
+    rows = list(
+        HiringStats.objects.values('month').annotate(hires=Sum('hires')).order_by('-month')[:months]
+    )
+    rows.reverse()
+    return rows
+
+
+def _expected():
+    with connection.cursor() as cursor:
+        cursor.execute(EXPECTED_STATS_SQL)
+        stats = {
+            (dept, pos): (count, cents, _salary(low), _salary(high))
+            for dept, pos, count, cents, low, high in cursor.fetchall()
+        }
+        cursor.execute(EXPECTED_HIRING_SQL)
+        hiring = {(month, dept): count for month, dept, count in cursor.fetchall()}
+    return stats, hiring
+
+
+def find_drift():
+    """
+    Compare the summary tables with a full GROUP BY over Employee.
+
+    Returns a list of human readable differences; empty when in sync.
+    """
+    refresh_stale_minmax()
+    expected_stats, expected_hiring = _expected()
+    actual_stats = {
+        (s.department_id, s.position_id): (s.headcount, s.salary_total_cents,
+                                     _salary(s.min_salary), _salary(s.max_salary))
+        for s in EmployeeStats.objects.all()
+    }
+    actual_hiring = {(h.month, h.department_id): h.hires for h in HiringStats.objects.all()}
+
+    drift = []
+    for label, expected, actual in (('stats', expected_stats, actual_stats),
+                                    ('hiring', expected_hiring, actual_hiring)):
+        for key in sorted(set(expected) | set(actual)):
+            if expected.get(key) != actual.get(key):
+                drift.append('%s %s: expected %s, found %s' % (
+                    label, ' / '.join(str(part) for part in key), expected.get(key), actual.get(key)
+                ))
+    return drift
+
+
+def rebuild():
+    """Recompute both summary tables from scratch."""
+    with transaction.atomic():
+        EmployeeStats.objects.all().delete()
+        HiringStats.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO employee_stats(department_id, position_id, headcount, salary_total_cents, '
+                'min_salary, max_salary, minmax_stale) '
+                'SELECT *, 0 FROM (%s)' % EXPECTED_STATS_SQL
+            )
+            cursor.execute(
+                'INSERT INTO employee_hiring_stats(month, department_id, hires) %s' % EXPECTED_HIRING_SQL
+            )
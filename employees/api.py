@@ -0,0 +1,239 @@
+import datetime
+import hashlib
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+
+from . import jobs, lookups
+from .caching import get_last_modified, get_version
+from .constants import EmployeeConstants
+from .feed import changes_after, seq_before
+from .forms import EmployeeFilterForm
+from .metrics import query_budget
+from .models import Employee
+from .offload import async_view
+from .pagination import InvalidCursor, KeysetPaginator
+from .search import search_employee_ids
+
+API_FIELDS = (
+    'id', 'employee_id', 'name', 'department', 'position', 'salary', 'email',
+    'hire_date', 'created_at', 'updated_at',
+)
+
+
+class InvalidFields(ValueError):
+    """Raised when ``fields=`` names a field the API does not expose."""
+
+
+def api_error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def api_login_required(view):
+    """Like login_required, but answers 401 instead of redirecting to a login page."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return api_error('Authentication required.', status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def get_fields(request):
+    """Return the fields selected with ``?fields=a,b``, or every API field."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return API_FIELDS
+    fields = tuple(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in API_FIELDS]
+    if unknown or not fields:
+        raise InvalidFields('Unknown fields: %s' % ', '.join(unknown))
+    return fields
+
+
+def select(queryset, fields, extra=()):
+    """``.values()`` of ``fields`` plus any ``extra`` columns needed internally."""
+    return queryset.values(*dict.fromkeys(fields + tuple(extra)))
+
+
+def trim(rows, fields):
+    """Drop the internal-only columns added by ``select()`` and name departments and positions."""
+    rows = lookups.name_values(list(rows))
+    if not rows or len(rows[0]) == len(fields):
+        return rows
+    return [{f: row[f] for f in fields} for row in rows]
+
+
+def json_response(data):
+    return JsonResponse(data, encoder=DjangoJSONEncoder, json_dumps_params={'separators': (',', ':')})
+
+
+def _etag(*parts):
+    return '"%s"' % hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+
+
+def _collection_etag(request, *args, **kwargs):
+    return _etag('collection', get_version(), request.get_full_path())
+
+
+def _collection_last_modified(request, *args, **kwargs):
+    return get_last_modified()
+
+
+def _detail_updated_at(request, pk):
+    memo = request.__dict__.setdefault('_api_updated_at', {})
+    if pk not in memo:
+        memo[pk] = Employee.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+    return memo[pk]
+
+
+def _detail_etag(request, pk):
+    updated_at = _detail_updated_at(request, pk)
+    if updated_at is None:
+        return None
+    return _etag('detail', pk, updated_at.isoformat(), request.GET.get('fields', ''))
+
+
+def _detail_last_modified(request, pk):
+    return _detail_updated_at(request, pk)
+
+
+@query_budget(3)
+@async_view
+@require_GET
+@api_login_required
+@condition(etag_func=_collection_etag, last_modified_func=_collection_last_modified)
+@cache_control(private=True, no_cache=True)
+def employee_list(request):
+    """API view listing employees with keyset pagination, filters and field selection."""
+    filter_form = EmployeeFilterForm(request.GET)
+    if not filter_form.is_valid():
+        return api_error(filter_form.errors.get_json_data())
+    try:
+        fields = get_fields(request)
+    except InvalidFields as e:
+        return api_error(str(e))
+
+    sort = filter_form.get_sort()
+    paginator = KeysetPaginator(
+        select(filter_form.filter_queryset(Employee.objects.all()), fields, ('id', sort.lstrip('-'))),
+        ordering=sort,
+        page_size=EmployeeConstants.API_PAGE_SIZE
+    )
+    try:
+        page = paginator.get_page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return api_error('Invalid cursor.')
+    return json_response({
+        'results': trim(page.object_list, fields),
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    })
+
+
+@query_budget(4)
+@async_view
+@require_GET
+@api_login_required
+@condition(etag_func=_detail_etag, last_modified_func=_detail_last_modified)
+@cache_control(private=True, no_cache=True)
+def employee_detail(request, pk):
+    """API view returning a single employee."""
+    try:
+        fields = get_fields(request)
+    except InvalidFields as e:
+        return api_error(str(e))
+    row = select(Employee.objects.filter(pk=pk), fields).first()
+    if row is None:
+        return api_error(EmployeeConstants.MSG_NOT_FOUND, status=404)
+    return json_response(lookups.name_values([row])[0])
+
+
+@query_budget(4)
+@async_view
+@require_GET
+@api_login_required
+@condition(etag_func=_collection_etag, last_modified_func=_collection_last_modified)
+@cache_control(private=True, no_cache=True)
+def employee_search(request):
+    """API view returning ranked full-text search matches."""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return api_error('The q parameter is required.')
+    try:
+        fields = get_fields(request)
+    except InvalidFields as e:
+        return api_error(str(e))
+
+    ids = search_employee_ids(query, limit=EmployeeConstants.API_PAGE_SIZE)
+    rows = {row['id']: row for row in select(Employee.objects.filter(pk__in=ids).order_by(), fields, ('id',))}
+    ranked = [rows[pk] for pk in ids if pk in rows]
+    return json_response({'results': trim(ranked, fields)})
+
+
+@query_budget(5)
+@async_view
+@require_GET
+@api_login_required
+@cache_control(private=True, no_cache=True)
+def employee_changes(request):
+    """
+    API change feed: employees created, updated or deleted after ``cursor``, oldest change first.
+
+    Start with ``?since=<ISO datetime>`` (or no parameter for everything),
+    then pass back ``next_cursor`` until ``has_more`` is false; keep the
+    last ``next_cursor`` for the next sync.
+    """
+    try:
+        fields = get_fields(request)
+    except InvalidFields as e:
+        return api_error(str(e))
+    try:
+        limit = int(request.GET.get('limit', EmployeeConstants.CHANGE_FEED_PAGE_SIZE))
+    except ValueError:
+        return api_error('Invalid limit.')
+    limit = max(1, min(limit, EmployeeConstants.CHANGE_FEED_PAGE_SIZE))
+
+    cursor = request.GET.get('cursor')
+    since = request.GET.get('since')
+    if cursor:
+        if not cursor.isdigit():
+            return api_error('Invalid cursor.')
+        seq = int(cursor)
+    elif since:
+        try:
+            since = parse_datetime(since)
+        except ValueError:
+            since = None
+        if since is None:
+            return api_error('Invalid since, expected an ISO 8601 datetime.')
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since, datetime.timezone.utc)
+        seq = seq_before(since)
+    else:
+        seq = 0
+
+    changes, next_seq, has_more = changes_after(seq, limit, fields)
+    return json_response({
+        'results': changes,
+        'next_cursor': str(next_seq),
+        'has_more': has_more,
+    })
+
+
+@query_budget(3)
+@async_view
+@require_GET
+@api_login_required
+@cache_control(private=True, no_cache=True)
+def job_status(request, pk):
+    """API view returning the status and progress of a background job, for polling."""
+    job = jobs.for_user(request.user).filter(pk=pk).first()
+    if job is None:
+        return api_error('Job not found.', status=404)
+    return json_response(jobs.describe(job))
@@ -0,0 +1,125 @@
+"""
+Change history of employees.
+
+Callers record what they changed with ``record_update()``,
+``record_delete()`` or ``record()``. Inside a ``batch()`` block the
+entries are buffered and written with a single ``bulk_create`` when the
+block ends, so a view or a bulk operation adds at most one INSERT to its
+transaction however many employees it touches. Outside of a batch each
+call writes its entries at once.
+"""
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from . import lookups
+from .models import Employee, EmployeeHistory
+
+AUDITED_FIELDS = ('employee_id', 'name', 'department', 'position', 'salary', 'email', 'hire_date')
+ATTNAMES = {field: Employee._meta.get_field(field).attname for field in AUDITED_FIELDS}
+CENT = Decimal('0.01')
+
+_pending = ContextVar('employees_audit_pending', default=None)
+
+
+@contextmanager
+def batch():
+    """
+    Buffer the history entries recorded in the block and write them when it ends.
+
+    Open it inside the transaction of the changes, so that they commit (or
+    roll back) together. Nested blocks write with the outermost one.
+    """
+    if _pending.get() is not None:
+        yield
+        return
+    entries = []
+    token = _pending.set(entries)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    if entries:
+        EmployeeHistory.objects.bulk_create(entries)
+
+
+def _normalize(field, value):
+    if field in lookups.TABLES:
+        # Departments and positions are recorded by name (rows hold ids, changes instances)
+        return lookups.name_of(field, value)
+    if isinstance(value, Decimal):
+        # Computed salaries come back from SQLite with float noise
+        return value.quantize(CENT)
+    return value
+
+
+def snapshot(obj):
+    """Audited field values of an employee, or of a ``values()`` row."""
+    if isinstance(obj, dict):
+        return {field: _normalize(field, obj[field]) for field in AUDITED_FIELDS if field in obj}
+    # Foreign keys are read by id, which runs no query
+    return {field: _normalize(field, getattr(obj, ATTNAMES[field])) for field in AUDITED_FIELDS}
+
+
+def diff(before, after):
+    """``{field: [old, new]}`` for each field whose value differs between two ``snapshot()``s."""
+    return {
+        field: [before.get(field), value]
+        for field, value in after.items()
+        if before.get(field) != value
+    }
+
+
+def make_entry(employee_pk, employee_code, action, changes, user=None):
+    salary = changes.get('salary')
+    return EmployeeHistory(
+        employee_id=employee_pk,
+        employee_code=employee_code,
+        action=action,
+        changes=json.dumps(changes, cls=DjangoJSONEncoder, separators=(',', ':')),
+        salary=salary[1] if salary else None,
+        changed_by=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def record(entries):
+    """Write ``entries`` now, or with the enclosing ``batch()``."""
+    pending = _pending.get()
+    if pending is not None:
+        pending.extend(entries)
+    elif entries:
+        EmployeeHistory.objects.bulk_create(entries)
+
+
+def record_update(employee, before, user=None):
+    """Record the changes made to ``employee`` since ``before`` (a ``snapshot()``), if any."""
+    changes = diff(before, snapshot(employee))
+    if changes:
+        record([make_entry(employee.pk, employee.employee_id, EmployeeHistory.ACTION_UPDATE, changes, user)])
+
+
+def deletion_entry(obj, user=None):
+    """Entry recording the deletion of an employee (or ``values()`` row) with its last values."""
+    changes = {field: [value, None] for field, value in snapshot(obj).items()}
+    pk = obj['pk'] if isinstance(obj, dict) else obj.pk
+    return make_entry(pk, changes['employee_id'][0], EmployeeHistory.ACTION_DELETE, changes, user)
+
+
+def record_delete(employee, user=None):
+    """Record the deletion of ``employee``."""
+    record([deletion_entry(employee, user)])
+
+
+def timeline(employee_pk):
+    """History entries of an employee, newest first."""
+    return (EmployeeHistory.objects.filter(employee_id=employee_pk)
+            .select_related('changed_by').order_by('-changed_at', '-id'))
+
+
+def salary_history(employee_pk):
+    """``(changed_at, salary)`` of each salary change of an employee, newest first."""
+    return (EmployeeHistory.objects.filter(employee_id=employee_pk, salary__isnull=False)
+            .order_by('-changed_at', '-id').values_list('changed_at', 'salary'))
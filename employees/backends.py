@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+
+CACHE_KEY = 'employees:user:%s'
+
+
+def user_cache_key(user_id):
+    return CACHE_KEY % user_id
+
+
+def invalidate_user(user_id):
+    """
+    Drop the cached user, right away and again once the transaction commits.
+
+    A request that reads the user before the commit would otherwise cache
+    it again as it was, e.g. still active after being deactivated.
+    """
+    key = user_cache_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend that keeps the users of authenticated requests in the cache.
+
+    AuthenticationMiddleware looks the user of the session up on every
+    request; with this backend that is a cache hit instead of a query on
+    auth_user. The entry is dropped whenever the user is saved or deleted
+    (see ``employees.signals``), which also covers password changes and
+    the last_login update of each login.
+    """
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
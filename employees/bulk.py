@@ -0,0 +1,86 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Func, Value
+from django.utils import timezone
+
+from . import audit
+from .caching import data_changed
+from .models import Employee, EmployeeHistory
+
+SALARY_FIELD = Employee._meta.get_field('salary')
+
+
+def _round_salary(expression):
+    return Func(expression, Value(SALARY_FIELD.decimal_places), function='ROUND',
+                output_field=DecimalField(max_digits=SALARY_FIELD.max_digits,
+                                          decimal_places=SALARY_FIELD.decimal_places))
+
+
+def bulk_update(queryset, user, department=None, position=None,
+                salary_percent=None, salary_amount=None):
+    """
+    Apply the same change to every employee in ``queryset`` with one UPDATE.
+
+    ``salary_percent`` raises (or cuts) salaries by a percentage and
+    ``salary_amount`` adds a fixed amount; both are computed in SQL. Every
+    updated row is stamped with ``updated_by`` and ``updated_at``. The
+    history entries are built from one SELECT of the old values and the
+    new salaries (computed by the same SQL expression) before the UPDATE.
+    Returns the number of updated rows.
+    """
+    changes = {}
+    if department:
+        changes['department'] = department
+    if position:
+        changes['position'] = position
+    salary = F('salary')
+    if salary_percent is not None:
+        salary = _round_salary(salary * (Decimal(1) + Decimal(salary_percent) / 100))
+    if salary_amount is not None:
+        salary = salary + Decimal(salary_amount)
+    if salary_percent is not None or salary_amount is not None:
+        changes['salary'] = salary
+    if not changes:
+        return 0
+
+    with transaction.atomic(), audit.batch():
+        entries = _update_entries(queryset, changes, user)
+        count = queryset.order_by().update(updated_by=user, updated_at=timezone.now(), **changes)
+        if count:
+            data_changed()
+        audit.record(entries)
+    return count
+
+
+def _update_entries(queryset, changes, user):
+    rows = queryset.order_by().values('pk', 'employee_id', *changes)
+    if 'salary' in changes:
+        rows = rows.annotate(new_salary=changes['salary'])
+    entries = []
+    for row in rows.iterator():
+        after = {field: row['new_salary'] if field == 'salary' else value for field, value in changes.items()}
+        changed = audit.diff(audit.snapshot(row), audit.snapshot(after))
+        if changed:
+            entries.append(audit.make_entry(row['pk'], row['employee_id'], EmployeeHistory.ACTION_UPDATE,
+                                            changed, user))
+    return entries
+
+
+def bulk_delete(queryset, user=None):
+    """
+    Delete every employee in ``queryset`` with one DELETE statement.
+
+    ``QuerySet.delete()`` would load each row to send pre/post_delete; the
+    only receivers of those for Employee invalidate the query cache, which
+    is done once here instead. The last values of the rows are read first
+    for their history entries. Returns the number of deleted rows.
+    """
+    with transaction.atomic(), audit.batch():
+        rows = queryset.order_by().values('pk', *audit.AUDITED_FIELDS)
+        entries = [audit.deletion_entry(row, user) for row in rows.iterator()]
+        count = queryset.order_by()._raw_delete(queryset.db)
+        if count:
+            data_changed()
+        audit.record(entries)
+    return count
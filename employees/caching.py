@@ -0,0 +1,142 @@
+"""
+Cached employee queries, keyed on the data version.
+
+The version is read from the database, so every process (web workers, job
+workers) agrees on it whatever the cache backend: ``employee_change``'s
+last ``seq`` (maintained by triggers, see EmployeeChange) moves with every
+write to an employee, and the LookupsVersion token with every write to a
+department or position. It is read with one query once per request (or
+routing block, see ``routers.remember()``), from the database its reads
+go to, so a page read from a lagging replica is cached under the version
+of the replica.
+"""
+import hashlib
+from collections import namedtuple
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.utils.dateparse import parse_datetime
+
+from .metrics import registry
+from .routers import forget, read_alias, remember
+
+VERSIONS_MEMO_KEY = 'data_versions'
+LOOKUPS_MEMO_KEY = 'lookups_version'
+
+VERSIONS_SQL = """
+    SELECT c.seq, c.changed_at, v.version, v.changed_at
+    FROM (SELECT 1)
+    LEFT JOIN (SELECT seq, changed_at FROM employee_change ORDER BY seq DESC LIMIT 1) c
+    LEFT JOIN employee_lookups_version v
+"""
+
+# employees: last seq of the change feed; lookups: LookupsVersion token;
+# last_modified: time of the last write to either, or None
+DataVersions = namedtuple('DataVersions', 'employees lookups last_modified')
+
+
+def _timeout():
+    return getattr(settings, 'EMPLOYEE_CACHE_TIMEOUT', 600)
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    value = parse_datetime(value) if isinstance(value, str) else value
+    return value.replace(tzinfo=dt_timezone.utc) if value.tzinfo is None else value
+
+
+def read_versions():
+    """DataVersions of the database reads go to right now, with one query."""
+    with connections[read_alias()].cursor() as cursor:
+        cursor.execute(VERSIONS_SQL)
+        seq, changed_at, lookups_version, lookups_changed_at = cursor.fetchone()
+    times = [time for time in (_parse_time(changed_at), _parse_time(lookups_changed_at)) if time]
+    return DataVersions(seq or 0, lookups_version or 0, max(times) if times else None)
+
+
+def data_versions():
+    """DataVersions, read once per request."""
+    return remember(VERSIONS_MEMO_KEY, read_versions)
+
+
+def get_version():
+    """Return the current data version of the employees, departments and positions."""
+    versions = data_versions()
+    return '%d.%d' % (versions.employees, versions.lookups)
+
+
+def lookups_version():
+    """The LookupsVersion token, read once per request and kept until the request writes a department or position."""
+    return remember(LOOKUPS_MEMO_KEY, lambda: data_versions().lookups)
+
+
+def forget_versions(lookups=True):
+    """Make the next read of the data versions (and of the lookups token, with ``lookups``) query the database."""
+    forget(VERSIONS_MEMO_KEY)
+    if lookups:
+        forget(LOOKUPS_MEMO_KEY)
+
+
+def data_changed(lookups=False):
+    """
+    Make this request read the data versions again, after it wrote.
+
+    ``lookups`` tells that departments or positions were written too.
+    Done right away, so the request sees its own change, and again once the
+    transaction commits, so that it does not keep a version it read before.
+    """
+    forget_versions(lookups)
+    transaction.on_commit(lambda: forget_versions(lookups))
+
+
+def get_last_modified():
+    """Return the time of the last write to the employees, departments or positions, or None."""
+    return data_versions().last_modified
+
+
+def make_key(*parts):
+    digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+    return 'employees:v%s:%s' % (get_version(), digest)
+
+
+def cached(parts, compute):
+    """Return the cached value for ``parts`` at the current version, computing it on a miss."""
+    key = make_key(*parts)
+    value = cache.get(key)
+    if value is not None:
+        _count('hits')
+        return value
+    _count('misses')
+    value = compute()
+    cache.set(key, value, _timeout())
+    return value
+
+
+def _count(name):
+    # Counted in memory and added up across processes with the request
+    # metrics: a shared counter in the cache would be a write on every hit
+    registry.count('cache_%s' % name)
+
+
+def cache_stats():
+    counters = registry.counter_totals()
+    hits = counters.get('cache_hits', 0)
+    misses = counters.get('cache_misses', 0)
+    total = hits + misses
+    return {
+        'version': get_version(),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0.0,
+    }
+
+
+def etag_for(request, *parts):
+    """ETag for a page rendered for ``request.user`` from data identified by ``parts``."""
+    profile = getattr(request, 'user_profile', None)
+    profile_stamp = profile.updated_at.isoformat() if profile else ''
+    raw = repr((request.user.pk, profile_stamp, request.get_full_path()) + parts)
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
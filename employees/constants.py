@@ -4,6 +4,10 @@ class EmployeeConstants:
     TEMPLATE_DETAIL = 'employees/employee_detail.html'
     TEMPLATE_FORM = 'employees/employee_form.html'
     TEMPLATE_DELETE = 'employees/employee_confirm_delete.html'
+    TEMPLATE_IMPORT = 'employees/employee_import.html'
+    TEMPLATE_ANALYTICS = 'employees/analytics.html'
+    TEMPLATE_HISTORY = 'employees/employee_history.html'
+    TEMPLATE_JOB = 'employees/job_detail.html'
     
     # Actions
     ACTION_ADD = 'Add'
@@ -23,4 +27,42 @@ class EmployeeConstants:
     MSG_DELETE_ERROR = 'Error deleting employee.'
     MSG_FORM_ERRORS = 'Please correct the form errors.'
     MSG_FORM_DISPLAY_ERROR = 'Error displaying form.'
-    MSG_DELETE_CONFIRM_ERROR = 'Error displaying delete confirmation.'
\ No newline at end of file
+    MSG_DELETE_CONFIRM_ERROR = 'Error displaying delete confirmation.'
+
+    # Listing
+    LIST_PAGE_SIZE = 50
+    API_PAGE_SIZE = 100
+    HISTORY_PAGE_SIZE = 50
+    # Upper bound of changes per change feed page (also keeps the IN () list under SQLite's variable limit)
+    CHANGE_FEED_PAGE_SIZE = 500
+    SALARY_HISTORY_LIMIT = 100
+    DEFAULT_SORT = '-created_at'
+    SORT_CHOICES = (
+        ('-created_at', 'Newest first'),
+        ('created_at', 'Oldest first'),
+        ('name', 'Name (A-Z)'),
+        ('-name', 'Name (Z-A)'),
+        ('-hire_date', 'Hire date (newest)'),
+        ('hire_date', 'Hire date (oldest)'),
+        ('-salary', 'Salary (highest)'),
+        ('salary', 'Salary (lowest)'),
+    )
+    MSG_INVALID_CURSOR = 'Invalid page requested, showing the first page.'
+    MSG_SEARCH_ERROR = 'Error searching employees.'
+    MSG_IMPORT_SUCCESS = '%d employees imported successfully.'
+    MSG_IMPORT_REJECTED = '%d rows were rejected, see the report below.'
+    MSG_IMPORT_ERROR = 'Error importing employees.'
+    MSG_EXPORT_INVALID = 'Invalid export format or filters.'
+    MSG_BULK_UPDATE_SUCCESS = '%d employees updated.'
+    MSG_BULK_DELETE_SUCCESS = '%d employees deleted.'
+    MSG_BULK_ERROR = 'Error applying bulk action.'
+    MSG_ANALYTICS_ERROR = 'Error displaying analytics.'
+    MSG_HISTORY_ERROR = 'Error displaying employee history.'
+
+    # Background jobs
+    JOB_REFRESH_SECONDS = 2
+    MSG_JOB_QUEUED = 'The job was queued, this page shows its progress.'
+    MSG_JOB_CANCELLED = 'The job was cancelled.'
+    MSG_JOB_NOT_CANCELLABLE = 'The job has already finished.'
+    MSG_JOB_NOT_RETRYABLE = 'Only a failed or cancelled job can be retried.'
+    MSG_JOB_NO_FILE = 'The job has no file to download.'
@@ -0,0 +1,99 @@
+import csv
+import json
+import zlib
+
+from . import lookups
+from .models import Employee
+
+EXPORT_FIELDS = (
+    'id', 'employee_id', 'name', 'department', 'position', 'salary', 'email',
+    'hire_date', 'created_at', 'updated_at',
+)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def iter_employee_rows(queryset=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield employee rows as tuples of EXPORT_FIELDS values, departments and
+    positions by name.
+
+    The table is walked in primary key order one chunk at a time
+    (``WHERE id > last_id ORDER BY id LIMIT chunk_size``), so memory use does
+    not grow with the size of the table and no chunk scans rows already read.
+    """
+    if queryset is None:
+        queryset = Employee.objects.all()
+    queryset = queryset.order_by('pk').values_list(*EXPORT_FIELDS)
+    last_pk = 0
+    while True:
+        count = 0
+        chunk = queryset.filter(pk__gt=last_pk)[:chunk_size].iterator()
+        for row in lookups.name_tuples(chunk, EXPORT_FIELDS):
+            count += 1
+            yield row
+        if count < chunk_size:
+            return
+        last_pk = row[0]
+
+
+class _Echo:
+    """File-like object whose write() returns the written value."""
+
+    def write(self, value):
+        return value
+
+
+def _serialize(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def iter_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow([_serialize(value) for value in row])
+
+
+def iter_jsonl(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_FIELDS, (_serialize(value) for value in row)))) + '\n'
+
+
+def iter_export(fmt, rows):
+    if fmt == 'jsonl':
+        return iter_jsonl(rows)
+    return iter_csv(rows)
+
+
+def iter_encoded(chunks, compress=False, buffer_size=64 * 1024):
+    """
+    Encode text chunks to bytes, grouping them into ``buffer_size`` blocks
+    and optionally gzip compressing the stream.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= buffer_size:
+            block = b''.join(buffer)
+            buffer, size = [], 0
+            if compressor:
+                block = compressor.compress(block)
+            if block:
+                yield block
+    block = b''.join(buffer)
+    if compressor:
+        block = compressor.compress(block) + compressor.flush()
+    if block:
+        yield block
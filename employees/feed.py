@@ -0,0 +1,53 @@
+"""
+Change feed: the employees created, updated or deleted after a sequence number.
+
+Reads the ``employee_change`` table maintained by triggers (see
+``EmployeeChange``). A page is a range scan of its primary key plus one
+primary key lookup per changed employee, so catching up costs the same
+whatever the size of the roster. SQLite commits writers one at a time, so
+a change can never become visible with a lower ``seq`` than one already
+served.
+"""
+from django.db.models import Min
+
+from . import lookups
+from .models import Employee, EmployeeChange
+
+ACTION_UPSERT = 'upsert'
+ACTION_DELETE = 'delete'
+
+
+def seq_before(since):
+    """Cursor (``seq``) from which the feed returns every change made at or after ``since``."""
+    first = EmployeeChange.objects.filter(changed_at__gte=since).aggregate(seq=Min('seq'))['seq']
+    if first is None:
+        return EmployeeChange.objects.order_by('-seq').values_list('seq', flat=True).first() or 0
+    return first - 1
+
+
+def changes_after(seq, limit, fields):
+    """
+    Return ``(changes, next_seq, has_more)`` for at most ``limit`` changes after ``seq``.
+
+    Each change carries the current values of ``fields`` of the employee,
+    or ``None`` for a deletion (tombstone).
+    """
+    rows = list(EmployeeChange.objects.filter(seq__gt=seq).order_by('seq')
+                .values('seq', 'employee_id', 'deleted', 'changed_at')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    ids = [row['employee_id'] for row in rows if not row['deleted']]
+    employees = {}
+    if ids:
+        queryset = Employee.objects.filter(pk__in=ids).order_by().values(*dict.fromkeys(fields + ('id',)))
+        employees = {employee['id']: {f: employee[f] for f in fields}
+                     for employee in lookups.name_values(list(queryset))}
+    changes = [{
+        'seq': row['seq'],
+        'id': row['employee_id'],
+        'action': ACTION_DELETE if row['deleted'] else ACTION_UPSERT,
+        'changed_at': row['changed_at'],
+        # An employee deleted since this page was read shows up as a tombstone further on
+        'employee': None if row['deleted'] else employees.get(row['employee_id']),
+    } for row in rows]
+    return changes, rows[-1]['seq'] if rows else seq, has_more
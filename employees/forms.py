@@ -1,8 +1,31 @@
 from django import forms
+from django.http import QueryDict
 from django.contrib.auth.models import User
+from django.db.models import CharField, Q, Value
+from . import lookups
 from .models import Employee, UserProfile
+from .constants import EmployeeConstants
+
+def unique_violation_field(exc, table, fields):
+    """
+    Return which of ``fields`` of ``table`` an IntegrityError was raised for.
+
+    Understands the SQLite ("UNIQUE constraint failed: table.column") and
+    PostgreSQL ("Key (column)=...") messages; returns None otherwise.
+    """
+    message = str(exc)
+    for field in fields:
+        if '%s.%s' % (table, field) in message or 'Key (%s)=' % field in message:
+            return field
+    return None
+
 
 class SignUpForm(forms.Form):
+    UNIQUE_ERRORS = {
+        'username': "Username already exists!",
+        'emp_id': "Employee ID already exists!",
+    }
+
     name = forms.CharField(max_length=100)
     emp_id = forms.CharField(max_length=20)
     username = forms.CharField(max_length=150)
@@ -19,15 +42,70 @@ class SignUpForm(forms.Form):
         if password and confirm_password and password != confirm_password:
             raise forms.ValidationError("Passwords do not match!")
 
-        if User.objects.filter(username=username).exists():
-            raise forms.ValidationError("Username already exists!")
-            
-        if UserProfile.objects.filter(emp_id=emp_id).exists():
-            raise forms.ValidationError("Employee ID already exists!")
+        # One query for both unique values, the constraints on auth_user and
+        # user_profile still have the last word (see integrity_error_message)
+        taken = User.objects.filter(username=username).annotate(
+            taken=Value('username', output_field=CharField())
+        ).values_list('taken').union(
+            UserProfile.objects.filter(emp_id=emp_id).annotate(
+                taken=Value('emp_id', output_field=CharField())
+            ).values_list('taken')
+        )
+        taken = {row[0] for row in taken}
+        for field in ('username', 'emp_id'):
+            if field in taken:
+                raise forms.ValidationError(self.UNIQUE_ERRORS[field])
 
         return cleaned_data
 
+    def integrity_error_message(self, exc):
+        """Message for a unique constraint violation raised while saving, or None."""
+        field = unique_violation_field(exc, User._meta.db_table, ('username',)) or \
+            unique_violation_field(exc, UserProfile._meta.db_table, ('emp_id',))
+        return self.UNIQUE_ERRORS.get(field)
+
+class LookupChoiceField(forms.ChoiceField):
+    """
+    Choice of a department or position by name, from the in-memory ``lookups`` tables.
+
+    Names are matched ignoring case and extra whitespace, so imported rows
+    need not spell them exactly; cleans to the model instance (or None).
+    """
+
+    def __init__(self, table, **kwargs):
+        self.table = table
+        super().__init__(choices=self._choices_with_blank, **kwargs)
+
+    def _choices_with_blank(self):
+        return [('', '---------')] + self.table.choices()
+
+    def prepare_value(self, value):
+        # Initial values of a ModelForm are ids; rows of the table show as their names
+        if isinstance(value, int):
+            value = self.table.get(value) or value
+        return getattr(value, 'name', value)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        obj = self.table.find(value)
+        if obj is None:
+            raise forms.ValidationError(self.error_messages['invalid_choice'], code='invalid_choice',
+                                        params={'value': value})
+        return obj
+
+    def validate(self, value):
+        if value is None and self.required:
+            raise forms.ValidationError(self.error_messages['required'], code='required')
+
+    def has_changed(self, initial, data):
+        return str(self.prepare_value(initial) or '') != str(data or '')
+
+
 class EmployeeForm(forms.ModelForm):
+    department = LookupChoiceField(lookups.departments, widget=forms.Select(attrs={'class': 'form-control'}))
+    position = LookupChoiceField(lookups.positions, widget=forms.Select(attrs={'class': 'form-control'}))
+
     class Meta:
         model = Employee
         fields = ['employee_id', 'name', 'department', 'position', 'salary', 'email', 'hire_date']
@@ -42,31 +120,186 @@ class EmployeeForm(forms.ModelForm):
             }),
             'employee_id': forms.TextInput(attrs={'class': 'form-control'}),
             'name': forms.TextInput(attrs={'class': 'form-control'}),
-            'department': forms.TextInput(attrs={'class': 'form-control'}),
-            'position': forms.TextInput(attrs={'class': 'form-control'}),
             'email': forms.EmailInput(attrs={'class': 'form-control'}),
         }
 
-    def clean_employee_id(self):
-        employee_id = self.cleaned_data.get('employee_id')
-        if employee_id:
-            # Check if employee_id exists, excluding current instance in case of update
-            if self.instance.pk:
-                if Employee.objects.exclude(pk=self.instance.pk).filter(employee_id=employee_id).exists():
-                    raise forms.ValidationError("This Employee ID is already in use.")
-            else:
-                if Employee.objects.filter(employee_id=employee_id).exists():
-                    raise forms.ValidationError("This Employee ID is already in use.")
-        return employee_id
-
-    def clean_email(self):
-        email = self.cleaned_data.get('email')
-        if email:
-            # Check if email exists, excluding current instance in case of update
+    UNIQUE_ERRORS = {
+        'employee_id': "This Employee ID is already in use.",
+        'email': "This email is already in use.",
+    }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # Check every unique field with a single query; the database unique
+        # constraints remain the source of truth (see add_integrity_error).
+        values = {f: cleaned_data[f] for f in self.UNIQUE_ERRORS if cleaned_data.get(f)}
+        if values:
+            query = Q()
+            for field, value in values.items():
+                query |= Q(**{field: value})
+            taken = Employee.objects.filter(query)
             if self.instance.pk:
-                if Employee.objects.exclude(pk=self.instance.pk).filter(email=email).exists():
-                    raise forms.ValidationError("This email is already in use.")
-            else:
-                if Employee.objects.filter(email=email).exists():
-                    raise forms.ValidationError("This email is already in use.")
-        return email
\ No newline at end of file
+                # Exclude current instance in case of update
+                taken = taken.exclude(pk=self.instance.pk)
+            for row in taken.values_list(*values)[:len(values)]:
+                for field, value in zip(values, row):
+                    if value == values[field] and field not in self.errors:
+                        self.add_error(field, self.UNIQUE_ERRORS[field])
+        return cleaned_data
+
+    def validate_unique(self):
+        """Uniqueness is checked in clean() and enforced by the database."""
+
+    def _get_validation_exclusions(self):
+        # The lookup fields were already found in the lookups tables; the
+        # model would query for each of them again.
+        return super()._get_validation_exclusions() | set(lookups.TABLES)
+
+    def add_integrity_error(self, exc):
+        """
+        Turn a unique constraint violation raised on save into a field error.
+
+        Returns False when ``exc`` is not about one of the unique fields.
+        """
+        field = unique_violation_field(exc, Employee._meta.db_table, self.UNIQUE_ERRORS)
+        if field is None:
+            return False
+        self.add_error(field, self.UNIQUE_ERRORS[field])
+        return True
+
+class EmployeeImportForm(EmployeeForm):
+    """
+    EmployeeForm rules for bulk imports.
+
+    Uniqueness is checked by the importer for a whole batch at once, so the
+    per-row uniqueness queries are skipped here.
+    """
+
+    def clean(self):
+        return forms.ModelForm.clean(self)
+
+
+class EmployeeUploadForm(forms.Form):
+    IMPORT_FORMATS = (
+        ('', 'Detect from file name'),
+        ('csv', 'CSV'),
+        ('jsonl', 'JSON Lines'),
+    )
+    file = forms.FileField()
+    format = forms.ChoiceField(choices=IMPORT_FORMATS, required=False)
+
+
+class EmployeeFilterForm(forms.Form):
+    """Validates the sort and filter query parameters of the employee list."""
+    department = forms.CharField(max_length=100, required=False)
+    position = forms.CharField(max_length=100, required=False)
+    hire_date_from = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    hire_date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    salary_min = forms.DecimalField(max_digits=10, decimal_places=2, required=False)
+    salary_max = forms.DecimalField(max_digits=10, decimal_places=2, required=False)
+    sort = forms.ChoiceField(choices=EmployeeConstants.SORT_CHOICES, required=False)
+
+    def get_sort(self):
+        if self.is_valid() and self.cleaned_data.get('sort'):
+            return self.cleaned_data['sort']
+        return EmployeeConstants.DEFAULT_SORT
+
+    def department_choices(self):
+        return lookups.departments.all()
+
+    def position_choices(self):
+        return lookups.positions.all()
+
+    def filter_queryset(self, queryset):
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+        # Names are resolved in memory, so the filters compare integer ids
+        for field, table in lookups.TABLES.items():
+            if data.get(field):
+                obj = table.find(data[field])
+                if obj is None:
+                    return queryset.none()
+                queryset = queryset.filter(**{field: obj.pk})
+        if data.get('hire_date_from'):
+            queryset = queryset.filter(hire_date__gte=data['hire_date_from'])
+        if data.get('hire_date_to'):
+            queryset = queryset.filter(hire_date__lte=data['hire_date_to'])
+        if data.get('salary_min') is not None:
+            queryset = queryset.filter(salary__gte=data['salary_min'])
+        if data.get('salary_max') is not None:
+            queryset = queryset.filter(salary__lte=data['salary_max'])
+        return queryset
+
+    def has_filters(self):
+        return self.is_valid() and any(
+            value not in (None, '') for name, value in self.cleaned_data.items() if name != 'sort'
+        )
+
+    def querystring(self):
+        """Return the active filters and sort as an URL-encoded query string."""
+        if not self.is_valid():
+            return ''
+        params = QueryDict(mutable=True)
+        for name in self.fields:
+            value = self[name].value()
+            if value not in (None, ''):
+                params[name] = value
+        return params.urlencode()
+
+class BulkUpdateForm(forms.Form):
+    """Changes applied to many employees at once by bulk_update()."""
+    department = LookupChoiceField(lookups.departments, required=False)
+    position = LookupChoiceField(lookups.positions, required=False)
+    salary_percent = forms.DecimalField(max_digits=6, decimal_places=2, required=False,
+                                        min_value=-100, help_text='e.g. 4 for a 4% raise')
+    salary_amount = forms.DecimalField(max_digits=10, decimal_places=2, required=False,
+                                       help_text='Fixed amount added to each salary')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not any(cleaned_data.get(f) not in (None, '') for f in self.fields):
+            raise forms.ValidationError("Enter at least one change to apply.")
+        return cleaned_data
+
+
+class BulkActionForm(BulkUpdateForm):
+    """
+    Bulk action posted from the employee list, applied either to the
+    selected employees or to every employee matching the list filters.
+    """
+    ACTION_UPDATE = 'update'
+    ACTION_DELETE = 'delete'
+    SCOPE_SELECTED = 'selected'
+    SCOPE_FILTERED = 'filtered'
+
+    action = forms.ChoiceField(choices=((ACTION_UPDATE, 'Update'), (ACTION_DELETE, 'Delete')))
+    scope = forms.ChoiceField(choices=((SCOPE_SELECTED, 'Selected employees'),
+                                       (SCOPE_FILTERED, 'All employees matching the filters')))
+    ids = forms.TypedMultipleChoiceField(coerce=int, required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Any integer is accepted; unknown ids simply match no row.
+        self.fields['ids'].valid_value = lambda value: str(value).isdigit()
+
+    def clean(self):
+        cleaned_data = forms.Form.clean(self)
+        if cleaned_data.get('scope') == self.SCOPE_SELECTED and not cleaned_data.get('ids'):
+            raise forms.ValidationError("Select at least one employee.")
+        if cleaned_data.get('action') == self.ACTION_UPDATE:
+            changes = ('department', 'position', 'salary_percent', 'salary_amount')
+            if not any(cleaned_data.get(f) not in (None, '') for f in changes):
+                raise forms.ValidationError("Enter at least one change to apply.")
+        return cleaned_data
+
+    def get_queryset(self, filter_form):
+        """Return the employees targeted, ``filter_form`` holding the list filters."""
+        queryset = Employee.objects.all()
+        if self.cleaned_data['scope'] == self.SCOPE_SELECTED:
+            return queryset.filter(pk__in=self.cleaned_data['ids'])
+        if not filter_form.is_valid():
+            raise forms.ValidationError("Invalid filters.")
+        if not filter_form.has_filters():
+            raise forms.ValidationError("Apply at least one filter before changing all matching employees.")
+        return filter_form.filter_queryset(queryset)
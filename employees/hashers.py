@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2-SHA256 hasher with PASSWORD_HASH_ITERATIONS iterations.
+
+    Hashes keep the ``pbkdf2_sha256`` algorithm name, so hashes from before
+    a change (or made by the stock hasher) still verify; each is rehashed
+    with the configured count the next time its user logs in. Measure the
+    cost of a count with ``manage.py benchmark_login`` before changing it.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS or hashers.PBKDF2PasswordHasher.iterations
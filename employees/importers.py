@@ -0,0 +1,222 @@
+import csv
+import io
+import json
+import time
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .caching import data_changed, forget_versions
+from .forms import EmployeeImportForm
+from .models import Employee
+from .routers import primary_reads
+
+IMPORT_FIELDS = EmployeeImportForm.Meta.fields
+DEFAULT_BATCH_SIZE = 1000
+MSG_TAKEN_EMPLOYEE_ID = 'employee_id: This Employee ID is already in use.'
+MSG_TAKEN_EMAIL = 'email: This email is already in use.'
+
+
+def detect_format(filename, default='csv'):
+    name = (filename or '').lower()
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def iter_rows(fileobj, fmt='csv'):
+    """
+    Yield ``(line_number, row_dict)`` pairs from a CSV or JSONL file.
+
+    ``fileobj`` may be opened in text or binary mode; it is read line by line
+    so the file is never fully loaded in memory.
+    """
+    if isinstance(fileobj.read(0), bytes):
+        fileobj = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+
+    if fmt == 'jsonl':
+        for line_number, line in enumerate(fileobj, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, {'__error__': 'Invalid JSON: %s' % e}
+                continue
+            if not isinstance(row, dict):
+                row = {'__error__': 'Expected a JSON object.'}
+            yield line_number, row
+    else:
+        reader = csv.DictReader(fileobj)
+        for row in reader:
+            yield reader.line_num, row
+
+
+class ImportResult:
+    """Counters and rejected rows collected while importing."""
+
+    def __init__(self):
+        self.read = 0
+        self.created = 0
+        self.rejected = 0
+        self.errors = []
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return '%d rows read, %d created, %d rejected in %.2fs (%.0f rows/s)' % (
+            self.read, self.created, self.rejected, self.elapsed, self.rows_per_second
+        )
+
+
+class EmployeeImporter:
+    """
+    Validate and insert employees in batches.
+
+    Each row is validated with ``EmployeeImportForm`` (the EmployeeForm rules
+    without its per-row uniqueness queries). Uniqueness of ``employee_id`` and
+    ``email`` is then checked for a whole batch with one query, and the valid
+    rows are inserted with a single ``bulk_create`` per batch. Should another
+    writer take one of the values in between, the batch is inserted again
+    row by row and the rows the constraints refuse are rejected.
+    """
+
+    def __init__(self, user=None, batch_size=DEFAULT_BATCH_SIZE, error_writer=None,
+                 progress=None, keep_errors=100):
+        self.user = user
+        self.batch_size = batch_size
+        self.error_writer = error_writer
+        self.progress = progress
+        self.keep_errors = keep_errors
+
+    def run(self, rows):
+        result = ImportResult()
+        batch = []
+        # Validated against the primary; departments and positions are
+        # checked for changes once per batch rather than once per row
+        with primary_reads():
+            for line_number, row in rows:
+                result.read += 1
+                employee = self.validate_row(result, line_number, row)
+                if employee is not None:
+                    batch.append((line_number, row, employee))
+                if len(batch) >= self.batch_size:
+                    self.flush(result, batch)
+                    batch = []
+                    forget_versions()
+            if batch:
+                self.flush(result, batch)
+        result.elapsed = time.monotonic() - result.started
+        return result
+
+    def validate_row(self, result, line_number, row):
+        if '__error__' in row:
+            self.reject(result, line_number, row, row['__error__'])
+            return None
+        data = {field: _clean_value(row.get(field)) for field in IMPORT_FIELDS}
+        form = EmployeeImportForm(data)
+        if not form.is_valid():
+            self.reject(result, line_number, row, _format_errors(form.errors))
+            return None
+        employee = form.save(commit=False)
+        employee.created_by = self.user
+        return employee
+
+    def flush(self, result, batch):
+        taken_ids, taken_emails = self.existing_values(batch)
+        accepted = []
+        for line_number, row, employee in batch:
+            if employee.employee_id in taken_ids:
+                self.reject(result, line_number, row, MSG_TAKEN_EMPLOYEE_ID)
+            elif employee.email in taken_emails:
+                self.reject(result, line_number, row, MSG_TAKEN_EMAIL)
+            else:
+                # Rows later in the same batch must not reuse these values either.
+                taken_ids.add(employee.employee_id)
+                taken_emails.add(employee.email)
+                accepted.append((line_number, row, employee))
+
+        try:
+            with transaction.atomic():
+                Employee.objects.bulk_create([employee for _, _, employee in accepted], batch_size=self.batch_size)
+        except IntegrityError:
+            # A concurrent writer took one of the values since the check above;
+            # the constraints decide which rows still go in.
+            created = self.insert_one_by_one(result, accepted)
+        else:
+            created = len(accepted)
+        if created:
+            # bulk_create does not send post_save
+            data_changed()
+        result.created += created
+        if self.progress:
+            self.progress(result)
+
+    def existing_values(self, batch):
+        """``(employee ids, emails)`` of the batch already in use, found with one query."""
+        taken_ids = set()
+        taken_emails = set()
+        existing = Employee.objects.filter(
+            Q(employee_id__in={employee.employee_id for _, _, employee in batch}) |
+            Q(email__in={employee.email for _, _, employee in batch})
+        ).values_list('employee_id', 'email')
+        for employee_id, email in existing:
+            taken_ids.add(employee_id)
+            taken_emails.add(email)
+        return taken_ids, taken_emails
+
+    def insert_one_by_one(self, result, accepted):
+        """Insert the rows of a batch each in its own savepoint, rejecting those that fail; returns how many went in."""
+        created = 0
+        with transaction.atomic():
+            for line_number, row, employee in accepted:
+                try:
+                    with transaction.atomic():
+                        Employee.objects.bulk_create([employee])
+                except IntegrityError as e:
+                    taken_ids, taken_emails = self.existing_values([(line_number, row, employee)])
+                    if employee.employee_id in taken_ids:
+                        message = MSG_TAKEN_EMPLOYEE_ID
+                    elif employee.email in taken_emails:
+                        message = MSG_TAKEN_EMAIL
+                    else:
+                        message = str(e)
+                    self.reject(result, line_number, row, message)
+                else:
+                    created += 1
+        return created
+
+    def reject(self, result, line_number, row, message):
+        result.rejected += 1
+        if self.error_writer:
+            self.error_writer(line_number, row, message)
+        if len(result.errors) < self.keep_errors:
+            result.errors.append((line_number, message))
+
+
+def csv_error_writer(fileobj):
+    """Return an ``error_writer`` appending rejected rows to a CSV report."""
+    writer = csv.writer(fileobj)
+    writer.writerow(['line', 'error'] + list(IMPORT_FIELDS))
+
+    def write(line_number, row, message):
+        writer.writerow([line_number, message] + [row.get(field, '') for field in IMPORT_FIELDS])
+    return write
+
+
+def _clean_value(value):
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def _format_errors(errors):
+    return '; '.join(
+        '%s: %s' % (field, ' '.join(messages)) for field, messages in errors.items()
+    )
@@ -0,0 +1,332 @@
+"""
+Database backed job queue.
+
+Views ``enqueue()`` long operations instead of running them in the request;
+``manage.py run_workers`` processes ``claim()`` them (one conditional
+UPDATE, so two workers never get the same job) and ``run_job()`` them. The
+queue is a plain table, so it needs nothing but the database.
+
+Tasks report progress with ``JobContext.progress()``, which also stops
+them once cancellation was requested. A failing job is retried with
+exponential backoff until ``max_attempts``; the jobs of a worker that died
+are requeued by ``requeue_stale()`` once their last progress report is
+older than JOB_STALE_SECONDS.
+"""
+import io
+import json
+import logging
+import os
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.http import QueryDict
+from django.utils import timezone
+
+from . import analytics, payroll
+from .bulk import bulk_delete, bulk_update
+from .exporters import EXPORT_FORMATS, iter_employee_rows, iter_encoded, iter_export
+from .forms import BulkUpdateForm, EmployeeFilterForm
+from .importers import EmployeeImporter, iter_rows
+from .models import Employee, Job
+from .routers import primary_reads, replica_reads
+from .sessions import prune_expired_sessions
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two progress writes of a running job
+PROGRESS_INTERVAL = 1.0
+
+TASKS = {}
+
+
+class JobCancelled(Exception):
+    """Raised from ``JobContext.progress()`` when the job was cancelled."""
+
+
+def task(kind):
+    """Register the decorated function as the task run for jobs of ``kind``."""
+    def decorator(func):
+        TASKS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, payload=None, user=None, max_attempts=3):
+    if kind not in TASKS:
+        raise ValueError('Unknown job kind: %s' % kind)
+    return Job.objects.create(
+        kind=kind,
+        payload=json.dumps(payload or {}, cls=DjangoJSONEncoder),
+        created_by=user if user is not None and user.is_authenticated else None,
+        max_attempts=max_attempts,
+    )
+
+
+def enqueue_periodic(kind, interval):
+    """Queue a ``kind`` job unless one was queued in the last ``interval`` seconds; returns it, or None."""
+    if not interval:
+        return None
+    if Job.objects.filter(kind=kind, created_at__gte=timezone.now() - timedelta(seconds=interval)).exists():
+        return None
+    return enqueue(kind)
+
+
+def claim(worker):
+    """Mark the next due job as running for ``worker`` and return it, or None if there is none."""
+    now = timezone.now()
+    with transaction.atomic():
+        job = (Job.objects.select_for_update(skip_locked=True)
+               .filter(status=Job.STATUS_QUEUED, run_after__lte=now)
+               .order_by('run_after', 'id').first())
+        if job is None:
+            return None
+        # Conditional, so a job is never claimed twice even without row locks
+        claimed = Job.objects.filter(pk=job.pk, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING, worker=worker, attempts=F('attempts') + 1,
+            started_at=now, heartbeat_at=now, message='',
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+class JobContext:
+    """Handed to tasks: the job, its payload and progress reporting."""
+
+    def __init__(self, job):
+        self.job = job
+        self.last_report = None
+
+    def progress(self, done, total=None, message='', force=False):
+        """
+        Record the progress of the job, at most every PROGRESS_INTERVAL seconds unless ``force``.
+
+        Raises JobCancelled if the job was cancelled in the meantime.
+        """
+        now = time.monotonic()
+        if not force and self.last_report is not None and now - self.last_report < PROGRESS_INTERVAL:
+            return
+        self.last_report = now
+        updated = Job.objects.filter(pk=self.job.pk, cancel_requested=False).update(
+            progress_done=done, progress_total=total, message=message[:200], heartbeat_at=timezone.now(),
+        )
+        if not updated:
+            raise JobCancelled()
+
+
+def _finish(job, status, **fields):
+    Job.objects.filter(pk=job.pk).update(status=status, finished_at=timezone.now(), **fields)
+
+
+def run_job(job):
+    """Run a claimed job to completion, failure (maybe retried later) or cancellation."""
+    try:
+        # Like a request: reads go to the primary, data versions are read once
+        with primary_reads():
+            result = TASKS[job.kind](JobContext(job), **job.get_payload())
+    except JobCancelled:
+        _finish(job, Job.STATUS_CANCELLED, message='Cancelled.')
+    except Exception as e:
+        logger.error(f"Job {job.pk} ({job.kind}) failed: {str(e)}")
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.STATUS_QUEUED, error=error, worker='',
+                run_after=timezone.now() + timedelta(seconds=delay),
+                message='Failed, retrying in %d seconds.' % delay,
+            )
+        else:
+            _finish(job, Job.STATUS_FAILED, error=error, message='Failed: %s' % str(e)[:180])
+    else:
+        _finish(job, Job.STATUS_SUCCEEDED, result=json.dumps(result, cls=DjangoJSONEncoder), message='Done.')
+    job.refresh_from_db()
+    return job
+
+
+def cancel(job):
+    """Cancel a queued job at once, or make a running one stop at its next progress report."""
+    now = timezone.now()
+    if Job.objects.filter(pk=job.pk, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_CANCELLED, cancel_requested=True, finished_at=now, message='Cancelled.'):
+        return True
+    return bool(Job.objects.filter(pk=job.pk, status=Job.STATUS_RUNNING).update(cancel_requested=True))
+
+
+def retry(job):
+    """Queue a failed or cancelled job again, with a fresh set of attempts."""
+    return bool(Job.objects.filter(pk=job.pk, status__in=(Job.STATUS_FAILED, Job.STATUS_CANCELLED)).update(
+        status=Job.STATUS_QUEUED, attempts=0, cancel_requested=False, run_after=timezone.now(),
+        progress_done=0, progress_total=None, message='', finished_at=None,
+    ))
+
+
+def requeue_stale(seconds=None):
+    """Requeue (or fail, when out of attempts) running jobs that stopped reporting; returns how many."""
+    seconds = settings.JOB_STALE_SECONDS if seconds is None else seconds
+    stale = Job.objects.filter(status=Job.STATUS_RUNNING,
+                               heartbeat_at__lt=timezone.now() - timedelta(seconds=seconds))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.STATUS_FAILED, finished_at=timezone.now(), message='The worker running the job stopped.',
+    )
+    requeued = stale.update(status=Job.STATUS_QUEUED, worker='', message='Requeued, the worker stopped.')
+    return failed + requeued
+
+
+def for_user(user):
+    """Jobs ``user`` may see: their own, or every job for staff."""
+    if user.is_staff:
+        return Job.objects.all()
+    return Job.objects.filter(created_by=user)
+
+
+def describe(job):
+    """JSON-serializable status of a job, as polled by clients."""
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'finished': job.is_finished,
+        'progress_done': job.progress_done,
+        'progress_total': job.progress_total,
+        'percent': job.percent,
+        'message': job.message,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'cancel_requested': job.cancel_requested,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        'result': job.get_result(),
+        'error': job.error.strip().splitlines()[-1] if job.error else '',
+    }
+
+
+def result_file(job):
+    """Path of the file written by a succeeded export job, or None."""
+    result = job.get_result() if job.status == Job.STATUS_SUCCEEDED else None
+    if not result or not result.get('file'):
+        return None
+    path = os.path.join(settings.JOB_FILES_DIR, os.path.basename(result['file']))
+    return path if os.path.exists(path) else None
+
+
+def job_file_path(name):
+    """Path of a new file in JOB_FILES_DIR, with ``name`` made unique."""
+    os.makedirs(settings.JOB_FILES_DIR, exist_ok=True)
+    return os.path.join(settings.JOB_FILES_DIR, '%s-%s' % (uuid.uuid4().hex, os.path.basename(name)))
+
+
+def _user(user_id):
+    return User.objects.filter(pk=user_id).first() if user_id else None
+
+
+def _filter_form(filters):
+    filter_form = EmployeeFilterForm(QueryDict(filters))
+    if not filter_form.is_valid():
+        raise ValueError('Invalid filters: %s' % filter_form.errors.as_text())
+    return filter_form
+
+
+@task('import_employees')
+def import_employees(context, path, format='csv', user_id=None):
+    """Import an uploaded file saved in JOB_FILES_DIR; the file is removed once imported."""
+    total = os.path.getsize(path)
+    with open(path, 'rb') as upload, io.TextIOWrapper(upload, encoding='utf-8-sig', newline='') as source:
+
+        def progress(result):
+            context.progress(upload.tell(), total, '%d rows read, %d created, %d rejected' % (
+                result.read, result.created, result.rejected))
+
+        result = EmployeeImporter(user=_user(user_id), progress=progress).run(iter_rows(source, format))
+    os.remove(path)
+    return {
+        'read': result.read,
+        'created': result.created,
+        'rejected': result.rejected,
+        'errors': result.errors,
+        'summary': result.summary(),
+    }
+
+
+@task('export_employees')
+def export_employees(context, filters='', format='csv', compress=False):
+    """Write the (filtered) roster to a file in JOB_FILES_DIR, served by the job download view."""
+    filter_form = _filter_form(filters)
+    extension = EXPORT_FORMATS[format][1] + ('.gz' if compress else '')
+    path = job_file_path('employees.%s' % extension)
+    with replica_reads():
+        queryset = filter_form.filter_queryset(Employee.objects.all())
+        total = queryset.count()
+        written = 0
+
+        def rows():
+            nonlocal written
+            for row in iter_employee_rows(queryset):
+                written += 1
+                context.progress(written, total, '%d of %d rows exported' % (written, total))
+                yield row
+
+        try:
+            with open(path, 'wb') as output:
+                for chunk in iter_encoded(iter_export(format, rows()), compress=compress):
+                    output.write(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+    return {'file': os.path.basename(path), 'filename': 'employees.%s' % extension, 'rows': written}
+
+
+@task('bulk_action')
+def bulk_action(context, action, filters, changes=None, user_id=None):
+    """Bulk update or delete every employee matching ``filters`` (a query string); ``changes`` is BulkUpdateForm data."""
+    queryset = _filter_form(filters).filter_queryset(Employee.objects.all())
+    context.progress(0, 1, 'Applying the %s.' % action, force=True)
+    if action == 'delete':
+        count = bulk_delete(queryset, _user(user_id))
+    else:
+        form = BulkUpdateForm(changes or {})
+        if not form.is_valid():
+            raise ValueError('Invalid changes: %s' % form.errors.as_text())
+        count = bulk_update(queryset, _user(user_id), **form.cleaned_data)
+    return {'count': count}
+
+
+@task('rebuild_stats')
+def rebuild_stats(context):
+    """Rebuild the analytics summary tables."""
+    context.progress(0, 1, 'Rebuilding the summary tables.', force=True)
+    drifted = len(analytics.find_drift())
+    analytics.rebuild()
+    return {'drifted': drifted}
+
+
+@task('prune_sessions')
+def prune_sessions(context):
+    """Delete the expired sessions."""
+    context.progress(0, None, 'Deleting expired sessions.', force=True)
+    deleted = prune_expired_sessions(
+        progress=lambda done: context.progress(done, None, 'Deleted %d expired sessions.' % done)
+    )
+    return {'deleted': deleted}
+
+
+@task('run_payroll')
+def run_payroll(context, period, replace=False, user_id=None):
+    """Compute the payroll of ``period`` (``YYYY-MM``)."""
+    period = payroll.parse_period(period)
+    total = Employee.objects.filter(hire_date__lte=payroll.month_bounds(period)[1]).count()
+    context.progress(0, total, 'Computing the payroll of %s.' % period.strftime('%Y-%m'), force=True)
+    run = payroll.run_payroll(
+        period, user=_user(user_id), replace=replace,
+        progress=lambda done: context.progress(done, total, 'Paid %d of %d employees.' % (done, total)),
+    )
+    return {'run': run.pk, 'employees': run.employee_count, 'total': run.total}
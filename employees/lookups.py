@@ -0,0 +1,120 @@
+"""
+Departments and positions, kept in process memory.
+
+Both tables hold a few dozen rows read by nearly every page (form choices,
+the names shown for each employee) and written rarely, so each process
+loads them once. Database triggers give every write to either table a new
+token in the LookupsVersion row, whichever process made it; a process
+reads the token once per request with the other data versions (see
+``employees.caching``) and reloads its copy when it differs from the one
+it loaded with.
+"""
+from django.db import DEFAULT_DB_ALIAS
+
+from .caching import lookups_version
+from .models import Department, Employee, Position
+
+
+def normalize_name(name):
+    """Key shared by the spellings of a name that differ only in case or whitespace."""
+    return ' '.join(str(name).split()).casefold()
+
+
+def version():
+    """Token of the current contents of both tables, changed by every write to either."""
+    return lookups_version()
+
+
+class LookupTable:
+    """The rows of a lookup model by id and by name, loaded from the primary database."""
+
+    def __init__(self, model):
+        self.model = model
+        # (token, {pk: obj}, {normalized name: obj}), replaced as a whole on reload
+        self._state = None
+
+    def _load(self):
+        token = version()
+        state = self._state
+        if state is None or state[0] != token:
+            objects = list(self.model._default_manager.using(DEFAULT_DB_ALIAS).order_by('name'))
+            state = (token, {obj.pk: obj for obj in objects},
+                     {normalize_name(obj.name): obj for obj in objects})
+            self._state = state
+        return state
+
+    def by_pk(self):
+        """``{pk: row}`` of every row, in name order."""
+        return self._load()[1]
+
+    def all(self):
+        """Every row, ordered by name."""
+        return list(self.by_pk().values())
+
+    def get(self, pk):
+        return self.by_pk().get(pk)
+
+    def find(self, name):
+        """The row named ``name`` (ignoring case and extra whitespace), or None."""
+        return self._load()[2].get(normalize_name(name))
+
+    def choices(self):
+        return [(obj.name, obj.name) for obj in self.all()]
+
+
+departments = LookupTable(Department)
+positions = LookupTable(Position)
+
+# Employee field name -> table of the rows it refers to
+TABLES = {'department': departments, 'position': positions}
+
+
+def name_of(field, value):
+    """Name of the department or position ``value`` (an instance, an id or already a name)."""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (Department, Position)):
+        return value.name
+    obj = TABLES[field].get(value)
+    return obj.name if obj is not None else None
+
+
+def with_lookups(employees):
+    """
+    Attach departments and positions from memory to ``employees``, so reading them runs no query.
+
+    Returns ``employees``.
+    """
+    for field, table in TABLES.items():
+        descriptor = Employee._meta.get_field(field)
+        by_pk = table.by_pk()
+        for employee in employees:
+            obj = by_pk.get(getattr(employee, descriptor.attname))
+            if obj is not None:
+                descriptor.set_cached_value(employee, obj)
+    return employees
+
+
+def name_values(rows):
+    """Replace the department and position ids of ``values()`` rows with their names, in place; returns ``rows``."""
+    for field, table in TABLES.items():
+        if rows and field in rows[0]:
+            by_pk = table.by_pk()
+            for row in rows:
+                obj = by_pk.get(row[field])
+                row[field] = obj.name if obj is not None else None
+    return rows
+
+
+def name_tuples(rows, fields):
+    """Yield the ``values_list()`` tuples ``rows`` of ``fields`` with department and position names instead of ids."""
+    columns = [(index, TABLES[field].by_pk()) for index, field in enumerate(fields) if field in TABLES]
+    if not columns:
+        yield from rows
+        return
+    for row in rows:
+        row = list(row)
+        for index, by_pk in columns:
+            obj = by_pk.get(row[index])
+            row[index] = obj.name if obj is not None else None
+        yield tuple(row)
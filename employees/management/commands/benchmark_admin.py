@@ -0,0 +1,151 @@
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+from django.test import RequestFactory, override_settings
+
+from employees.admin import EmployeeAdmin
+from employees.metrics import measure_request
+from employees.models import Employee
+from employees.routers import REPLICA_DB_ALIAS, primary_reads
+from employees.seeding import seed_employees, seed_users
+
+from .benchmark_views import BENCHMARK_USERNAME, git_revision
+
+
+class StockEmployeeAdmin(admin.ModelAdmin):
+    """The employee changelist as Django builds it by default: exact counts, LIKE search, sort by name."""
+    list_display = ('employee_id', 'name', 'department', 'position', 'salary', 'hire_date', 'email',
+                    'created_by', 'updated_by')
+    search_fields = ('employee_id', 'name', 'email')
+    list_filter = ('department', 'position')
+    ordering = ('name',)
+
+
+CONFIGURATIONS = {'stock': StockEmployeeAdmin, 'tuned': EmployeeAdmin}
+
+
+class Command(BaseCommand):
+    help = ('Time the employee admin changelist, as configured and as stock Django would build it, '
+            'on a scratch database with the given number of employees.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Employees in the scratch database.')
+        parser.add_argument('--repeat', type=int, default=5, help='Requests per scenario; the median is reported.')
+        parser.add_argument('--seed', type=int, default=42, help='Seed of the generated employees.')
+        parser.add_argument('--in-place', action='store_true',
+                            help='Use the configured database instead of a scratch copy.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def scenarios(self):
+        """name -> changelist query string, for the largest department and position and a common surname."""
+        group = (Employee.objects.values('department_id', 'position_id')
+                 .annotate(n=Count('id')).order_by('-n').first())
+        surname = Employee.objects.order_by('pk').values_list('name', flat=True).first().split()[-1]
+        # Column 6 of list_display is hire_date in both configurations
+        return {
+            'default': '',
+            'page_100': 'p=100',
+            'department': 'department__id__exact=%d' % group['department_id'],
+            'department_position': 'department__id__exact=%d&position__id__exact=%d' % (
+                group['department_id'], group['position_id']),
+            'search': 'q=%s' % surname,
+            'sort_hire_date': 'o=-6',
+        }
+
+    def measure(self, model_admin, user, query, repeat):
+        factory = RequestFactory()
+        timings, queries = [], []
+        for _ in range(repeat + 1):
+            request = factory.get('/admin/employees/employee/?' + query)
+            request.user = user
+            # The routing block of ReplicaRoutingMiddleware, which reads the data versions once
+            with measure_request() as metrics, primary_reads():
+                start = time.perf_counter()
+                response = model_admin.changelist_view(request)
+                response.render()
+                timings.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise CommandError('The changelist answered %d to ?%s.' % (response.status_code, query))
+            queries.append(metrics.queries)
+        # The first request fills the caches
+        timings, queries = timings[1:], queries[1:]
+        return {
+            'median_ms': round(statistics.median(timings) * 1000, 2),
+            'queries': round(statistics.mean(queries), 2),
+        }
+
+    def run(self, options):
+        user, _ = User.objects.get_or_create(
+            username=BENCHMARK_USERNAME, defaults={'is_staff': True, 'is_superuser': True}
+        )
+        missing = options['rows'] - Employee.objects.count()
+        if missing > 0:
+            if options['verbosity'] > 0:
+                self.stderr.write('Seeding %d employees...' % missing)
+            users = seed_users(100, seed=options['seed']) if not options['in_place'] else ()
+            seed_employees(missing, seed=options['seed'], users=users)
+        if not Employee.objects.exists():
+            raise CommandError('No employees to benchmark; use a positive --rows.')
+        with connections['default'].cursor() as cursor:
+            cursor.execute('ANALYZE')
+        results = {'rows': Employee.objects.count(), 'scenarios': {}}
+        for name, query in self.scenarios().items():
+            results['scenarios'][name] = {'query': query}
+            for configuration, admin_class in CONFIGURATIONS.items():
+                if options['verbosity'] > 1:
+                    self.stderr.write('  %s, %s' % (name, configuration))
+                model_admin = admin_class(Employee, admin.site)
+                results['scenarios'][name][configuration] = self.measure(model_admin, user, query, options['repeat'])
+        return results
+
+    def run_on_scratch_database(self, options):
+        connection = connections['default']
+        old_name = connection.settings_dict['NAME']
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        previous_test_name = test_settings.get('NAME')
+        directory = tempfile.mkdtemp(prefix='benchmark_admin')
+        if connection.vendor == 'sqlite':
+            test_settings['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        replica = connections.databases.pop(REPLICA_DB_ALIAS, None)
+        try:
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                return self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        finally:
+            if replica is not None:
+                connections.databases[REPLICA_DB_ALIAS] = replica
+            test_settings['NAME'] = previous_test_name
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['repeat'] < 1:
+            raise CommandError('--rows and --repeat must be positive.')
+        results = {'git_revision': git_revision(), 'repeat': options['repeat']}
+        # DEBUG would keep every query in memory and skew the timings
+        with override_settings(DEBUG=False, QUERY_BUDGETS_ENFORCED=False):
+            if options['in_place']:
+                results.update(self.run(options))
+            else:
+                results.update(self.run_on_scratch_database(options))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write('Employee changelist, %d employees, median of %d requests' % (
+            results['rows'], options['repeat']))
+        self.stdout.write('  %-22s %12s %9s %12s %9s' % ('scenario', 'stock ms', 'queries', 'tuned ms', 'queries'))
+        for name, scenario in results['scenarios'].items():
+            self.stdout.write('  %-22s %12.2f %9.2f %12.2f %9.2f' % (
+                name, scenario['stock']['median_ms'], scenario['stock']['queries'],
+                scenario['tuned']['median_ms'], scenario['tuned']['queries']))
@@ -0,0 +1,65 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.template.loader import render_to_string
+
+from employees.api import API_FIELDS
+from employees.constants import EmployeeConstants
+from employees.forms import EmployeeFilterForm
+from employees.models import Employee
+
+
+class Command(BaseCommand):
+    help = 'Compare the per-row cost of the JSON API path with the HTML template path.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows per measured page.')
+        parser.add_argument('--repeat', type=int, default=5, help='Measured runs per path.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def template_path(self, rows):
+        employees = list(Employee.objects.order_by('-created_at', '-pk')[:rows])
+        return render_to_string(EmployeeConstants.TEMPLATE_LIST, {
+            'employees': employees,
+            'filter_form': EmployeeFilterForm(),
+        })
+
+    def api_path(self, rows):
+        data = list(Employee.objects.order_by('-created_at', '-pk').values(*API_FIELDS)[:rows])
+        return json.dumps({'results': data}, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+    def measure(self, func, rows, repeat):
+        func(rows)  # warm up templates and the query cache of SQLite
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = func(rows)
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings), len(body.encode('utf-8'))
+
+    def handle(self, *args, **options):
+        rows = min(options['rows'], Employee.objects.count())
+        if rows < 1:
+            raise CommandError('No employees to benchmark; import or seed some first.')
+
+        results = {'rows': rows}
+        for name, func in (('template', self.template_path), ('api', self.api_path)):
+            seconds, size = self.measure(func, rows, max(options['repeat'], 1))
+            results[name] = {
+                'seconds': round(seconds, 6),
+                'us_per_row': round(seconds / rows * 1e6, 2),
+                'bytes': size,
+            }
+        results['speedup'] = round(results['template']['seconds'] / results['api']['seconds'], 2)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write('%d rows per page (median of %d runs)' % (rows, options['repeat']))
+        for name in ('template', 'api'):
+            r = results[name]
+            self.stdout.write('  %-8s %9.2f us/row  %10d bytes' % (name, r['us_per_row'], r['bytes']))
+        self.stdout.write(self.style.SUCCESS('API path is %.2fx faster per row' % results['speedup']))
@@ -0,0 +1,202 @@
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+
+from employees.hashers import PBKDF2PasswordHasher
+from employees.metrics import measure_request
+from employees.middleware import UserProfileMiddleware
+from employees.profiles import get_user_profile
+from employees.routers import REPLICA_DB_ALIAS
+
+from .benchmark_views import git_revision, percentile
+
+USERNAME_PREFIX = 'benchmark-login-'
+PASSWORD = 'benchmark-password'
+
+# name -> (SESSION_ENGINE, authentication backend)
+AUTH_CONFIGURATIONS = {
+    'db': ('django.contrib.sessions.backends.db', 'django.contrib.auth.backends.ModelBackend'),
+    'cached_db': ('django.contrib.sessions.backends.cached_db', 'django.contrib.auth.backends.ModelBackend'),
+    'cached_db+cached_user': ('django.contrib.sessions.backends.cached_db', 'employees.backends.CachedModelBackend'),
+    'signed_cookies+cached_user': ('django.contrib.sessions.backends.signed_cookies',
+                                   'employees.backends.CachedModelBackend'),
+}
+
+
+def authenticated_view(request):
+    """What every page does with the session: resolve the user and their profile."""
+    request.user.is_authenticated and request.user_profile.pk
+    return HttpResponse()
+
+
+class Command(BaseCommand):
+    help = ('Measure logins per second through the login view at PBKDF2 iteration counts, and the '
+            'time and queries that resolving the session, user and profile adds to every request '
+            'with each session engine and authentication backend.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', default='',
+                            help='Comma separated PBKDF2 iteration counts (default: the configured count, '
+                                 'half and a quarter of it).')
+        parser.add_argument('--logins', type=int, default=50, help='Logins measured at each iteration count.')
+        parser.add_argument('--users', type=int, default=20, help='Users the logins are spread over.')
+        parser.add_argument('--requests', type=int, default=500,
+                            help='Authenticated requests measured with each configuration.')
+        parser.add_argument('--in-place', action='store_true',
+                            help='Use the configured database instead of a scratch copy.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def create_users(self, count):
+        """Benchmark users with a profile each; their passwords are set per iteration count."""
+        existing = set(User.objects.filter(username__startswith=USERNAME_PREFIX).values_list('username', flat=True))
+        User.objects.bulk_create([
+            User(username='%s%03d' % (USERNAME_PREFIX, n)) for n in range(count)
+            if '%s%03d' % (USERNAME_PREFIX, n) not in existing
+        ])
+        users = list(User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('username')[:count])
+        for user in users:
+            get_user_profile(user)
+        return users
+
+    def measure_logins(self, users, iterations, logins):
+        with override_settings(PASSWORD_HASH_ITERATIONS=iterations):
+            hasher = PBKDF2PasswordHasher()
+            # One hash for every user, so they need no rehash when logging in
+            encoded = hasher.encode(PASSWORD, hasher.salt())
+            User.objects.filter(pk__in=[user.pk for user in users]).update(password=encoded)
+            start = time.perf_counter()
+            hasher.verify(PASSWORD, encoded)
+            verify_seconds = time.perf_counter() - start
+
+            url = reverse('employees:login')
+            timings, queries = [], []
+            for n in range(logins):
+                client = Client()
+                with measure_request() as metrics:
+                    start = time.perf_counter()
+                    response = client.post(url, {'username': users[n % len(users)].username, 'password': PASSWORD})
+                    timings.append(time.perf_counter() - start)
+                if response.status_code != 302:
+                    raise CommandError('Login failed with status %d.' % response.status_code)
+                queries.append(metrics.queries)
+        return {
+            'iterations': iterations,
+            'verify_ms': round(verify_seconds * 1000, 2),
+            'logins_per_s': round(len(timings) / sum(timings), 1),
+            'p50_ms': round(percentile(timings, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+            'queries': round(statistics.mean(queries), 2),
+        }
+
+    def measure_auth(self, user, engine, backend, requests):
+        """Time the session, authentication and profile middleware on requests of a logged in user."""
+        # The session keeps a hash of the password, as set by the last measure_logins()
+        user.refresh_from_db()
+        with override_settings(SESSION_ENGINE=engine, AUTHENTICATION_BACKENDS=[backend]):
+            client = Client()
+            client.force_login(user)
+            cookie = '%s=%s' % (settings.SESSION_COOKIE_NAME, client.cookies[settings.SESSION_COOKIE_NAME].value)
+            handler = SessionMiddleware(AuthenticationMiddleware(UserProfileMiddleware(authenticated_view)))
+            factory = RequestFactory()
+            batch = [factory.get('/', HTTP_COOKIE=cookie) for _ in range(requests + 1)]
+            handler(batch.pop())  # warm up the caches
+            timings, queries = [], []
+            for request in batch:
+                with measure_request() as metrics:
+                    start = time.perf_counter()
+                    handler(request)
+                    timings.append(time.perf_counter() - start)
+                if not request.user.is_authenticated:
+                    raise CommandError('The session of %s was not accepted.' % user.username)
+                queries.append(metrics.queries)
+        return {
+            'us_per_request': round(statistics.median(timings) * 1e6, 1),
+            'queries': round(statistics.mean(queries), 2),
+        }
+
+    def run(self, iteration_counts, options):
+        users = self.create_users(options['users'])
+        results = {'logins': [], 'auth_per_request': {}}
+        for iterations in iteration_counts:
+            if options['verbosity'] > 0:
+                self.stderr.write('Logging in at %d iterations...' % iterations)
+            results['logins'].append(self.measure_logins(users, iterations, options['logins']))
+        for name, (engine, backend) in AUTH_CONFIGURATIONS.items():
+            cache.clear()
+            results['auth_per_request'][name] = self.measure_auth(users[0], engine, backend, options['requests'])
+        return results
+
+    def run_on_scratch_database(self, iteration_counts, options):
+        connection = connections['default']
+        old_name = connection.settings_dict['NAME']
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        previous_test_name = test_settings.get('NAME')
+        directory = tempfile.mkdtemp(prefix='benchmark_login')
+        if connection.vendor == 'sqlite':
+            test_settings['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        replica = connections.databases.pop(REPLICA_DB_ALIAS, None)
+        try:
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                return self.run(iteration_counts, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        finally:
+            if replica is not None:
+                connections.databases[REPLICA_DB_ALIAS] = replica
+            test_settings['NAME'] = previous_test_name
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def handle(self, *args, **options):
+        try:
+            iteration_counts = [int(n) for n in options['iterations'].split(',') if n.strip()]
+        except ValueError:
+            raise CommandError('--iterations must be a comma separated list of integers.')
+        if not iteration_counts:
+            configured = PBKDF2PasswordHasher().iterations
+            iteration_counts = [configured, configured // 2, configured // 4]
+        if min(iteration_counts) < 1 or options['logins'] < 1 or options['users'] < 1 or options['requests'] < 1:
+            raise CommandError('--iterations, --logins, --users and --requests must be positive.')
+
+        results = {
+            'git_revision': git_revision(),
+            'default_hasher': hashers.get_hasher('default').algorithm,
+            'configured_iterations': PBKDF2PasswordHasher().iterations,
+        }
+        # DEBUG would keep every query in memory and skew the timings
+        with override_settings(DEBUG=False, QUERY_BUDGETS_ENFORCED=False):
+            if options['in_place']:
+                results.update(self.run(iteration_counts, options))
+            else:
+                results.update(self.run_on_scratch_database(iteration_counts, options))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write('Logins, %d per iteration count (%d configured)' % (
+            options['logins'], results['configured_iterations']))
+        self.stdout.write('  %10s %10s %10s %9s %9s %8s' % (
+            'iterations', 'verify ms', 'logins/s', 'p50 ms', 'p95 ms', 'queries'))
+        for run in results['logins']:
+            self.stdout.write('  %10d %10.2f %10.1f %9.2f %9.2f %8.2f' % (
+                run['iterations'], run['verify_ms'], run['logins_per_s'], run['p50_ms'], run['p95_ms'],
+                run['queries']))
+        self.stdout.write('Session, user and profile per authenticated request, median of %d' % options['requests'])
+        self.stdout.write('  %-28s %10s %8s' % ('configuration', 'us', 'queries'))
+        for name, run in results['auth_per_request'].items():
+            self.stdout.write('  %-28s %10.1f %8.2f' % (name, run['us_per_request'], run['queries']))
@@ -0,0 +1,175 @@
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from employees.models import Department, Position
+from employees.seeding import DEPARTMENTS, generate_employee
+
+from .benchmark_views import git_revision
+
+# The employee table with department and position stored as text on every
+# row (before migration 0011) and as ids into the lookup tables (after it),
+# both with the composite index of the filters.
+SCHEMAS = {
+    'names': [
+        'CREATE TABLE employee (id integer NOT NULL PRIMARY KEY, employee_id varchar(20) NOT NULL UNIQUE, '
+        'name varchar(100) NOT NULL, department varchar(100) NOT NULL, position varchar(100) NOT NULL, '
+        'salary decimal NOT NULL, email varchar(254) NOT NULL UNIQUE, hire_date date NOT NULL)',
+        'CREATE INDEX employee_dept_position_idx ON employee (department, position)',
+    ],
+    'ids': [
+        'CREATE TABLE department (id integer NOT NULL PRIMARY KEY, name varchar(100) NOT NULL UNIQUE)',
+        'CREATE TABLE position (id integer NOT NULL PRIMARY KEY, name varchar(100) NOT NULL UNIQUE)',
+        'CREATE TABLE employee (id integer NOT NULL PRIMARY KEY, employee_id varchar(20) NOT NULL UNIQUE, '
+        'name varchar(100) NOT NULL, department_id integer NOT NULL REFERENCES department (id), '
+        'position_id integer NOT NULL REFERENCES position (id), '
+        'salary decimal NOT NULL, email varchar(254) NOT NULL UNIQUE, hire_date date NOT NULL)',
+        'CREATE INDEX employee_dept_position_idx ON employee (department_id, position_id)',
+    ],
+}
+# name -> (SQL with the names, SQL with the ids); parameters are a department and a position
+QUERIES = {
+    'filter_department': (
+        'SELECT COUNT(*), SUM(salary) FROM employee WHERE department = ?',
+        'SELECT COUNT(*), SUM(salary) FROM employee WHERE department_id = ?',
+    ),
+    'filter_department_position': (
+        'SELECT id, name, salary FROM employee WHERE department = ? AND position = ?',
+        'SELECT id, name, salary FROM employee WHERE department_id = ? AND position_id = ?',
+    ),
+    'group_by_department_position': (
+        'SELECT department, position, COUNT(*), AVG(salary) FROM employee GROUP BY department, position',
+        'SELECT department_id, position_id, COUNT(*), AVG(salary) FROM employee '
+        'GROUP BY department_id, position_id',
+    ),
+    'distinct_departments': (
+        'SELECT DISTINCT department FROM employee ORDER BY department',
+        'SELECT DISTINCT department_id FROM employee ORDER BY department_id',
+    ),
+}
+INSERT_BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = ('Compare the size of the employee table and its indexes, and the time of filtered '
+            'and grouped queries, with department and position stored as text and as ids '
+            'into lookup tables, on two scratch SQLite databases.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Employees in each scratch database.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs of each query; the median is reported.')
+        parser.add_argument('--seed', type=int, default=42, help='Seed of the generated employees.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def lookups(self):
+        """Unsaved departments and positions with ids, in the shape generate_employee() takes."""
+        position_names = sorted({position for _, positions in DEPARTMENTS.values() for position, _, _ in positions})
+        departments = {name: Department(pk=pk, name=name) for pk, name in enumerate(sorted(DEPARTMENTS), 1)}
+        positions = {name: Position(pk=pk, name=name) for pk, name in enumerate(position_names, 1)}
+        return departments, positions
+
+    def fill(self, databases, rows, seed):
+        seeded = self.lookups()
+        for table, objects in zip(('department', 'position'), seeded):
+            databases['ids'].executemany('INSERT INTO %s (id, name) VALUES (?, ?)' % table,
+                                         [(obj.pk, obj.name) for obj in objects.values()])
+        insert = 'INSERT INTO employee VALUES (?, ?, ?, ?, ?, ?, ?, ?)'
+        for start in range(1, rows + 1, INSERT_BATCH_SIZE):
+            batch = {'names': [], 'ids': []}
+            for n in range(start, min(start + INSERT_BATCH_SIZE, rows + 1)):
+                e = generate_employee(n, seed, seeded)
+                common = (n, e.employee_id, e.name)
+                rest = (str(e.salary), e.email, e.hire_date.isoformat())
+                batch['names'].append(common + (e.department.name, e.position.name) + rest)
+                batch['ids'].append(common + (e.department.pk, e.position.pk) + rest)
+            for name, connection in databases.items():
+                connection.executemany(insert, batch[name])
+        for connection in databases.values():
+            connection.commit()
+            connection.execute('VACUUM')
+            connection.execute('ANALYZE')
+        return seeded
+
+    def sizes(self, connection):
+        """Bytes on disk of the employee table, of its indexes and of the whole database."""
+        pages = dict(connection.execute('SELECT name, SUM(pgsize) FROM dbstat GROUP BY name'))
+        indexes = [name for name, in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'employee'")]
+        page_size, = connection.execute('PRAGMA page_size').fetchone()
+        page_count, = connection.execute('PRAGMA page_count').fetchone()
+        return {
+            'table_bytes': pages.get('employee', 0),
+            'index_bytes': {name: pages.get(name, 0) for name in sorted(indexes)},
+            'database_bytes': page_size * page_count,
+        }
+
+    def time_query(self, connection, sql, params, repeat):
+        connection.execute(sql, params).fetchall()  # warm up the page cache
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            connection.execute(sql, params).fetchall()
+            timings.append(time.perf_counter() - start)
+        return round(statistics.median(timings) * 1000, 3)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        if rows < 1 or repeat < 1:
+            raise CommandError('--rows and --repeat must be positive.')
+        directory = tempfile.mkdtemp(prefix='benchmark_lookups')
+        databases = {}
+        try:
+            for name, statements in SCHEMAS.items():
+                databases[name] = sqlite3.connect(os.path.join(directory, '%s.sqlite3' % name))
+                for statement in statements:
+                    databases[name].execute(statement)
+            if options['verbosity'] > 0:
+                self.stderr.write('Generating %d employees...' % rows)
+            departments, positions = self.fill(databases, rows, options['seed'])
+            # The most common department, and its most common position
+            department = departments[max(DEPARTMENTS, key=lambda name: DEPARTMENTS[name][0])]
+            position = positions[DEPARTMENTS[department.name][1][0][0]]
+            params = {
+                'names': (department.name, position.name),
+                'ids': (department.pk, position.pk),
+            }
+            results = {
+                'git_revision': git_revision(),
+                'rows': rows,
+                'repeat': repeat,
+                'sqlite_version': sqlite3.sqlite_version,
+                'sizes': {name: self.sizes(connection) for name, connection in databases.items()},
+                'query_ms': {},
+            }
+            for query, statements in QUERIES.items():
+                results['query_ms'][query] = {}
+                for (name, connection), sql in zip(databases.items(), statements):
+                    results['query_ms'][query][name] = self.time_query(
+                        connection, sql, params[name][:sql.count('?')], repeat)
+        finally:
+            for connection in databases.values():
+                connection.close()
+            shutil.rmtree(directory, ignore_errors=True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        sizes = results['sizes']
+        self.stdout.write('%d employees, median of %d runs, SQLite %s' % (rows, repeat, results['sqlite_version']))
+        self.stdout.write('  %-30s %14s %14s' % ('bytes', 'names', 'ids'))
+        self.stdout.write('  %-30s %14d %14d' % ('employee table', sizes['names']['table_bytes'],
+                                                 sizes['ids']['table_bytes']))
+        for index in sizes['names']['index_bytes']:
+            self.stdout.write('  %-30s %14d %14d' % (index, sizes['names']['index_bytes'][index],
+                                                     sizes['ids']['index_bytes'].get(index, 0)))
+        self.stdout.write('  %-30s %14d %14d' % ('database', sizes['names']['database_bytes'],
+                                                 sizes['ids']['database_bytes']))
+        self.stdout.write('  %-30s %14s %14s' % ('query ms', 'names', 'ids'))
+        for query, timings in results['query_ms'].items():
+            self.stdout.write('  %-30s %14.3f %14.3f' % (query, timings['names'], timings['ids']))
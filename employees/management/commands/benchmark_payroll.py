@@ -0,0 +1,141 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import override_settings
+
+from employees import payroll
+from employees.models import Employee, PayrollEntry
+from employees.routers import REPLICA_DB_ALIAS
+from employees.seeding import seed_employees
+
+from .benchmark_views import git_revision
+
+FIELDS = ('days_paid', 'gross', 'prorated', 'bonus', 'total')
+
+
+class Command(BaseCommand):
+    help = ('Measure the payroll throughput in employees per second: computed per model instance with '
+            'Decimal, computed in NumPy chunks, and run end to end with the entries written; then check '
+            'every stored entry against the Decimal computation.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Employees in the scratch database.')
+        parser.add_argument('--period', default='2024-06', help='The month paid, as YYYY-MM.')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Employees per chunk (default: PAYROLL_CHUNK_SIZE).')
+        parser.add_argument('--in-place', action='store_true',
+                            help='Use the configured database instead of a scratch copy.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def throughput(self, employees, seconds):
+        return {'employees': employees, 'seconds': round(seconds, 3),
+                'employees_per_s': round(employees / seconds, 1) if seconds else None}
+
+    def measure_decimal(self, period, last_day):
+        start = time.perf_counter()
+        count = 0
+        for employee in Employee.objects.filter(hire_date__lte=last_day).order_by('pk').iterator(chunk_size=2000):
+            payroll.decimal_entry(employee.salary, employee.hire_date, period)
+            count += 1
+        return self.throughput(count, time.perf_counter() - start)
+
+    def measure_numpy(self, period, last_day, chunk_size):
+        start = time.perf_counter()
+        count = 0
+        for ids, salary_cents, hire_dates, departments in payroll.iter_chunks(last_day, chunk_size):
+            payroll.compute_chunk(salary_cents, hire_dates, period)
+            count += len(ids)
+        return self.throughput(count, time.perf_counter() - start)
+
+    def count_mismatches(self, run, period, last_day):
+        """Number of employees whose stored entry differs from the Decimal computation, or is missing."""
+        employees = (Employee.objects.filter(hire_date__lte=last_day).order_by('pk')
+                     .values_list('pk', 'salary', 'hire_date').iterator(chunk_size=2000))
+        entries = (PayrollEntry.objects.filter(run=run).order_by('employee_id')
+                   .values_list('employee_id', *FIELDS).iterator(chunk_size=2000))
+        mismatches = 0
+        for (pk, salary, hire_date), entry in zip(employees, entries):
+            expected = payroll.decimal_entry(salary, hire_date, period)
+            if entry != (pk,) + tuple(expected[field] for field in FIELDS):
+                mismatches += 1
+        return mismatches + abs(run.employee_count - Employee.objects.filter(hire_date__lte=last_day).count())
+
+    def run(self, period, options):
+        if not options['in_place']:
+            missing = options['rows'] - Employee.objects.count()
+            if missing > 0:
+                if options['verbosity'] > 0:
+                    self.stderr.write('Seeding %d employees...' % missing)
+                seed_employees(missing)
+        last_day = payroll.month_bounds(period)[1]
+        chunk_size = options['chunk_size'] or settings.PAYROLL_CHUNK_SIZE
+        results = {'rows': Employee.objects.count(), 'chunk_size': chunk_size}
+        if options['verbosity'] > 0:
+            self.stderr.write('Computing the payroll of %d employees...' % results['rows'])
+        results['decimal'] = self.measure_decimal(period, last_day)
+        results['numpy'] = self.measure_numpy(period, last_day, chunk_size)
+        start = time.perf_counter()
+        run = payroll.run_payroll(period, replace=True, chunk_size=chunk_size)
+        results['run_payroll'] = self.throughput(run.employee_count, time.perf_counter() - start)
+        results['run_payroll']['timings'] = {phase: round(value, 3) for phase, value in run.timings.items()}
+        results['mismatches'] = self.count_mismatches(run, period, last_day)
+        return results
+
+    def run_on_scratch_database(self, period, options):
+        connection = connections['default']
+        old_name = connection.settings_dict['NAME']
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        previous_test_name = test_settings.get('NAME')
+        directory = tempfile.mkdtemp(prefix='benchmark_payroll')
+        if connection.vendor == 'sqlite':
+            test_settings['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        replica = connections.databases.pop(REPLICA_DB_ALIAS, None)
+        try:
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                return self.run(period, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        finally:
+            if replica is not None:
+                connections.databases[REPLICA_DB_ALIAS] = replica
+            test_settings['NAME'] = previous_test_name
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def handle(self, *args, **options):
+        try:
+            period = payroll.parse_period(options['period'])
+        except ValueError:
+            raise CommandError('--period must be a month as YYYY-MM.')
+        if options['rows'] < 1 or (options['chunk_size'] is not None and options['chunk_size'] < 1):
+            raise CommandError('--rows and --chunk-size must be positive.')
+        results = {'git_revision': git_revision(), 'period': options['period']}
+        # DEBUG would keep every query in memory and skew the timings
+        with override_settings(DEBUG=False):
+            if options['in_place']:
+                results.update(self.run(period, options))
+            else:
+                results.update(self.run_on_scratch_database(period, options))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write('Payroll of %s, %d employees, chunks of %d' % (
+            results['period'], results['rows'], results['chunk_size']))
+        self.stdout.write('  %-32s %10s %10s %14s' % ('', 'employees', 'seconds', 'employees/s'))
+        for name, label in (('decimal', 'Decimal per model instance'), ('numpy', 'NumPy chunks (compute only)'),
+                            ('run_payroll', 'run_payroll (entries written)')):
+            run = results[name]
+            self.stdout.write('  %-32s %10d %10.3f %14.1f' % (
+                label, run['employees'], run['seconds'], run['employees_per_s'] or 0))
+        timings = results['run_payroll']['timings']
+        self.stdout.write('  run_payroll: read %.3fs, compute %.3fs, write %.3fs' % (
+            timings['read'], timings['compute'], timings['write']))
+        style = self.style.SUCCESS if results['mismatches'] == 0 else self.style.ERROR
+        self.stdout.write(style('%d entries differ from the Decimal computation.' % results['mismatches']))
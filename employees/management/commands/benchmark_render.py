@@ -0,0 +1,128 @@
+import datetime
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.template import Engine, engines
+
+from employees.constants import EmployeeConstants
+from employees.rendering import render_rows, row_key
+from employees.seeding import generate_employee
+
+from .benchmark_views import git_revision
+
+# The rows of employee_list.html before they were cached: two {% url %} tags
+# and the floatformat and date filters evaluated for every row of every page.
+PER_ROW_TEMPLATE = '''{% for employee in employees %}
+            <tr>
+                <td><input type="checkbox" name="ids" value="{{ employee.pk }}"></td>
+                <td>{{ employee.employee_id }}</td>
+                <td>{{ employee.name }}</td>
+                <td>{{ employee.department }}</td>
+                <td>{{ employee.position }}</td>
+                <td>${{ employee.salary|floatformat:2 }}</td>
+                <td>{{ employee.hire_date|date:"M d, Y" }}</td>
+                <td>{{ employee.email }}</td>
+                <td class="actions">
+                    <a href="{% url 'employees:employee_update_form' employee.pk %}" class="btn btn-edit">Edit</a>
+                    <a href="{% url 'employees:employee_delete_confirm' employee.pk %}" class="btn btn-danger">Delete</a>
+                </td>
+            </tr>
+{% endfor %}'''
+CACHED_ROWS_TEMPLATE = '''{% for row in rows %}
+            {{ row }}
+{% endfor %}'''
+
+
+class Command(BaseCommand):
+    help = ('Time the rendering of the employee table per 1,000 rows with per-row tags and with '
+            'cached row fragments, and the loading of employee_list.html with and without the '
+            'cached template loader.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows rendered per measurement.')
+        parser.add_argument('--repeat', type=int, default=10, help='Measurements of each strategy; the median is reported.')
+        parser.add_argument('--seed', type=int, default=42, help='Seed of the generated employees.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def employees(self, rows, seed):
+        """Unsaved employees with the pk and updated_at a fragment is keyed on; no database needed."""
+        updated_at = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        employees = []
+        for n in range(1, rows + 1):
+            employee = generate_employee(n, seed)
+            employee.pk = n
+            employee.updated_at = updated_at
+            employees.append(employee)
+        return employees
+
+    def time_it(self, function, repeat, before=None):
+        timings = []
+        for _ in range(repeat):
+            if before is not None:
+                before()
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        if rows < 1 or repeat < 1:
+            raise CommandError('--rows and --repeat must be positive.')
+        employees = self.employees(rows, options['seed'])
+        keys = [row_key(employee) for employee in employees]
+        backend = engines.all()[0]
+        per_row = backend.from_string(PER_ROW_TEMPLATE)
+        cached_rows = backend.from_string(CACHED_ROWS_TEMPLATE)
+
+        def clear_rows():
+            cache.delete_many(keys)
+
+        def render_cached():
+            cached_rows.render({'rows': render_rows(employees)})
+
+        per_1000 = 1000.0 / rows
+        results = {
+            'git_revision': git_revision(),
+            'rows': rows,
+            'repeat': repeat,
+            'cache_backend': settings.CACHES['default']['BACKEND'],
+            'render_ms_per_1000_rows': {},
+            'load_ms': {},
+        }
+        try:
+            timings = results['render_ms_per_1000_rows']
+            timings['per_row_tags'] = self.time_it(lambda: per_row.render({'employees': employees}), repeat)
+            timings['fragments_cold'] = self.time_it(render_cached, repeat, before=clear_rows)
+            render_cached()
+            timings['fragments_warm'] = self.time_it(render_cached, repeat)
+            for name in timings:
+                timings[name] = round(timings[name] * 1000 * per_1000, 2)
+        finally:
+            clear_rows()
+
+        # Loading (reading and compiling) the page template, as every request does
+        uncached = Engine(dirs=backend.engine.dirs, libraries=backend.engine.libraries, loaders=[
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ])
+        backend.engine.get_template(EmployeeConstants.TEMPLATE_LIST)
+        results['load_ms']['uncached_loader'] = round(self.time_it(
+            lambda: uncached.get_template(EmployeeConstants.TEMPLATE_LIST), repeat) * 1000, 3)
+        results['load_ms']['cached_loader'] = round(self.time_it(
+            lambda: backend.engine.get_template(EmployeeConstants.TEMPLATE_LIST), repeat) * 1000, 3)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write('%d rows, median of %d renders, %s' % (rows, repeat, results['cache_backend']))
+        self.stdout.write('  %-22s %14s' % ('table rows', 'ms per 1,000'))
+        for name, value in results['render_ms_per_1000_rows'].items():
+            self.stdout.write('  %-22s %14.2f' % (name, value))
+        self.stdout.write('  %-22s %14s' % ('employee_list.html', 'load ms'))
+        for name, value in results['load_ms'].items():
+            self.stdout.write('  %-22s %14.3f' % (name, value))
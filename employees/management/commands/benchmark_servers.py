@@ -0,0 +1,265 @@
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from employees.models import Employee
+from employees.routers import REPLICA_DB_ALIAS
+from employees.seeding import seed_employees
+
+from .benchmark_views import BENCHMARK_USERNAME, git_revision, percentile
+
+# name -> environment of gunicorn.conf.py
+SERVERS = {
+    'wsgi': {'GUNICORN_APP': 'hrmanage.wsgi:application', 'GUNICORN_WORKER_CLASS': 'sync'},
+    'asgi': {'GUNICORN_APP': 'hrmanage.asgi:application', 'GUNICORN_WORKER_CLASS': 'uvicorn.workers.UvicornWorker'},
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def fetch(port, path, cookie):
+    """GET ``path`` on its own connection; returns the status code."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write((
+            'GET %s HTTP/1.1\r\nHost: 127.0.0.1:%d\r\nCookie: sessionid=%s\r\nConnection: close\r\n\r\n'
+            % (path, port, cookie)
+        ).encode())
+        await writer.drain()
+        head = await reader.readuntil(b'\r\n\r\n')
+        while await reader.read(65536):
+            pass
+        return int(head.split(b' ', 2)[1])
+    finally:
+        writer.close()
+
+
+async def slow_client(port, deadline):
+    """Hold a connection by sending one request header line per second, like a client on a bad network."""
+    while time.monotonic() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        except OSError:
+            await asyncio.sleep(0.1)
+            continue
+        try:
+            writer.write(b'GET /login/ HTTP/1.1\r\nHost: 127.0.0.1\r\n')
+            n = 0
+            while time.monotonic() < deadline and not reader.at_eof():
+                writer.write(b'X-Padding-%d: 1\r\n' % n)
+                await writer.drain()
+                n += 1
+                await asyncio.sleep(1)
+        except OSError:
+            pass
+        finally:
+            writer.close()
+
+
+async def load(port, paths, cookie, connections_count, slow_clients, seconds, seed):
+    """Keep ``connections_count`` requests in flight for ``seconds``; returns latencies and statuses."""
+    rng = random.Random(seed)
+    deadline = time.monotonic() + seconds
+    latencies, statuses, errors = [], {}, [0]
+
+    async def client():
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(fetch(port, rng.choice(paths), cookie), timeout=seconds)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+                errors[0] += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    slow = [asyncio.ensure_future(slow_client(port, deadline)) for _ in range(slow_clients)]
+    await asyncio.sleep(0.5 if slow_clients else 0)
+    await asyncio.gather(*(client() for _ in range(connections_count)))
+    for task in slow:
+        task.cancel()
+    await asyncio.gather(*slow, return_exceptions=True)
+    return latencies, statuses, errors[0]
+
+
+class Command(BaseCommand):
+    help = ('Load test the WSGI (gunicorn sync workers) and ASGI (gunicorn with uvicorn workers) '
+            'servers on a scratch database at increasing numbers of concurrent connections.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Employees seeded in the scratch database.')
+        parser.add_argument('--connections', default='10,50,200',
+                            help='Comma separated numbers of concurrent connections.')
+        parser.add_argument('--seconds', type=float, default=10.0, help='Duration of each run.')
+        parser.add_argument('--workers', type=int, default=2, help='Worker processes of each server.')
+        parser.add_argument('--slow-clients', type=int, default=0,
+                            help='Extra connections that trickle their request headers during each run.')
+        parser.add_argument('--servers', default='wsgi,asgi', help='Comma separated servers to measure.')
+        parser.add_argument('--seed', type=int, default=42, help='Seed of the generated data and requests.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def prepare(self, rows, seed):
+        """Seed the scratch database; returns the session cookie of a logged in user and the paths to request."""
+        seed_employees(rows, seed=seed)
+        user, _ = User.objects.get_or_create(username=BENCHMARK_USERNAME, defaults={'is_staff': True})
+        client = Client()
+        client.force_login(user)
+        rng = random.Random(seed)
+        pks = list(Employee.objects.values_list('pk', flat=True)[:1000])
+        paths = [reverse('employees:employee_list'), reverse('employees:api_employee_list')]
+        for term in ('Patel', 'Garcia', 'Chen'):
+            paths.append(reverse('employees:employee_search') + '?q=' + term)
+            paths.append(reverse('employees:api_employee_search') + '?q=' + term)
+        for pk in rng.sample(pks, min(20, len(pks))):
+            paths.append(reverse('employees:employee_detail', args=[pk]))
+            paths.append(reverse('employees:api_employee_detail', args=[pk]))
+        return client.cookies[settings.SESSION_COOKIE_NAME].value, paths
+
+    def start_server(self, name, database, workers):
+        port = free_port()
+        env = dict(
+            os.environ, **SERVERS[name],
+            DB_NAME=database, CACHE_LOCATION='%s.%s.cache' % (database, name), DJANGO_DEBUG='0',
+            GUNICORN_BIND='127.0.0.1:%d' % port,
+            WEB_CONCURRENCY=str(workers), GUNICORN_ACCESS_LOG='', QUERY_BUDGETS_ENFORCED='0',
+        )
+        env.pop('DB_REPLICA_NAME', None)
+        log_path = database + '.%s.log' % name
+        with open(log_path, 'wb') as log:
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+                cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=log,
+            )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                with open(log_path, errors='replace') as log:
+                    raise CommandError('The %s server exited: %s' % (name, log.read()[-2000:]))
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return process, port
+            except OSError:
+                time.sleep(0.2)
+        process.kill()
+        raise CommandError('The %s server did not start listening.' % name)
+
+    def stop_server(self, process):
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def measure(self, name, database, cookie, paths, levels, options):
+        process, port = self.start_server(name, database, options['workers'])
+        try:
+            asyncio.run(load(port, paths, cookie, 1, 0, 1.0, options['seed']))  # warm up every worker
+            runs = []
+            for connections_count in levels:
+                latencies, statuses, errors = asyncio.run(load(
+                    port, paths, cookie, connections_count, options['slow_clients'],
+                    options['seconds'], options['seed']
+                ))
+                runs.append({
+                    'connections': connections_count,
+                    'requests_per_s': round(len(latencies) / options['seconds'], 1),
+                    'p50_ms': round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+                    'p95_ms': round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+                    'mean_ms': round(statistics.mean(latencies) * 1000, 1) if latencies else None,
+                    'status': {str(status): count for status, count in sorted(statuses.items())},
+                    'errors': errors,
+                })
+            return runs
+        finally:
+            self.stop_server(process)
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('benchmark_servers needs a SQLite database.')
+        for module in ('gunicorn', 'uvicorn'):
+            try:
+                __import__(module)
+            except ImportError:
+                raise CommandError('benchmark_servers needs %s (see requirements.txt).' % module)
+        try:
+            levels = [int(n) for n in options['connections'].split(',') if n.strip()]
+        except ValueError:
+            raise CommandError('--connections must be a comma separated list of integers.')
+        servers = [name.strip() for name in options['servers'].split(',') if name.strip()]
+        unknown = set(servers) - set(SERVERS)
+        if unknown:
+            raise CommandError('Unknown servers: %s' % ', '.join(sorted(unknown)))
+        if not levels or options['rows'] < 1:
+            raise CommandError('Give at least one connection count and a positive --rows.')
+
+        results = {
+            'git_revision': git_revision(),
+            'rows': options['rows'],
+            'workers': options['workers'],
+            'seconds': options['seconds'],
+            'slow_clients': options['slow_clients'],
+            'async_db_threads': settings.ASYNC_DB_THREADS,
+            'runs': {},
+        }
+        connection = connections['default']
+        old_name = connection.settings_dict['NAME']
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        previous_test_name = test_settings.get('NAME')
+        directory = tempfile.mkdtemp(prefix='benchmark_servers')
+        database = os.path.join(directory, 'benchmark.sqlite3')
+        test_settings['NAME'] = database
+        replica = connections.databases.pop(REPLICA_DB_ALIAS, None)
+        try:
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                if options['verbosity'] > 0:
+                    self.stderr.write('Seeding %d employees...' % options['rows'])
+                cookie, paths = self.prepare(options['rows'], options['seed'])
+                # The servers open their own connections to the scratch database
+                connection.close()
+                for name in servers:
+                    if options['verbosity'] > 0:
+                        self.stderr.write('Measuring %s...' % name)
+                    results['runs'][name] = self.measure(name, database, cookie, paths, levels, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        finally:
+            if replica is not None:
+                connections.databases[REPLICA_DB_ALIAS] = replica
+            if previous_test_name is None:
+                test_settings.pop('NAME', None)
+            else:
+                test_settings['NAME'] = previous_test_name
+            shutil.rmtree(directory, ignore_errors=True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write('%d employees, %d workers per server, %.0fs per run, %d slow clients' % (
+            options['rows'], options['workers'], options['seconds'], options['slow_clients']))
+        self.stdout.write('  %-6s %11s %10s %9s %9s %8s' % ('server', 'connections', 'req/s', 'p50 ms', 'p95 ms', 'errors'))
+        for name, runs in results['runs'].items():
+            for run in runs:
+                self.stdout.write('  %-6s %11d %10.1f %9s %9s %8d' % (
+                    name, run['connections'], run['requests_per_s'], run['p50_ms'], run['p95_ms'], run['errors']
+                ))
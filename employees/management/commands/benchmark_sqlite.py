@@ -0,0 +1,143 @@
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from employees.api import API_FIELDS
+from employees.constants import EmployeeConstants
+from employees.models import Employee
+from hrmanage.sqlite.base import DEFAULT_PRAGMAS
+
+
+def run_worker(alias, seconds, write_ratio, pks, seed):
+    """
+    Issue list-page reads and single-row salary updates against ``alias`` for ``seconds``.
+
+    Runs in a forked process, like a WSGI worker; ``close_old_connections()``
+    after each operation plays the part of the end of a request.
+    """
+    rng = random.Random(seed)
+    employees = Employee.objects.using(alias)
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            if rng.random() < write_ratio:
+                with transaction.atomic(using=alias):
+                    employees.filter(pk=rng.choice(pks)).update(
+                        salary=F('salary') + 1, updated_at=timezone.now()
+                    )
+                counts['writes'] += 1
+            else:
+                list(employees.order_by('-created_at', '-pk').values(*API_FIELDS)[:EmployeeConstants.LIST_PAGE_SIZE])
+                counts['reads'] += 1
+        except OperationalError:
+            counts['errors'] += 1
+        close_old_connections()
+    connections[alias].close()
+    return counts
+
+
+class Command(BaseCommand):
+    help = ('Load test SQLite read/write throughput at increasing worker counts, '
+            'with SQLite defaults and with the configured pragmas and transaction mode.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', default='1,2,4,8',
+                            help='Comma separated worker process counts to measure.')
+        parser.add_argument('--seconds', type=float, default=3.0, help='Duration of each run.')
+        parser.add_argument('--write-ratio', type=float, default=0.2,
+                            help='Fraction of operations that are writes.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def copy_database(self, directory, name):
+        """Copy the default database with SQLite's online backup, so the benchmark never writes to it."""
+        path = os.path.join(directory, '%s.sqlite3' % name)
+        source = sqlite3.connect(connections['default'].settings_dict['NAME'])
+        target = sqlite3.connect(path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        return path
+
+    def measure(self, alias, workers, seconds, write_ratio, pks):
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [
+                pool.submit(run_worker, alias, seconds, write_ratio, pks, seed)
+                for seed in range(workers)
+            ]
+            counts = [future.result() for future in futures]
+        totals = {key: sum(c[key] for c in counts) for key in ('reads', 'writes', 'errors')}
+        return {
+            'workers': workers,
+            'reads_per_s': round(totals['reads'] / seconds, 1),
+            'writes_per_s': round(totals['writes'] / seconds, 1),
+            'errors': totals['errors'],
+        }
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite' or connections['default'].is_in_memory_db():
+            raise CommandError('benchmark_sqlite needs a file based SQLite database.')
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('benchmark_sqlite needs a platform that supports fork().')
+        try:
+            worker_counts = [int(n) for n in options['workers'].split(',') if n.strip()]
+        except ValueError:
+            raise CommandError('--workers must be a comma separated list of integers.')
+        pks = list(Employee.objects.values_list('pk', flat=True))
+        if not pks:
+            raise CommandError('No employees to benchmark; import or seed some first.')
+
+        default = connections['default'].settings_dict
+        configurations = (
+            ('default', {'pragmas': DEFAULT_PRAGMAS, 'transaction_mode': 'DEFERRED'}, 0),
+            ('tuned', default['OPTIONS'], default['CONN_MAX_AGE']),
+        )
+        results = {'employees': len(pks), 'seconds': options['seconds'], 'runs': {}}
+        directory = tempfile.mkdtemp(prefix='benchmark_sqlite')
+        try:
+            for name, db_options, conn_max_age in configurations:
+                alias = 'benchmark_%s' % name
+                connections.databases[alias] = dict(
+                    default,
+                    NAME=self.copy_database(directory, name),
+                    OPTIONS=db_options,
+                    CONN_MAX_AGE=conn_max_age,
+                )
+                try:
+                    results['runs'][name] = [
+                        self.measure(alias, workers, options['seconds'], options['write_ratio'], pks)
+                        for workers in worker_counts
+                    ]
+                finally:
+                    connections[alias].close()
+                    del connections.databases[alias]
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write('%d employees, %.1fs per run, %d%% writes' % (
+            len(pks), options['seconds'], options['write_ratio'] * 100
+        ))
+        self.stdout.write('  %-8s %7s %12s %12s %8s' % ('config', 'workers', 'reads/s', 'writes/s', 'errors'))
+        for name, runs in results['runs'].items():
+            for run in runs:
+                self.stdout.write('  %-8s %7d %12.1f %12.1f %8d' % (
+                    name, run['workers'], run['reads_per_s'], run['writes_per_s'], run['errors']
+                ))
@@ -0,0 +1,181 @@
+import json
+import os
+import re
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.views import serve
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+
+from employees.routers import REPLICA_DB_ALIAS
+from employees.seeding import seed_employees
+
+from .benchmark_views import BENCHMARK_USERNAME, git_revision
+
+ACCEPT_ENCODING = 'gzip, deflate, br'
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class Browser:
+    """
+    The HTTP cache of a browser, as far as the static files of a page go.
+
+    A cached response is reused without a request while its max-age lasts;
+    one without max-age is revalidated with a conditional request on every
+    page, as browsers do with the files ``runserver`` sends.
+    """
+
+    def __init__(self, client, fetch):
+        self.client = client
+        self.fetch = fetch
+        self.cache = {}  # URL -> (fresh until, headers)
+
+    def load(self, url):
+        html = self.client.get(url).content.decode()
+        assets = sorted(set(re.findall(r'(?:href|src)="(%s[^"]+)"' % re.escape(settings.STATIC_URL), html)))
+        load = {'assets': len(assets), 'requests': 0, 'revalidated': 0, 'bytes': 0, 'ms': 0.0}
+        for asset in assets:
+            fresh_until, cached_headers = self.cache.get(asset, (0, {}))
+            if time.time() < fresh_until:
+                continue
+            headers = {'HTTP_ACCEPT_ENCODING': ACCEPT_ENCODING}
+            if 'ETag' in cached_headers:
+                headers['HTTP_IF_NONE_MATCH'] = cached_headers['ETag']
+            if 'Last-Modified' in cached_headers:
+                headers['HTTP_IF_MODIFIED_SINCE'] = cached_headers['Last-Modified']
+            start = time.perf_counter()
+            status, response_headers, body = self.fetch(asset, headers)
+            load['ms'] += (time.perf_counter() - start) * 1000
+            load['requests'] += 1
+            load['bytes'] += len(body)
+            if status == 304:
+                load['revalidated'] += 1
+                response_headers = dict(cached_headers, **response_headers)
+            elif status != 200:
+                raise CommandError('%s answered %d.' % (asset, status))
+            max_age = MAX_AGE_RE.search(response_headers.get('Cache-Control', ''))
+            self.cache[asset] = (time.time() + int(max_age.group(1)) if max_age else 0, response_headers)
+        load['ms'] = round(load['ms'], 2)
+        return load
+
+
+def fetch_with_runserver(url, headers):
+    """Serve a static file the way runserver does, from the source directories."""
+    response = serve(RequestFactory().get(url, **headers), url[len(settings.STATIC_URL):], insecure=True)
+    if response.status_code != 200:
+        return response.status_code, dict(response.headers), b''
+    # Not response.close(): that ends the request, closing the database connection
+    with response.file_to_stream:
+        return response.status_code, dict(response.headers), b''.join(response.streaming_content)
+
+
+class Command(BaseCommand):
+    help = ('Load the employee list as a browser would, with its cache, and count the requests for static '
+            'files and their bytes on the first and the repeat loads: with the files served by runserver '
+            'as they are, and collected with hashed names and compressed copies served by '
+            'StaticFilesMiddleware.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loads', type=int, default=10, help='Repeat loads after the first one.')
+        parser.add_argument('--rows', type=int, default=50, help='Employees on the list.')
+        parser.add_argument('--in-place', action='store_true',
+                            help='Use the configured database instead of a scratch copy.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def measure(self, client, fetch, loads):
+        browser = Browser(client, fetch)
+        url = reverse('employees:employee_list')
+        first = browser.load(url)
+        repeats = [browser.load(url) for _ in range(loads)]
+        return {
+            'first': first,
+            'repeat': {key: round(statistics.mean(load[key] for load in repeats), 2) for key in first},
+        }
+
+    def run(self, options):
+        user, _ = User.objects.get_or_create(
+            username=BENCHMARK_USERNAME, defaults={'is_staff': True, 'is_superuser': True}
+        )
+        if not options['in_place']:
+            seed_employees(options['rows'])
+        results = {}
+
+        cache.clear()
+        storages = dict(settings.STORAGES, staticfiles={
+            'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+        })
+        with override_settings(STORAGES=storages):
+            client = Client()
+            client.force_login(user)
+            results['runserver'] = self.measure(client, fetch_with_runserver, options['loads'])
+
+        cache.clear()
+        static_root = tempfile.mkdtemp(prefix='benchmark_static')
+        try:
+            with override_settings(STATIC_ROOT=static_root):
+                call_command('collectstatic', interactive=False, verbosity=0)
+                client = Client()
+                client.force_login(user)
+
+                def fetch_with_middleware(url, headers):
+                    response = client.get(url, **headers)
+                    return response.status_code, dict(response.headers), response.content
+
+                results['collected'] = self.measure(client, fetch_with_middleware, options['loads'])
+        finally:
+            shutil.rmtree(static_root, ignore_errors=True)
+        return results
+
+    def run_on_scratch_database(self, options):
+        connection = connections['default']
+        old_name = connection.settings_dict['NAME']
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        previous_test_name = test_settings.get('NAME')
+        directory = tempfile.mkdtemp(prefix='benchmark_static')
+        if connection.vendor == 'sqlite':
+            test_settings['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        replica = connections.databases.pop(REPLICA_DB_ALIAS, None)
+        try:
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                return self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        finally:
+            if replica is not None:
+                connections.databases[REPLICA_DB_ALIAS] = replica
+            test_settings['NAME'] = previous_test_name
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def handle(self, *args, **options):
+        if options['loads'] < 1 or options['rows'] < 0:
+            raise CommandError('--loads must be positive and --rows not negative.')
+        results = {'git_revision': git_revision(), 'loads': options['loads']}
+        # StaticFilesMiddleware is only used with DEBUG off
+        with override_settings(DEBUG=False, QUERY_BUDGETS_ENFORCED=False):
+            if options['in_place']:
+                results.update(self.run(options))
+            else:
+                results.update(self.run_on_scratch_database(options))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write('Static files of the employee list, first load and mean of %d repeat loads'
+                          % options['loads'])
+        self.stdout.write('  %-12s %-7s %7s %9s %12s %9s %9s' % (
+            'serving', 'load', 'assets', 'requests', 'revalidated', 'bytes', 'ms'))
+        for name in ('runserver', 'collected'):
+            for load in ('first', 'repeat'):
+                run = results[name][load]
+                self.stdout.write('  %-12s %-7s %7d %9.2f %12.2f %9d %9.2f' % (
+                    name, load, run['assets'], run['requests'], run['revalidated'], run['bytes'], run['ms']))
@@ -0,0 +1,304 @@
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from employees import jobs
+from employees.metrics import measure_request
+from employees.models import Employee
+from employees.routers import REPLICA_DB_ALIAS
+from employees.seeding import generate_employee, seed_employees, seed_lookups, seed_users
+
+BENCHMARK_USERNAME = 'benchmark-admin'
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Drive every employees view (and the admin changelist) through the test client at '
+            'increasing table sizes and report p50/p95 latency, queries per request and peak memory.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default='1000,100000,1000000',
+                            help='Comma separated employee counts to measure at.')
+        parser.add_argument('--requests', type=int, default=20, help='Measured requests per view and size.')
+        parser.add_argument('--views', help='Comma separated scenario names to run (default: all).')
+        parser.add_argument('--cold-cache', action='store_true',
+                            help='Clear the cache before every measured request.')
+        parser.add_argument('--in-place', action='store_true',
+                            help='Seed and benchmark the configured database instead of a scratch copy. '
+                                 'Rows are added to it and the benchmark writes to it.')
+        parser.add_argument('--seed', type=int, default=42, help='Seed of the generated data and requests.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    # Scenarios: name -> (client, method, prepare). ``prepare(i)`` runs untimed
+    # before request ``i`` and returns the path and the data to send.
+
+    def scenarios(self):
+        return {
+            'employee_list': ('user', 'get', lambda i: (reverse('employees:employee_list'), {})),
+            'employee_list_filtered': ('user', 'get', lambda i: (
+                reverse('employees:employee_list'), {'department': 'Engineering', 'sort': '-salary'})),
+            'employee_list_by_name': ('user', 'get', lambda i: (reverse('employees:employee_list'), {'sort': 'name'})),
+            'employee_search': ('user', 'get', lambda i: (
+                reverse('employees:employee_search'), {'q': self.rng.choice(('Patel', 'Garcia', 'Chen'))})),
+            'employee_export': ('user', 'get', lambda i: (
+                reverse('employees:employee_export'), {'format': 'csv', 'department': 'Legal', 'position': 'Counsel'})),
+            'employee_detail': ('user', 'get', lambda i: (
+                reverse('employees:employee_detail', args=[self.rng.choice(self.pks)]), {})),
+            'employee_create_form': ('user', 'get', lambda i: (reverse('employees:employee_create_form'), {})),
+            'employee_create': ('user', 'post', self.prepare_create),
+            'employee_import': ('user', 'get', lambda i: (reverse('employees:employee_import'), {})),
+            'employee_update_form': ('user', 'get', lambda i: (
+                reverse('employees:employee_update_form', args=[self.rng.choice(self.pks)]), {})),
+            'employee_update': ('user', 'post', self.prepare_update),
+            'employee_bulk_action': ('user', 'post', lambda i: (reverse('employees:employee_bulk_action'), {
+                'action': 'update', 'scope': 'selected', 'salary_amount': '1',
+                'ids': self.rng.sample(self.pks, min(10, len(self.pks))),
+            })),
+            'employee_delete_confirm': ('user', 'get', lambda i: (
+                reverse('employees:employee_delete_confirm', args=[self.rng.choice(self.pks)]), {})),
+            'employee_delete': ('user', 'post', self.prepare_delete),
+            'employee_history': ('user', 'get', lambda i: (
+                reverse('employees:employee_history', args=[self.rng.choice(self.pks)]), {})),
+            'employee_analytics': ('user', 'get', lambda i: (reverse('employees:employee_analytics'), {})),
+            'employee_cache_stats': ('user', 'get', lambda i: (reverse('employees:employee_cache_stats'), {})),
+            'metrics': ('user', 'get', lambda i: (reverse('employees:metrics'), {})),
+            'api_employee_list': ('user', 'get', lambda i: (reverse('employees:api_employee_list'), {})),
+            'api_employee_detail': ('user', 'get', lambda i: (
+                reverse('employees:api_employee_detail', args=[self.rng.choice(self.pks)]), {})),
+            'api_employee_search': ('user', 'get', lambda i: (
+                reverse('employees:api_employee_search'), {'q': self.rng.choice(('Khan', 'Smith', 'Tanaka'))})),
+            'api_employee_changes': ('user', 'get', lambda i: (
+                reverse('employees:api_employee_changes'), {'cursor': self.rng.randrange(1000)})),
+            'job_detail': ('user', 'get', lambda i: (reverse('employees:job_detail', args=[self.job_pk()]), {})),
+            'api_job_status': ('user', 'get', lambda i: (
+                reverse('employees:api_job_status', args=[self.job_pk()]), {})),
+            'login': ('anonymous', 'get', lambda i: (reverse('employees:login'), {})),
+            'signup': ('anonymous', 'get', lambda i: (reverse('employees:signup'), {})),
+            'admin_changelist': ('user', 'get', lambda i: (reverse('admin:employees_employee_changelist'), {})),
+        }
+
+    def new_employee(self):
+        self.serial += 1
+        employee = generate_employee(self.serial, self.seed, seed_lookups())
+        employee.employee_id = 'BENCH%07d' % self.serial
+        employee.email = 'bench%d@example.com' % self.serial
+        return employee
+
+    def prepare_create(self, i):
+        employee = self.new_employee()
+        data = {field: getattr(employee, field) for field in
+                ('employee_id', 'name', 'department', 'position', 'salary', 'email', 'hire_date')}
+        return reverse('employees:employee_create'), data
+
+    def prepare_update(self, i):
+        employee = Employee.objects.get(pk=self.rng.choice(self.pks))
+        data = {field: getattr(employee, field) for field in
+                ('employee_id', 'name', 'department', 'position', 'email', 'hire_date')}
+        data['salary'] = employee.salary + 1
+        return reverse('employees:employee_update', args=[employee.pk]), data
+
+    def prepare_delete(self, i):
+        employee = self.new_employee()
+        employee.save()
+        return reverse('employees:employee_delete', args=[employee.pk]), {}
+
+    def job_pk(self):
+        """A finished job to poll, created on first use (cancelled, so no worker runs it)."""
+        if self.job is None:
+            self.job = jobs.enqueue('rebuild_stats', user=User.objects.get(username=BENCHMARK_USERNAME))
+            jobs.cancel(self.job)
+        return self.job.pk
+
+    def sample_pks(self, count=200):
+        bounds = Employee.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            return []
+        candidates = range(bounds['low'], bounds['high'] + 1)
+        candidates = self.rng.sample(candidates, min(count, len(candidates)))
+        return list(Employee.objects.filter(pk__in=candidates).values_list('pk', flat=True))
+
+    def send(self, client, method, path, data):
+        response = getattr(client, method)(path, data)
+        # Streaming responses do their work (and queries) while being consumed
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, len(body)
+
+    def measure(self, clients, scenario, requests, cold_cache):
+        client_name, method, prepare = scenario
+        client = clients[client_name]
+        self.send(client, method, *prepare(0))  # warm up templates, caches and SQLite pages
+        timings, queries, statuses = [], [], set()
+        for i in range(1, requests + 1):
+            path, data = prepare(i)
+            if cold_cache:
+                cache.clear()
+            with measure_request() as metrics:
+                start = time.perf_counter()
+                status, size = self.send(client, method, path, data)
+                timings.append(time.perf_counter() - start)
+            queries.append(metrics.queries)
+            statuses.add(status)
+
+        # Tracing allocations slows Python code down, so memory is measured on a separate request
+        path, data = prepare(requests + 1)
+        if cold_cache:
+            cache.clear()
+        tracemalloc.start()
+        try:
+            self.send(client, method, path, data)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {
+            'status': sorted(statuses),
+            'bytes': size,
+            'p50_ms': round(percentile(timings, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+            'mean_ms': round(statistics.mean(timings) * 1000, 2),
+            'queries': round(statistics.mean(queries), 2),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def run(self, sizes, scenarios, options):
+        user, _ = User.objects.get_or_create(
+            username=BENCHMARK_USERNAME, defaults={'is_staff': True, 'is_superuser': True}
+        )
+        clients = {'user': Client(), 'anonymous': Client()}
+        clients['user'].force_login(user)
+        users = seed_users(100, seed=self.seed) if not options['in_place'] else ()
+        runs = []
+        for rows in sizes:
+            started = time.monotonic()
+            missing = rows - Employee.objects.count()
+            if missing > 0:
+                if options['verbosity'] > 0:
+                    self.stderr.write('Seeding %d employees...' % missing)
+                seed_employees(missing, seed=self.seed, users=users)
+            run = {'rows': Employee.objects.count(), 'seed_seconds': round(time.monotonic() - started, 2),
+                   'views': {}}
+            self.pks = self.sample_pks()
+            if not self.pks:
+                raise CommandError('No employees to benchmark; use a positive --rows.')
+            for name, scenario in scenarios.items():
+                if options['verbosity'] > 1:
+                    self.stderr.write('  %s at %d rows' % (name, run['rows']))
+                try:
+                    run['views'][name] = self.measure(clients, scenario, options['requests'], options['cold_cache'])
+                except Exception as e:
+                    run['views'][name] = {'error': '%s: %s' % (type(e).__name__, e)}
+            runs.append(run)
+        return runs
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(n) for n in options['rows'].split(',') if n.strip())
+        except ValueError:
+            raise CommandError('--rows must be a comma separated list of integers.')
+        if not sizes or options['requests'] < 1:
+            raise CommandError('Give at least one size and one request per view.')
+        scenarios = self.scenarios()
+        if options['views']:
+            names = [name.strip() for name in options['views'].split(',') if name.strip()]
+            unknown = set(names) - set(scenarios)
+            if unknown:
+                raise CommandError('Unknown views: %s' % ', '.join(sorted(unknown)))
+            scenarios = {name: scenarios[name] for name in names}
+
+        self.rng = random.Random(options['seed'])
+        self.seed = options['seed']
+        self.serial = 0
+        self.job = None
+        results = {
+            'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connections['default'].vendor,
+            'requests': options['requests'],
+            'cold_cache': options['cold_cache'],
+        }
+
+        # DEBUG would keep every query in memory and skew both timings and memory
+        with override_settings(DEBUG=False):
+            if options['in_place']:
+                results['runs'] = self.run(sizes, scenarios, options)
+            else:
+                results['runs'] = self.run_on_scratch_database(sizes, scenarios, options)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for run in results['runs']:
+            self.stdout.write('%d employees (seeded in %.1fs)' % (run['rows'], run['seed_seconds']))
+            self.stdout.write('  %-24s %8s %9s %9s %8s %11s' % (
+                'view', 'status', 'p50 ms', 'p95 ms', 'queries', 'peak KiB'))
+            for name, view in run['views'].items():
+                if 'error' in view:
+                    self.stdout.write(self.style.ERROR('  %-24s %s' % (name, view['error'])))
+                    continue
+                self.stdout.write('  %-24s %8s %9.2f %9.2f %8.1f %11.1f' % (
+                    name, ','.join(str(s) for s in view['status']), view['p50_ms'], view['p95_ms'],
+                    view['queries'], view['peak_memory_kb']
+                ))
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS('Results written to %s' % options['output']))
+
+    def run_on_scratch_database(self, sizes, scenarios, options):
+        """Benchmark against a freshly migrated database that is dropped afterwards."""
+        connection = connections['default']
+        old_name = connection.settings_dict['NAME']
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        previous_test_name = test_settings.get('NAME')
+        directory = tempfile.mkdtemp(prefix='benchmark_views')
+        if connection.vendor == 'sqlite':
+            test_settings['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        # Reads must not go to a replica of the real database
+        replica = connections.databases.pop(REPLICA_DB_ALIAS, None)
+        try:
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                return self.run(sizes, scenarios, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        finally:
+            if replica is not None:
+                connections.databases[REPLICA_DB_ALIAS] = replica
+            test_settings['NAME'] = previous_test_name
+            shutil.rmtree(directory, ignore_errors=True)
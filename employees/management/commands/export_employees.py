@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from employees.exporters import EXPORT_FORMATS, iter_employee_rows, iter_encoded, iter_export
+from employees.forms import EmployeeFilterForm
+from employees.models import Employee
+from employees.routers import replica_reads
+
+
+class Command(BaseCommand):
+    help = 'Stream the employee roster to a CSV or JSONL file (optionally gzipped).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', '-o', help='Output file (default: stdout).')
+        parser.add_argument('--gzip', action='store_true', help='Gzip compress the output.')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows fetched from the database per query.')
+        for name in EmployeeFilterForm.base_fields:
+            if name != 'sort':
+                parser.add_argument('--' + name.replace('_', '-'), dest=name)
+
+    def handle(self, *args, **options):
+        params = QueryDict(mutable=True)
+        for name in EmployeeFilterForm.base_fields:
+            if options.get(name):
+                params[name] = options[name]
+        filter_form = EmployeeFilterForm(params)
+        if not filter_form.is_valid():
+            raise CommandError(filter_form.errors.as_text())
+
+        # Reads happen while the chunks are consumed below
+        with replica_reads():
+            self.write(options, iter_employee_rows(
+                filter_form.filter_queryset(Employee.objects.all()),
+                chunk_size=options['chunk_size']
+            ))
+
+    def write(self, options, rows):
+        chunks = iter_encoded(iter_export(options['format'], rows), compress=options['gzip'])
+        if options['output']:
+            with open(options['output'], 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        else:
+            buffer = getattr(self.stdout, 'buffer', None)
+            if buffer is None and options['gzip']:
+                raise CommandError('--gzip needs --output when stdout is not a binary stream.')
+            for chunk in chunks:
+                if buffer is not None:
+                    buffer.write(chunk)
+                else:
+                    self.stdout.write(chunk.decode('utf-8'), ending='')
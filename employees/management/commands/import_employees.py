@@ -0,0 +1,57 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from employees.importers import (
+    DEFAULT_BATCH_SIZE, EmployeeImporter, csv_error_writer, detect_format, iter_rows
+)
+
+
+class Command(BaseCommand):
+    help = 'Stream employees from a CSV or JSONL file into the database in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file to import.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Input format (detected from the file extension by default).')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Rows validated and inserted per batch.')
+        parser.add_argument('--errors', dest='error_path',
+                            help='Where to write rejected rows (default: <path>.errors.csv).')
+        parser.add_argument('--user', help='Username recorded as created_by.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError('User "%s" does not exist.' % options['user'])
+
+        path = options['path']
+        fmt = options['format'] or detect_format(path)
+        error_path = options['error_path'] or path + '.errors.csv'
+
+        def progress(result):
+            self.stdout.write('  %d rows read, %d created, %d rejected' % (
+                result.read, result.created, result.rejected
+            ))
+
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as source, \
+                    open(error_path, 'w', newline='', encoding='utf-8') as report:
+                importer = EmployeeImporter(
+                    user=user,
+                    batch_size=options['batch_size'],
+                    error_writer=csv_error_writer(report),
+                    progress=progress if options['verbosity'] > 0 else None,
+                )
+                result = importer.run(iter_rows(source, fmt))
+        except OSError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(result.summary()))
+        if result.rejected:
+            self.stdout.write(self.style.WARNING('Rejected rows written to %s' % error_path))
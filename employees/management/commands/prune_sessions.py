@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from employees.sessions import prune_expired_sessions
+
+
+class Command(BaseCommand):
+    help = ('Delete expired sessions in short batches, like clearsessions without holding '
+            'the write lock for the whole delete.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Sessions deleted per transaction (default: SESSION_PRUNE_BATCH_SIZE).')
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        deleted = prune_expired_sessions(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            'Deleted %d expired sessions in %.2fs.' % (deleted, time.monotonic() - start)
+        ))
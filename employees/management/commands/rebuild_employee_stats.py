@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from employees import analytics
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the employee analytics summary tables and report any drift found.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only check for drift; exit with an error if any is found.')
+
+    def handle(self, *args, **options):
+        drift = analytics.find_drift()
+        for line in drift:
+            self.stdout.write(self.style.WARNING(line))
+
+        if options['check']:
+            if drift:
+                raise CommandError('%d summary rows drifted from the Employee table.' % len(drift))
+            self.stdout.write(self.style.SUCCESS('Summary tables are in sync.'))
+            return
+
+        start = time.monotonic()
+        analytics.rebuild()
+        remaining = analytics.find_drift()
+        if remaining:
+            raise CommandError('Summary tables still differ after rebuild: %s' % remaining[0])
+        self.stdout.write(self.style.SUCCESS(
+            'Rebuilt summary tables in %.2fs (%d drifted rows fixed).' % (time.monotonic() - start, len(drift))
+        ))
@@ -0,0 +1,72 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from employees import payroll
+
+
+class Command(BaseCommand):
+    help = ('Compute the payroll of a month for every employee hired by its end, in chunks computed '
+            'with NumPy, and store it as a payroll run with its totals per department.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('period', nargs='?', help='The month, as YYYY-MM (default: the current month).')
+        parser.add_argument('--replace', action='store_true', help='Replace the run of the month if there is one.')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Employees per chunk (default: PAYROLL_CHUNK_SIZE).')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        try:
+            period = payroll.parse_period(options['period']) if options['period'] else timezone.localdate()
+        except ValueError:
+            raise CommandError('The period must be a month as YYYY-MM.')
+        if options['chunk_size'] is not None and options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive.')
+
+        def progress(done):
+            if options['verbosity'] > 1:
+                self.stderr.write('  %d employees' % done)
+
+        start = time.perf_counter()
+        try:
+            run = payroll.run_payroll(period, replace=options['replace'], chunk_size=options['chunk_size'],
+                                      progress=progress)
+        except ValueError as e:
+            raise CommandError('%s Use --replace to compute it again.' % e)
+        seconds = time.perf_counter() - start
+
+        results = {
+            'run': run.pk,
+            'period': run.period.strftime('%Y-%m'),
+            'employees': run.employee_count,
+            'salary_total': run.salary_total,
+            'bonus_total': run.bonus_total,
+            'total': run.total,
+            'seconds': round(seconds, 3),
+            'employees_per_s': round(run.employee_count / seconds, 1) if seconds else None,
+            'timings': {phase: round(value, 3) for phase, value in run.timings.items()},
+            'departments': [
+                {'department': str(row.department), 'employees': row.employee_count,
+                 'salary_total': row.salary_total, 'bonus_total': row.bonus_total, 'total': row.total}
+                for row in run.department_totals.select_related('department').order_by('department__name')
+            ],
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2, cls=DjangoJSONEncoder))
+            return
+        self.stdout.write('Payroll %s: %d employees' % (results['period'], results['employees']))
+        self.stdout.write('  %-24s %9s %16s %14s %16s' % ('department', 'employees', 'salary', 'bonus', 'total'))
+        for row in results['departments']:
+            self.stdout.write('  %-24s %9d %16s %14s %16s' % (
+                row['department'], row['employees'], row['salary_total'], row['bonus_total'], row['total']))
+        self.stdout.write('  %-24s %9d %16s %14s %16s' % (
+            'all', results['employees'], results['salary_total'], results['bonus_total'], results['total']))
+        self.stdout.write(self.style.SUCCESS(
+            'Done in %.2fs, %.0f employees/s (read %.2fs, compute %.2fs, write %.2fs).' % (
+                seconds, results['employees_per_s'] or 0, run.timings['read'], run.timings['compute'],
+                run.timings['write'])
+        ))
@@ -0,0 +1,83 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+
+from employees import jobs
+
+_stopping = False
+
+
+def _stop(signum, frame):
+    global _stopping
+    _stopping = True
+
+
+def work(poll_interval, burst, stale_seconds):
+    """
+    Claim and run jobs until stopped, or until the queue is empty with ``burst``.
+
+    Runs in a forked process; SIGINT and SIGTERM let the current job finish
+    before the worker exits. An idle worker queues the ``prune_sessions``
+    job when none was queued for SESSION_PRUNE_INTERVAL seconds. Returns
+    the number of jobs run.
+    """
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+    name = '%s:%d' % (socket.gethostname(), os.getpid())
+    processed = 0
+    while not _stopping:
+        job = jobs.claim(name)
+        if job is None:
+            jobs.requeue_stale(stale_seconds)
+            if jobs.enqueue_periodic('prune_sessions', settings.SESSION_PRUNE_INTERVAL):
+                continue
+            close_old_connections()
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+        jobs.run_job(job)
+        processed += 1
+        close_old_connections()
+    connections.close_all()
+    return processed
+
+
+class Command(BaseCommand):
+    help = ('Run background jobs (imports, exports, bulk actions, stats rebuilds, session pruning) '
+            'in a pool of worker processes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help='Number of worker processes (default: one per CPU).')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds an idle worker waits before looking for jobs again.')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once the queue has no due job instead of waiting for more.')
+        parser.add_argument('--stale-seconds', type=int, default=settings.JOB_STALE_SECONDS,
+                            help='Requeue running jobs that have not reported progress for this long.')
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        if processes < 1:
+            raise CommandError('--processes must be at least 1.')
+        arguments = (options['poll_interval'], options['burst'], options['stale_seconds'])
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+            futures = [pool.submit(work, *arguments) for _ in range(processes)]
+            try:
+                processed = sum(future.result() for future in futures)
+            except KeyboardInterrupt:
+                # The workers got the signal too and stop after their current job
+                processed = sum(future.result() for future in futures)
+        self.stdout.write('%d jobs run by %d workers.' % (processed, processes))
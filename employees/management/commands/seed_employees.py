@@ -0,0 +1,50 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from employees.seeding import (
+    DEFAULT_BATCH_SIZE, DEFAULT_PASSWORD, DEFAULT_SEED, USER_PREFIX, seed_employees, seed_users
+)
+
+
+class Command(BaseCommand):
+    help = ('Bulk insert realistic, deterministic employees (and optionally users) '
+            'for development and benchmarks.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, required=True, help='Number of employees to add.')
+        parser.add_argument('--users', type=int, default=0,
+                            help='Number of users (with profiles) to add; employees are '
+                                 'attributed to the seeded users.')
+        parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                            help='Random seed; the same seed always generates the same rows.')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Rows inserted per transaction.')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Password of the seeded users.')
+
+    def handle(self, *args, **options):
+        if options['count'] < 0 or options['users'] < 0:
+            raise CommandError('--count and --users cannot be negative.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        started = time.monotonic()
+        if options['users']:
+            seed_users(options['users'], seed=options['seed'], password=options['password'])
+        users = User.objects.filter(username__startswith=USER_PREFIX).order_by('username')
+
+        def progress(created):
+            self.stdout.write('  %d / %d employees' % (created, options['count']))
+
+        created = seed_employees(
+            options['count'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            users=users,
+            progress=progress if options['verbosity'] > 1 else None,
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS('Seeded %d employees and %d users in %.1fs (%.0f employees/s)' % (
+            created, options['users'], elapsed, created / elapsed if elapsed else 0
+        )))
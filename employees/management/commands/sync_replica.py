@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from employees.replication import sync_replica
+from employees.routers import REPLICA_DB_ALIAS, replica_configured
+
+
+class Command(BaseCommand):
+    help = 'Copy the default SQLite database to the replica, once or every --interval seconds.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Keep running and sync every INTERVAL seconds.')
+
+    def sync(self):
+        start = time.monotonic()
+        pages = sync_replica()
+        self.stdout.write('Synced %d pages to %s in %.3fs' % (pages, REPLICA_DB_ALIAS, time.monotonic() - start))
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError('No %r database configured; set DB_REPLICA_NAME.' % REPLICA_DB_ALIAS)
+        try:
+            self.sync()
+            while options['interval']:
+                time.sleep(options['interval'])
+                self.sync()
+        except ValueError as e:
+            raise CommandError(str(e))
+        except KeyboardInterrupt:
+            pass
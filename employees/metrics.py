@@ -0,0 +1,298 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the request duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+TRANSACTION_STATEMENTS = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+# Per view totals added up across processes
+SUMMED_TOTALS = ('requests', 'queries', 'sql_seconds', 'template_seconds', 'seconds', 'over_budget')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when QUERY_BUDGETS_ENFORCED is on and a view runs more queries than its budget."""
+
+
+def query_budget(queries):
+    """
+    Declare the maximum number of SQL queries a view may run per request.
+
+    Works on function views; class based views set a ``query_budget``
+    class attribute instead.
+    """
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
+
+
+def get_query_budget(view):
+    budget = getattr(view, 'query_budget', None)
+    if budget is None:
+        budget = getattr(getattr(view, 'view_class', None), 'query_budget', None)
+    if budget is not None:
+        budget += getattr(settings, 'QUERY_BUDGET_AUTH_QUERIES', 0)
+    return budget
+
+
+class RequestMetrics:
+    """What a single request spent in the database and in templates."""
+
+    def __init__(self, parent=None):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.start = time.perf_counter()
+        # Enclosing measurement, which counts the same queries
+        self.parent = parent
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def add_query(self, sql, seconds):
+        metrics = self
+        while metrics is not None:
+            metrics.sql_seconds += seconds
+            # Only data statements count against budgets: transaction control
+            # differs between tests (savepoints) and production (BEGIN).
+            if not sql.lstrip()[:9].upper().startswith(TRANSACTION_STATEMENTS):
+                metrics.queries += 1
+            metrics = metrics.parent
+
+
+_current = ContextVar('employees_request_metrics', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every connection by ``instrument()``.
+
+    Counts the query in the metrics of the current context, so queries
+    run from another thread (sync_to_async, ``offload.run_sync()``) are
+    counted for the request that started them.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - start)
+
+
+def instrument(connection):
+    """Install ``record_query()`` on ``connection`` (a DatabaseWrapper), once."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+@contextmanager
+def measure_request():
+    """Count the queries and time spent in the enclosed block; yields the RequestMetrics."""
+    metrics = RequestMetrics(parent=_current.get())
+    token = _current.set(metrics)
+    # Connections created later are instrumented by the connection_created receiver
+    for connection in connections.all(initialized_only=True):
+        instrument(connection)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def measure_template():
+    """Add the time spent in the enclosed block to the current request's template time."""
+    metrics = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            metrics.template_seconds += time.perf_counter() - start
+
+
+class MetricsRegistry:
+    """
+    Totals by view name, rendered in the Prometheus text format.
+
+    Each process counts its own requests, and the named events of
+    ``count()`` (e.g. cache hits). With METRICS_DIR set (gunicorn.conf.py
+    sets it when it runs several workers) each process also writes its totals
+    to a file of its own there, at most every METRICS_FLUSH_SECONDS, and
+    ``snapshot()`` adds up the files of every process. The files of exited
+    workers are kept, so whichever worker a scrape reaches, the counters
+    only ever grow.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.pid = None
+        self.path = None
+        self.reset()
+
+    def reset(self):
+        self.views = {}
+        self.counters = {}
+        self.flushed_at = 0.0
+
+    def observe(self, view, metrics, seconds, budget=None):
+        with self.lock:
+            totals = self.views.setdefault(view, {
+                'requests': 0, 'queries': 0, 'sql_seconds': 0.0, 'template_seconds': 0.0,
+                'seconds': 0.0, 'buckets': [0] * len(DURATION_BUCKETS), 'over_budget': 0,
+                'budget': budget,
+            })
+            totals['requests'] += 1
+            totals['queries'] += metrics.queries
+            totals['sql_seconds'] += metrics.sql_seconds
+            totals['template_seconds'] += metrics.template_seconds
+            totals['seconds'] += seconds
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    totals['buckets'][i] += 1
+            if budget is not None and metrics.queries > budget:
+                totals['over_budget'] += 1
+        self.flush()
+
+    def count(self, name):
+        """Add one to the counter ``name``."""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+        self.flush()
+
+    def process_path(self, directory):
+        """The file of this process in ``directory``; a new one after a fork."""
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.path = os.path.join(directory, 'metrics-%d-%d.json' % (self.pid, time.time_ns()))
+        return self.path
+
+    def flush(self, force=False):
+        """Write the totals of this process to METRICS_DIR, unless written less than METRICS_FLUSH_SECONDS ago."""
+        directory = getattr(settings, 'METRICS_DIR', '')
+        if not directory:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self.flushed_at < settings.METRICS_FLUSH_SECONDS:
+                return
+            self.flushed_at = now
+        # One writer at a time, so that older totals never replace newer ones
+        with self.write_lock:
+            with self.lock:
+                data = json.dumps({'views': self.views, 'counters': self.counters})
+                path = self.process_path(directory)
+            os.makedirs(directory, exist_ok=True)
+            with open(path + '.tmp', 'w') as f:
+                f.write(data)
+            os.replace(path + '.tmp', path)
+
+    def totals(self):
+        """Totals by view name and counters, of every process when METRICS_DIR is set."""
+        directory = getattr(settings, 'METRICS_DIR', '')
+        if not directory:
+            with self.lock:
+                return ({view: dict(totals, buckets=list(totals['buckets'])) for view, totals in self.views.items()},
+                        dict(self.counters))
+        self.flush(force=True)
+        views, counters = {}, {}
+        for name in sorted(os.listdir(directory)):
+            if not (name.startswith('metrics-') and name.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    process = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for view, totals in process['views'].items():
+                merged = views.get(view)
+                if merged is None:
+                    views[view] = totals
+                    continue
+                for key in SUMMED_TOTALS:
+                    merged[key] += totals[key]
+                merged['buckets'] = [a + b for a, b in zip(merged['buckets'], totals['buckets'])]
+                if merged['budget'] is None:
+                    merged['budget'] = totals['budget']
+            for counter, value in process['counters'].items():
+                counters[counter] = counters.get(counter, 0) + value
+        return views, counters
+
+    def snapshot(self):
+        """Totals by view name."""
+        return self.totals()[0]
+
+    def counter_totals(self):
+        """The counters of ``count()``."""
+        return self.totals()[1]
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        views, counters = self.totals()
+        views = sorted(views.items())
+        lines = []
+
+        def family(name, kind, help_text, key):
+            lines.append('# HELP hrmanage_%s %s' % (name, help_text))
+            lines.append('# TYPE hrmanage_%s %s' % (name, kind))
+            for view, totals in views:
+                if totals[key] is not None:
+                    lines.append('hrmanage_%s{view="%s"} %s' % (name, view, _number(totals[key])))
+
+        family('requests_total', 'counter', 'Requests handled.', 'requests')
+        family('db_queries_total', 'counter', 'SQL queries run.', 'queries')
+        family('db_seconds_total', 'counter', 'Time spent running SQL queries.', 'sql_seconds')
+        family('template_seconds_total', 'counter', 'Time spent rendering templates.', 'template_seconds')
+        family('query_budget', 'gauge', 'Maximum SQL queries allowed per request.', 'budget')
+        family('query_budget_exceeded_total', 'counter', 'Requests that ran more queries than their budget.',
+               'over_budget')
+
+        lines.append('# HELP hrmanage_request_duration_seconds Request latency.')
+        lines.append('# TYPE hrmanage_request_duration_seconds histogram')
+        for view, totals in views:
+            for bound, count in zip(DURATION_BUCKETS, totals['buckets']):
+                lines.append('hrmanage_request_duration_seconds_bucket{view="%s",le="%s"} %d' % (view, bound, count))
+            lines.append('hrmanage_request_duration_seconds_bucket{view="%s",le="+Inf"} %d' % (view, totals['requests']))
+            lines.append('hrmanage_request_duration_seconds_sum{view="%s"} %s' % (view, _number(totals['seconds'])))
+            lines.append('hrmanage_request_duration_seconds_count{view="%s"} %d' % (view, totals['requests']))
+        for name, value in sorted(counters.items()):
+            lines.append('# TYPE hrmanage_%s_total counter' % name)
+            lines.append('hrmanage_%s_total %d' % (name, value))
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    return ('%.6f' % value).rstrip('0').rstrip('.') if isinstance(value, float) else str(value)
+
+
+registry = MetricsRegistry()
+
+
+def server_timing(metrics, seconds):
+    """Value of the Server-Timing header for a request."""
+    return 'db;dur=%.1f;desc="%d queries", tpl;dur=%.1f, total;dur=%.1f' % (
+        metrics.sql_seconds * 1000, metrics.queries, metrics.template_seconds * 1000, seconds * 1000
+    )
+
+
+def check_budget(view_name, metrics, budget):
+    if budget is None or metrics.queries <= budget:
+        return
+    message = '%s ran %d SQL queries, over its budget of %d' % (view_name, metrics.queries, budget)
+    if getattr(settings, 'QUERY_BUDGETS_ENFORCED', False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
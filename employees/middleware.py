@@ -0,0 +1,176 @@
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, HttpResponseNotAllowed, HttpResponseNotModified
+from django.utils.cache import parse_etags
+from django.utils.functional import SimpleLazyObject
+
+from .metrics import check_budget, get_query_budget, measure_request, registry, server_timing
+from .offload import run_sync
+from .profiles import get_user_profile
+from .routers import routing
+from .staticfiles import index_static_root
+
+PIN_SESSION_KEY = '_employees_primary_until'
+
+
+class HybridMiddleware:
+    """
+    Base of middleware that runs in both sync (WSGI) and async (ASGI) chains.
+
+    Subclasses implement ``handle()`` and ``ahandle()``; the async one is
+    used when the rest of the chain is async, so an ASGI request never
+    switches to a thread just for this middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.ahandle(request)
+        return self.handle(request)
+
+
+class UserProfileMiddleware(HybridMiddleware):
+    """
+    Attach a lazy ``request.user_profile`` to every request.
+
+    The profile is looked up (or created) at most once per request, and only
+    if something actually uses it. Must come after AuthenticationMiddleware.
+    """
+
+    def handle(self, request):
+        request.user_profile = SimpleLazyObject(lambda: get_user_profile(request.user))
+        return self.get_response(request)
+
+    async def ahandle(self, request):
+        request.user_profile = SimpleLazyObject(lambda: get_user_profile(request.user))
+        return await self.get_response(request)
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """
+    Send the reads of GET and HEAD requests to the read replica.
+
+    Other methods read from and write to ``default``. A session that has
+    just written is pinned to ``default`` for REPLICA_PIN_SECONDS so the
+    user sees their own changes before the replica catches up. Must come
+    after SessionMiddleware.
+    """
+
+    def handle(self, request):
+        pinned_until = request.session.get(PIN_SESSION_KEY, 0)
+        with routing(self.use_replica(request, pinned_until)) as state:
+            response = self.get_response(request)
+        self.pin(request, state)
+        return response
+
+    async def ahandle(self, request):
+        # Loads the session from the database
+        pinned_until = await run_sync(request.session.get, PIN_SESSION_KEY, 0)
+        with routing(self.use_replica(request, pinned_until)) as state:
+            response = await self.get_response(request)
+        self.pin(request, state)
+        return response
+
+    def use_replica(self, request, pinned_until):
+        return request.method in ('GET', 'HEAD') and pinned_until < time.time()
+
+    def pin(self, request, state):
+        if state.wrote:
+            request.session[PIN_SESSION_KEY] = time.time() + settings.REPLICA_PIN_SECONDS
+
+
+class RequestMetricsMiddleware(HybridMiddleware):
+    """
+    Record SQL queries, SQL time, template time and latency per view.
+
+    Totals are kept per process and served by the metrics view; each
+    response also gets a Server-Timing header when SERVER_TIMING is on.
+    Views over their query budget are logged, or fail when
+    QUERY_BUDGETS_ENFORCED is on (as in the tests). Should come first
+    (after StaticFilesMiddleware), so the queries of the other middleware
+    are counted too.
+    """
+
+    def handle(self, request):
+        with measure_request() as metrics:
+            response = self.get_response(request)
+        return self.observe(request, response, metrics)
+
+    async def ahandle(self, request):
+        with measure_request() as metrics:
+            response = await self.get_response(request)
+        return self.observe(request, response, metrics)
+
+    def observe(self, request, response, metrics):
+        seconds = metrics.elapsed()
+
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        budget = get_query_budget(match.func) if match else None
+        registry.observe(view_name, metrics, seconds, budget)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = server_timing(metrics, seconds)
+        check_budget(view_name, metrics, budget)
+        return response
+
+
+class StaticFilesMiddleware(HybridMiddleware):
+    """
+    Serve the files collected in STATIC_ROOT, before any other middleware.
+
+    The files are indexed when the worker starts (see
+    ``employees.staticfiles``); a request for one of them is answered from
+    the index without sessions, authentication or metrics. Not used with
+    DEBUG on, where ``runserver`` serves the source files, nor before
+    ``collectstatic`` has run.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if settings.DEBUG or not settings.STATIC_ROOT or not os.path.isdir(settings.STATIC_ROOT):
+            raise MiddlewareNotUsed
+        self.files = index_static_root()
+
+    def handle(self, request):
+        response = self.serve(request)
+        return response if response is not None else self.get_response(request)
+
+    async def ahandle(self, request):
+        # Static files are small and in the page cache; reading one does not block the loop for long
+        response = self.serve(request)
+        return response if response is not None else await self.get_response(request)
+
+    def serve(self, request):
+        static_file = self.files.get(request.path)
+        if static_file is None:
+            return None
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        path, headers = static_file.variant(request.headers.get('Accept-Encoding', ''))
+        if headers['ETag'] in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+            for header in ('ETag', 'Cache-Control', 'Vary'):
+                if header in headers:
+                    response[header] = headers[header]
+            return response
+        if request.method == 'HEAD':
+            response = HttpResponse()
+        else:
+            with open(path, 'rb') as f:
+                response = HttpResponse(f.read())
+        for header, value in headers.items():
+            response[header] = value
+        if settings.SECURE_CONTENT_TYPE_NOSNIFF:
+            response['X-Content-Type-Options'] = 'nosniff'
+        return response
@@ -0,0 +1,33 @@
+# Generated by Django 2.1.15 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0003_auto_20241212_0602'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['created_at', 'id'], name='employee_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['email'], name='employee_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['department', 'position'], name='employee_dept_position_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['hire_date', 'id'], name='employee_hire_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['salary', 'id'], name='employee_salary_id_idx'),
+        ),
+    ]
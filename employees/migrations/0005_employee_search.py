@@ -0,0 +1,62 @@
+from django.db import migrations
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS employee_search USING fts5(
+        name, email, department, position,
+        content='employees_employee',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_search_ai AFTER INSERT ON employees_employee BEGIN
+        INSERT INTO employee_search(rowid, name, email, department, position)
+        VALUES (new.id, new.name, new.email, new.department, new.position);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_search_ad AFTER DELETE ON employees_employee BEGIN
+        INSERT INTO employee_search(employee_search, rowid, name, email, department, position)
+        VALUES ('delete', old.id, old.name, old.email, old.department, old.position);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_search_au
+    AFTER UPDATE OF name, email, department, position ON employees_employee BEGIN
+        INSERT INTO employee_search(employee_search, rowid, name, email, department, position)
+        VALUES ('delete', old.id, old.name, old.email, old.department, old.position);
+        INSERT INTO employee_search(rowid, name, email, department, position)
+        VALUES (new.id, new.name, new.email, new.department, new.position);
+    END
+    """,
+    "INSERT INTO employee_search(employee_search) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS employee_search_au',
+    'DROP TRIGGER IF EXISTS employee_search_ad',
+    'DROP TRIGGER IF EXISTS employee_search_ai',
+    'DROP TABLE IF EXISTS employee_search',
+]
+
+
+def run_sql(statements):
+    def forwards(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return forwards
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0004_employee_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(CREATE_SQL), run_sql(DROP_SQL)),
+    ]
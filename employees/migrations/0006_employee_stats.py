@@ -0,0 +1,122 @@
+# Generated by Django 2.1.15 on 2026-10-18 19:18
+
+from django.db import migrations, models
+
+CENTS = 'CAST(ROUND({row}.salary * 100) AS INTEGER)'
+MONTH = "strftime('%Y-%m', {row}.hire_date)"
+
+ADD_NEW = """
+    INSERT INTO employee_stats(department, position, headcount, salary_total_cents,
+                               min_salary, max_salary, minmax_stale)
+    VALUES (new.department, new.position, 1, {cents}, new.salary, new.salary, 0)
+    ON CONFLICT(department, position) DO UPDATE SET
+        headcount = headcount + 1,
+        salary_total_cents = salary_total_cents + excluded.salary_total_cents,
+        min_salary = CASE WHEN min_salary IS NULL OR excluded.min_salary < min_salary
+                          THEN excluded.min_salary ELSE min_salary END,
+        max_salary = CASE WHEN max_salary IS NULL OR excluded.max_salary > max_salary
+                          THEN excluded.max_salary ELSE max_salary END;
+    INSERT INTO employee_hiring_stats(month, department, hires)
+    VALUES ({month}, new.department, 1)
+    ON CONFLICT(month, department) DO UPDATE SET hires = hires + 1;
+""".format(cents=CENTS.format(row='new'), month=MONTH.format(row='new'))
+
+REMOVE_OLD = """
+    UPDATE employee_stats SET
+        headcount = headcount - 1,
+        salary_total_cents = salary_total_cents - {cents},
+        minmax_stale = CASE WHEN old.salary <= min_salary OR old.salary >= max_salary
+                            THEN 1 ELSE minmax_stale END
+    WHERE department = old.department AND position = old.position;
+    DELETE FROM employee_stats
+    WHERE department = old.department AND position = old.position AND headcount <= 0;
+    UPDATE employee_hiring_stats SET hires = hires - 1
+    WHERE month = {month} AND department = old.department;
+    DELETE FROM employee_hiring_stats
+    WHERE month = {month} AND department = old.department AND hires <= 0;
+""".format(cents=CENTS.format(row='old'), month=MONTH.format(row='old'))
+
+CREATE_SQL = [
+    'CREATE TRIGGER IF NOT EXISTS employee_stats_ai AFTER INSERT ON employees_employee BEGIN %s END' % ADD_NEW,
+    'CREATE TRIGGER IF NOT EXISTS employee_stats_ad AFTER DELETE ON employees_employee BEGIN %s END' % REMOVE_OLD,
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_stats_au
+    AFTER UPDATE OF department, position, salary, hire_date ON employees_employee
+    WHEN old.department IS NOT new.department OR old.position IS NOT new.position
+      OR old.salary IS NOT new.salary OR old.hire_date IS NOT new.hire_date
+    BEGIN %s %s END
+    """ % (REMOVE_OLD, ADD_NEW),
+    """
+    INSERT INTO employee_stats(department, position, headcount, salary_total_cents,
+                               min_salary, max_salary, minmax_stale)
+    SELECT department, position, COUNT(*), SUM(%s), MIN(salary), MAX(salary), 0
+    FROM employees_employee e GROUP BY department, position
+    """ % CENTS.format(row='e'),
+    """
+    INSERT INTO employee_hiring_stats(month, department, hires)
+    SELECT %s, department, COUNT(*)
+    FROM employees_employee e GROUP BY 1, department
+    """ % MONTH.format(row='e'),
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS employee_stats_au',
+    'DROP TRIGGER IF EXISTS employee_stats_ad',
+    'DROP TRIGGER IF EXISTS employee_stats_ai',
+]
+
+
+def run_sql(statements):
+    def forwards(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return forwards
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0005_employee_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(max_length=100)),
+                ('position', models.CharField(max_length=100)),
+                ('headcount', models.IntegerField(default=0)),
+                ('salary_total_cents', models.BigIntegerField(default=0)),
+                ('min_salary', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('max_salary', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('minmax_stale', models.BooleanField(default=False)),
+            ],
+            options={
+                'db_table': 'employee_stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='HiringStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.CharField(max_length=7)),
+                ('department', models.CharField(max_length=100)),
+                ('hires', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'employee_hiring_stats',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='hiringstats',
+            unique_together={('month', 'department')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='employeestats',
+            unique_together={('department', 'position')},
+        ),
+        migrations.RunPython(run_sql(CREATE_SQL), run_sql(DROP_SQL)),
+    ]
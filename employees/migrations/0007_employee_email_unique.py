@@ -0,0 +1,42 @@
+# Generated by Django 2.1.15 on 2026-10-18 19:20
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# SQLite applies AlterField by rebuilding the table, which drops the triggers
+# maintaining the search index and the summary tables; create them again.
+TRIGGER_SQL = [
+    statement
+    for module in ('0005_employee_search', '0006_employee_stats')
+    for statement in import_module('employees.migrations.' + module).CREATE_SQL
+    if 'CREATE TRIGGER' in statement
+]
+
+
+def create_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in TRIGGER_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0006_employee_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, create_triggers),
+        migrations.RemoveIndex(
+            model_name='employee',
+            name='employee_email_idx',
+        ),
+        migrations.AlterField(
+            model_name='employee',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True),
+        ),
+        migrations.RunPython(create_triggers, migrations.RunPython.noop),
+    ]
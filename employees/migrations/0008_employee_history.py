@@ -0,0 +1,61 @@
+# Generated by Django 2.1.15 on 2026-10-18 19:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+# History rows can be added, and their changed_by cleared when the user is
+# deleted, but never rewritten.
+CREATE_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_history_append_only
+    BEFORE UPDATE OF employee_id, employee_code, action, changes, salary, changed_at ON employee_history
+    BEGIN SELECT RAISE(ABORT, 'employee_history is append-only'); END
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS employee_history_append_only',
+]
+
+
+def run_sql(statements):
+    def forwards(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return forwards
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('employees', '0007_employee_email_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeHistory',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('employee_code', models.CharField(max_length=20)),
+                ('action', models.CharField(choices=[('update', 'Update'), ('delete', 'Delete')], max_length=10)),
+                ('changes', models.TextField()),
+                ('salary', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('changed_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('employee', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='history', to='employees.Employee')),
+            ],
+            options={
+                'db_table': 'employee_history',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='employeehistory',
+            index=models.Index(fields=['employee', 'changed_at', 'id'], name='employee_history_timeline_idx'),
+        ),
+        migrations.RunPython(run_sql(CREATE_SQL), run_sql(DROP_SQL)),
+    ]
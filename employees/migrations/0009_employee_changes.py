@@ -0,0 +1,65 @@
+# Generated by Django 2.1.15 on 2026-10-18 19:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# REPLACE deletes the employee's previous row (unique employee_id) and
+# inserts a new one, which takes the next AUTOINCREMENT seq.
+UPSERT = "REPLACE INTO employee_change(employee_id, deleted, changed_at) VALUES (new.id, 0, new.updated_at);"
+
+CREATE_SQL = [
+    'CREATE TRIGGER IF NOT EXISTS employee_change_ai AFTER INSERT ON employees_employee BEGIN %s END' % UPSERT,
+    'CREATE TRIGGER IF NOT EXISTS employee_change_au AFTER UPDATE ON employees_employee BEGIN %s END' % UPSERT,
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_change_ad AFTER DELETE ON employees_employee BEGIN
+        REPLACE INTO employee_change(employee_id, deleted, changed_at)
+        VALUES (old.id, 1, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END
+    """,
+    """
+    INSERT INTO employee_change(employee_id, deleted, changed_at)
+    SELECT id, 0, updated_at FROM employees_employee ORDER BY updated_at, id
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS employee_change_ad',
+    'DROP TRIGGER IF EXISTS employee_change_au',
+    'DROP TRIGGER IF EXISTS employee_change_ai',
+]
+
+
+def run_sql(statements):
+    def forwards(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return forwards
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0008_employee_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeChange',
+            fields=[
+                ('seq', models.AutoField(primary_key=True, serialize=False)),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField()),
+                ('employee', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='employees.Employee')),
+            ],
+            options={
+                'db_table': 'employee_change',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='employeechange',
+            index=models.Index(fields=['changed_at', 'seq'], name='employee_change_time_idx'),
+        ),
+        migrations.RunPython(run_sql(CREATE_SQL), run_sql(DROP_SQL)),
+    ]
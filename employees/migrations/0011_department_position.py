@@ -0,0 +1,356 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:20
+
+from collections import Counter
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Case, Count, Value, When
+import django.db.models.deletion
+
+OLD = [import_module('employees.migrations.' + module)
+       for module in ('0005_employee_search', '0006_employee_stats', '0009_employee_changes')]
+
+CENTS = 'CAST(ROUND({row}.salary * 100) AS INTEGER)'
+MONTH = "strftime('%Y-%m', {row}.hire_date)"
+DEPARTMENT_NAME = '(SELECT name FROM employee_department WHERE id = {row}.department_id)'
+POSITION_NAME = '(SELECT name FROM employee_position WHERE id = {row}.position_id)'
+
+# The search index reads names through a view of the employees, and is kept
+# in sync by triggers on the employees and on renames of their departments
+# and positions.
+SEARCH_SQL = [
+    """
+    CREATE VIEW IF NOT EXISTS employee_search_content AS
+    SELECT e.id AS id, e.name AS name, e.email AS email, d.name AS department, p.name AS position
+    FROM employees_employee e
+    JOIN employee_department d ON d.id = e.department_id
+    JOIN employee_position p ON p.id = e.position_id
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS employee_search USING fts5(
+        name, email, department, position,
+        content='employee_search_content',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_search_ai AFTER INSERT ON employees_employee BEGIN
+        INSERT INTO employee_search(rowid, name, email, department, position)
+        VALUES (new.id, new.name, new.email, {new_department}, {new_position});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_search_ad AFTER DELETE ON employees_employee BEGIN
+        INSERT INTO employee_search(employee_search, rowid, name, email, department, position)
+        VALUES ('delete', old.id, old.name, old.email, {old_department}, {old_position});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_search_au
+    AFTER UPDATE OF name, email, department_id, position_id ON employees_employee BEGIN
+        INSERT INTO employee_search(employee_search, rowid, name, email, department, position)
+        VALUES ('delete', old.id, old.name, old.email, {old_department}, {old_position});
+        INSERT INTO employee_search(rowid, name, email, department, position)
+        VALUES (new.id, new.name, new.email, {new_department}, {new_position});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_search_department_au
+    AFTER UPDATE OF name ON employee_department BEGIN
+        INSERT INTO employee_search(employee_search, rowid, name, email, department, position)
+        SELECT 'delete', e.id, e.name, e.email, old.name, {e_position}
+        FROM employees_employee e WHERE e.department_id = old.id;
+        INSERT INTO employee_search(rowid, name, email, department, position)
+        SELECT e.id, e.name, e.email, new.name, {e_position}
+        FROM employees_employee e WHERE e.department_id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_search_position_au
+    AFTER UPDATE OF name ON employee_position BEGIN
+        INSERT INTO employee_search(employee_search, rowid, name, email, department, position)
+        SELECT 'delete', e.id, e.name, e.email, {e_department}, old.name
+        FROM employees_employee e WHERE e.position_id = old.id;
+        INSERT INTO employee_search(rowid, name, email, department, position)
+        SELECT e.id, e.name, e.email, {e_department}, new.name
+        FROM employees_employee e WHERE e.position_id = new.id;
+    END
+    """,
+]
+SEARCH_SQL = [statement.format(
+    new_department=DEPARTMENT_NAME.format(row='new'), new_position=POSITION_NAME.format(row='new'),
+    old_department=DEPARTMENT_NAME.format(row='old'), old_position=POSITION_NAME.format(row='old'),
+    e_department=DEPARTMENT_NAME.format(row='e'), e_position=POSITION_NAME.format(row='e'),
+) for statement in SEARCH_SQL]
+
+ADD_NEW = """
+    INSERT INTO employee_stats(department_id, position_id, headcount, salary_total_cents,
+                               min_salary, max_salary, minmax_stale)
+    VALUES (new.department_id, new.position_id, 1, {cents}, new.salary, new.salary, 0)
+    ON CONFLICT(department_id, position_id) DO UPDATE SET
+        headcount = headcount + 1,
+        salary_total_cents = salary_total_cents + excluded.salary_total_cents,
+        min_salary = CASE WHEN min_salary IS NULL OR excluded.min_salary < min_salary
+                          THEN excluded.min_salary ELSE min_salary END,
+        max_salary = CASE WHEN max_salary IS NULL OR excluded.max_salary > max_salary
+                          THEN excluded.max_salary ELSE max_salary END;
+    INSERT INTO employee_hiring_stats(month, department_id, hires)
+    VALUES ({month}, new.department_id, 1)
+    ON CONFLICT(month, department_id) DO UPDATE SET hires = hires + 1;
+""".format(cents=CENTS.format(row='new'), month=MONTH.format(row='new'))
+
+REMOVE_OLD = """
+    UPDATE employee_stats SET
+        headcount = headcount - 1,
+        salary_total_cents = salary_total_cents - {cents},
+        minmax_stale = CASE WHEN old.salary <= min_salary OR old.salary >= max_salary
+                            THEN 1 ELSE minmax_stale END
+    WHERE department_id = old.department_id AND position_id = old.position_id;
+    DELETE FROM employee_stats
+    WHERE department_id = old.department_id AND position_id = old.position_id AND headcount <= 0;
+    UPDATE employee_hiring_stats SET hires = hires - 1
+    WHERE month = {month} AND department_id = old.department_id;
+    DELETE FROM employee_hiring_stats
+    WHERE month = {month} AND department_id = old.department_id AND hires <= 0;
+""".format(cents=CENTS.format(row='old'), month=MONTH.format(row='old'))
+
+STATS_SQL = [
+    'CREATE TRIGGER IF NOT EXISTS employee_stats_ai AFTER INSERT ON employees_employee BEGIN %s END' % ADD_NEW,
+    'CREATE TRIGGER IF NOT EXISTS employee_stats_ad AFTER DELETE ON employees_employee BEGIN %s END' % REMOVE_OLD,
+    """
+    CREATE TRIGGER IF NOT EXISTS employee_stats_au
+    AFTER UPDATE OF department_id, position_id, salary, hire_date ON employees_employee
+    WHEN old.department_id IS NOT new.department_id OR old.position_id IS NOT new.position_id
+      OR old.salary IS NOT new.salary OR old.hire_date IS NOT new.hire_date
+    BEGIN %s %s END
+    """ % (REMOVE_OLD, ADD_NEW),
+]
+
+CHANGE_SQL = [statement for statement in OLD[2].CREATE_SQL if 'CREATE TRIGGER' in statement]
+
+FILL_SQL = [
+    "INSERT INTO employee_search(employee_search) VALUES ('rebuild')",
+    """
+    INSERT INTO employee_stats(department_id, position_id, headcount, salary_total_cents,
+                               min_salary, max_salary, minmax_stale)
+    SELECT department_id, position_id, COUNT(*), SUM(%s), MIN(salary), MAX(salary), 0
+    FROM employees_employee e GROUP BY department_id, position_id
+    """ % CENTS.format(row='e'),
+    """
+    INSERT INTO employee_hiring_stats(month, department_id, hires)
+    SELECT %s, department_id, COUNT(*)
+    FROM employees_employee e GROUP BY 1, department_id
+    """ % MONTH.format(row='e'),
+]
+
+# Later migrations that rebuild employees_employee create the triggers again from CREATE_SQL
+CREATE_SQL = SEARCH_SQL + STATS_SQL + CHANGE_SQL + FILL_SQL
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS employee_search_position_au',
+    'DROP TRIGGER IF EXISTS employee_search_department_au',
+] + OLD[0].DROP_SQL + [
+    'DROP VIEW IF EXISTS employee_search_content',
+] + OLD[1].DROP_SQL + OLD[2].DROP_SQL
+
+
+SPELLINGS_PER_UPDATE = 300
+
+
+def run_sql(statements):
+    def forwards(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return forwards
+
+
+def restore_old_sql(apps, schema_editor):
+    """Backwards: the search index and triggers of migrations 0005, 0006 and 0009, on the name columns."""
+    run_sql(OLD[0].CREATE_SQL + OLD[1].CREATE_SQL
+            + [statement for statement in OLD[2].CREATE_SQL if 'CREATE TRIGGER' in statement])(apps, schema_editor)
+
+
+def canonical_names(counts):
+    """
+    Map each spelling in ``counts`` (``{spelling: rows}``) to the name kept for it.
+
+    Spellings that differ only in case or whitespace are one name, spelled
+    the way most rows spell it.
+    """
+    groups = {}
+    for spelling, rows in counts.items():
+        key = ' '.join(spelling.split()).casefold()
+        groups.setdefault(key, Counter())[' '.join(spelling.split()) or 'Unassigned'] += rows
+    names = {}
+    for spelling in counts:
+        group = groups[' '.join(spelling.split()).casefold()]
+        names[spelling] = min(group, key=lambda name: (-group[name], name))
+    return names
+
+
+def fill_lookups(apps, schema_editor):
+    """Create a department and a position per distinct name and point every employee at them."""
+    Employee = apps.get_model('employees', 'Employee')
+    Department = apps.get_model('employees', 'Department')
+    Position = apps.get_model('employees', 'Position')
+    db = schema_editor.connection.alias
+    pairs = list(Employee.objects.using(db).order_by().values_list('department_name', 'position_name')
+                 .annotate(rows=Count('pk')))
+    department_counts, position_counts = Counter(), Counter()
+    for department, position, rows in pairs:
+        department_counts[department] += rows
+        position_counts[position] += rows
+    department_names = canonical_names(department_counts)
+    position_names = canonical_names(position_counts)
+    departments = {name: Department.objects.using(db).get_or_create(name=name)[0].pk
+                   for name in set(department_names.values())}
+    positions = {name: Position.objects.using(db).get_or_create(name=name)[0].pk
+                 for name in set(position_names.values())}
+    _set_ids(Employee.objects.using(db), 'department', department_names, departments)
+    _set_ids(Employee.objects.using(db), 'position', position_names, positions)
+
+
+def _set_ids(queryset, field, names, ids):
+    """Point ``field`` of every employee at the row its ``<field>_name`` spelling maps to."""
+    spellings = sorted(names)
+    # A pass over the table per SPELLINGS_PER_UPDATE spellings (two query parameters each)
+    for start in range(0, len(spellings), SPELLINGS_PER_UPDATE):
+        chunk = spellings[start:start + SPELLINGS_PER_UPDATE]
+        queryset.filter(**{'%s_name__in' % field: chunk}).update(**{field: Case(*[
+            When(**{'%s_name' % field: spelling, 'then': Value(ids[names[spelling]])}) for spelling in chunk
+        ])})
+
+
+def fill_names(apps, schema_editor):
+    """Backwards: copy the department and position names back onto the employees."""
+    Employee = apps.get_model('employees', 'Employee')
+    Department = apps.get_model('employees', 'Department')
+    Position = apps.get_model('employees', 'Position')
+    db = schema_editor.connection.alias
+    departments = list(Department.objects.using(db))
+    positions = list(Position.objects.using(db))
+    if not departments or not positions:
+        return
+    Employee.objects.using(db).update(
+        department_name=Case(*[When(department=obj.pk, then=Value(obj.name)) for obj in departments]),
+        position_name=Case(*[When(position=obj.pk, then=Value(obj.name)) for obj in positions]),
+    )
+
+
+def clear_stats(apps, schema_editor):
+    """The summary tables are rebuilt from the employees once their columns are changed."""
+    db = schema_editor.connection.alias
+    apps.get_model('employees', 'EmployeeStats').objects.using(db).all().delete()
+    apps.get_model('employees', 'HiringStats').objects.using(db).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0010_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(OLD[2].DROP_SQL + OLD[1].DROP_SQL + OLD[0].DROP_SQL), restore_old_sql),
+        migrations.CreateModel(
+            name='Department',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'db_table': 'employee_department',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Position',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'db_table': 'employee_position',
+                'ordering': ['name'],
+            },
+        ),
+
+        # Employees: name columns -> foreign keys
+        migrations.RemoveIndex(model_name='employee', name='employee_dept_position_idx'),
+        migrations.RenameField(model_name='employee', old_name='department', new_name='department_name'),
+        migrations.RenameField(model_name='employee', old_name='position', new_name='position_name'),
+        migrations.AddField(
+            model_name='employee',
+            name='department',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT,
+                                    related_name='employees', to='employees.Department'),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='position',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT,
+                                    related_name='employees', to='employees.Position'),
+        ),
+        migrations.RunPython(fill_lookups, fill_names),
+        # A default, so that unapplying can add the columns back before fill_names runs
+        migrations.AlterField(model_name='employee', name='department_name',
+                              field=models.CharField(default='', max_length=100)),
+        migrations.AlterField(model_name='employee', name='position_name',
+                              field=models.CharField(default='', max_length=100)),
+        migrations.RemoveField(model_name='employee', name='department_name'),
+        migrations.RemoveField(model_name='employee', name='position_name'),
+        migrations.AlterField(
+            model_name='employee',
+            name='department',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT,
+                                    related_name='employees', to='employees.Department'),
+        ),
+        migrations.AlterField(
+            model_name='employee',
+            name='position',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT,
+                                    related_name='employees', to='employees.Position'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['department', 'position'], name='employee_dept_position_idx'),
+        ),
+
+        # Summary tables: emptied, switched to foreign keys and refilled by FILL_SQL
+        migrations.RunPython(clear_stats, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(name='employeestats', unique_together=set()),
+        migrations.AlterUniqueTogether(name='hiringstats', unique_together=set()),
+        migrations.RemoveField(model_name='employeestats', name='department'),
+        migrations.RemoveField(model_name='employeestats', name='position'),
+        migrations.RemoveField(model_name='hiringstats', name='department'),
+        migrations.AddField(
+            model_name='employeestats',
+            name='department',
+            field=models.ForeignKey(db_index=False, default=0, on_delete=django.db.models.deletion.CASCADE,
+                                    related_name='+', to='employees.Department'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='employeestats',
+            name='position',
+            field=models.ForeignKey(db_index=False, default=0, on_delete=django.db.models.deletion.CASCADE,
+                                    related_name='+', to='employees.Position'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='hiringstats',
+            name='department',
+            field=models.ForeignKey(db_index=False, default=0, on_delete=django.db.models.deletion.CASCADE,
+                                    related_name='+', to='employees.Department'),
+            preserve_default=False,
+        ),
+        migrations.AlterUniqueTogether(name='employeestats', unique_together={('department', 'position')}),
+        migrations.AlterUniqueTogether(name='hiringstats', unique_together={('month', 'department')}),
+        migrations.RunPython(migrations.RunPython.noop, clear_stats),
+
+        migrations.RunPython(run_sql(CREATE_SQL), run_sql(DROP_SQL)),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0011_department_position'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['department', 'created_at', 'id'], name='employee_dept_created_idx'),
+        ),
+    ]
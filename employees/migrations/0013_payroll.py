@@ -0,0 +1,68 @@
+# Generated by Django 4.2.30 on 2026-10-18 21:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('employees', '0012_employee_dept_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(unique=True)),
+                ('employee_count', models.IntegerField(default=0)),
+                ('salary_total', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('bonus_total', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(null=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'payroll_run',
+            },
+        ),
+        migrations.CreateModel(
+            name='PayrollEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('salary', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('days_paid', models.SmallIntegerField()),
+                ('gross', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('prorated', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('bonus', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('department', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='employees.department')),
+                ('employee', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='payroll_entries', to='employees.employee')),
+                ('run', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='employees.payrollrun')),
+            ],
+            options={
+                'db_table': 'payroll_entry',
+                'unique_together': {('run', 'employee')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PayrollDepartmentTotal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('employee_count', models.IntegerField()),
+                ('salary_total', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('bonus_total', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('department', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='employees.department')),
+                ('run', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='department_totals', to='employees.payrollrun')),
+            ],
+            options={
+                'db_table': 'payroll_department_total',
+                'unique_together': {('run', 'department')},
+            },
+        ),
+    ]
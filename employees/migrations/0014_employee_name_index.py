@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 21:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0013_payroll'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['name', 'id'], name='employee_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-18 21:27
+
+from django.db import migrations, models
+
+# A new random token, so that a version rolled back with its transaction is
+# never handed out again for different contents.
+BUMP = ("REPLACE INTO employee_lookups_version(id, version, changed_at) "
+        "VALUES (1, random(), strftime('%Y-%m-%d %H:%M:%f', 'now'));")
+
+TABLES = ('employee_department', 'employee_position')
+EVENTS = (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE'))
+
+CREATE_SQL = [
+    'CREATE TRIGGER IF NOT EXISTS %s_version_%s AFTER %s ON %s BEGIN %s END' % (table, suffix, event, table, BUMP)
+    for table in TABLES for suffix, event in EVENTS
+] + [BUMP]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS %s_version_%s' % (table, suffix)
+    for table in TABLES for suffix, _ in EVENTS
+]
+
+
+def run_sql(statements):
+    def forwards(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return forwards
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0014_employee_name_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LookupsVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField()),
+                ('changed_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'employee_lookups_version',
+            },
+        ),
+        migrations.RunPython(run_sql(CREATE_SQL), run_sql(DROP_SQL)),
+    ]
@@ -1,5 +1,8 @@
+import json
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -14,13 +17,58 @@ class UserProfile(models.Model):
     class Meta:
         db_table = 'user_profile'
 
+class Department(models.Model):
+    """A department, referred to by id from employees (see ``employees.lookups``)."""
+    name = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        db_table = 'employee_department'
+        ordering = ['name']
+
+
+class Position(models.Model):
+    """A job title, referred to by id from employees (see ``employees.lookups``)."""
+    name = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        db_table = 'employee_position'
+        ordering = ['name']
+
+
+class LookupsVersion(models.Model):
+    """
+    Token of the current contents of the department and position tables.
+
+    A single row, replaced with a new random ``version`` by database
+    triggers on every insert, update or delete of either table (see
+    migration 0015), whichever process or code path writes. Processes that
+    keep the tables in memory reload them when it changes (see
+    ``employees.lookups``).
+    """
+    version = models.BigIntegerField()
+    changed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.version} ({self.changed_at})"
+
+    class Meta:
+        db_table = 'employee_lookups_version'
+
+
 class Employee(models.Model):
     employee_id = models.CharField(max_length=20, unique=True)
     name = models.CharField(max_length=100)
-    department = models.CharField(max_length=100)
-    position = models.CharField(max_length=100)
+    # Both indexed by employee_dept_position_idx.
+    department = models.ForeignKey(Department, on_delete=models.PROTECT, db_index=False, related_name='employees')
+    position = models.ForeignKey(Position, on_delete=models.PROTECT, db_index=False, related_name='employees')
     salary = models.DecimalField(max_digits=10, decimal_places=2)
-    email = models.EmailField()
+    email = models.EmailField(unique=True)
     hire_date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -31,4 +79,268 @@ class Employee(models.Model):
         return f"{self.name} ({self.employee_id})"
 
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            # Default ordering and keyset pagination of the employee list.
+            models.Index(fields=['created_at', 'id'], name='employee_created_id_idx'),
+            # Name ordering of the employee list.
+            models.Index(fields=['name', 'id'], name='employee_name_id_idx'),
+            # Department / position filters and admin list_filter choices.
+            models.Index(fields=['department', 'position'], name='employee_dept_position_idx'),
+            # Department filter of the admin changelist, newest first.
+            models.Index(fields=['department', 'created_at', 'id'], name='employee_dept_created_idx'),
+            # Hire date ranges and hire date ordering.
+            models.Index(fields=['hire_date', 'id'], name='employee_hire_date_id_idx'),
+            # Salary ranges and salary ordering.
+            models.Index(fields=['salary', 'id'], name='employee_salary_id_idx'),
+        ]
+
+class EmployeeStats(models.Model):
+    """
+    Headcount and salary aggregates per department and position.
+
+    Maintained incrementally by database triggers on the Employee table (see
+    migration 0011), so every write path keeps it current. ``min_salary`` and
+    ``max_salary`` cannot be maintained exactly when the current extreme
+    leaves the group; such rows are flagged ``minmax_stale`` and refreshed on
+    read by ``employees.analytics``.
+    """
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, db_index=False, related_name='+')
+    position = models.ForeignKey(Position, on_delete=models.CASCADE, db_index=False, related_name='+')
+    headcount = models.IntegerField(default=0)
+    salary_total_cents = models.BigIntegerField(default=0)
+    min_salary = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    max_salary = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    minmax_stale = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.department} / {self.position}"
+
+    class Meta:
+        db_table = 'employee_stats'
+        unique_together = ('department', 'position')
+
+
+class HiringStats(models.Model):
+    """Number of employees hired per month (``YYYY-MM``) and department, maintained like EmployeeStats."""
+    month = models.CharField(max_length=7)
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, db_index=False, related_name='+')
+    hires = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.month} {self.department}"
+
+    class Meta:
+        db_table = 'employee_hiring_stats'
+        unique_together = ('month', 'department')
+
+
+class EmployeeHistory(models.Model):
+    """
+    Append-only record of a change to an employee, holding only the changed fields.
+
+    ``changes`` is a JSON object mapping each changed field to ``[old, new]``
+    (``new`` is null for deletions). ``salary`` repeats the new salary of
+    salary changes so salary histories need no JSON decoding. Rows outlive
+    the employee they describe; a database trigger (migration 0008) rejects
+    any update of their content.
+    """
+    ACTION_UPDATE = 'update'
+    ACTION_DELETE = 'delete'
+    ACTION_CHOICES = ((ACTION_UPDATE, 'Update'), (ACTION_DELETE, 'Delete'))
+
+    # No foreign key constraint: history is kept after the employee is deleted.
+    # Indexed by employee_history_timeline_idx.
+    employee = models.ForeignKey(Employee, on_delete=models.DO_NOTHING, db_constraint=False,
+                                 db_index=False, related_name='history')
+    employee_code = models.CharField(max_length=20)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changes = models.TextField()
+    salary = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.action} of {self.employee_code} at {self.changed_at}"
+
+    def get_changes(self):
+        return json.loads(self.changes)
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('Employee history is append-only.')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('Employee history is append-only.')
+
+    class Meta:
+        db_table = 'employee_history'
+        indexes = [
+            # Per employee timeline and salary history, newest first.
+            models.Index(fields=['employee', 'changed_at', 'id'], name='employee_history_timeline_idx'),
+        ]
+
+
+class EmployeeChange(models.Model):
+    """
+    Latest change of each employee, for incremental sync (the change feed).
+
+    Maintained by database triggers on the Employee table (see migration
+    0009), so every write path, bulk updates and deletes included, is
+    recorded. Each insert or update replaces the employee's row with a new
+    one, so ``seq`` (AUTOINCREMENT, never reused) orders the changes and a
+    consumer sees each employee once however often it changed. Deleted
+    employees keep a tombstone row with ``deleted`` set.
+    """
+    seq = models.AutoField(primary_key=True)
+    # No foreign key constraint: tombstones outlive the employee.
+    employee = models.OneToOneField(Employee, on_delete=models.DO_NOTHING, db_constraint=False,
+                                    related_name='+')
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"#{self.seq} {'delete' if self.deleted else 'upsert'} of {self.employee_id}"
+
+    class Meta:
+        db_table = 'employee_change'
+        indexes = [
+            # Finding the first change after a point in time (covering).
+            models.Index(fields=['changed_at', 'seq'], name='employee_change_time_idx'),
+        ]
+
+
+class Job(models.Model):
+    """
+    A long-running operation queued by a request and run by ``manage.py run_workers``.
+
+    See ``employees.jobs`` for the task kinds and the queue operations.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_CANCELLED, 'Cancelled'),
+    )
+    FINISHED = (STATUS_SUCCEEDED, STATUS_FAILED, STATUS_CANCELLED)
+
+    kind = models.CharField(max_length=50)
+    payload = models.TextField(default='{}')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    progress_done = models.IntegerField(default=0)
+    progress_total = models.IntegerField(null=True)
+    message = models.CharField(max_length=200, blank=True)
+    result = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    cancel_requested = models.BooleanField(default=False)
+    run_after = models.DateTimeField(default=timezone.now)
+    worker = models.CharField(max_length=100, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    heartbeat_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    def get_payload(self):
+        return json.loads(self.payload)
+
+    def get_result(self):
+        return json.loads(self.result) if self.result else None
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED
+
+    @property
+    def percent(self):
+        if not self.progress_total:
+            return None
+        return min(100, int(self.progress_done * 100 / self.progress_total))
+
+    class Meta:
+        db_table = 'background_job'
+        indexes = [
+            # Claiming the next due job.
+            models.Index(fields=['status', 'run_after', 'id'], name='job_claim_idx'),
+        ]
+
+
+class PayrollRun(models.Model):
+    """
+    The payroll of one month, computed by ``employees.payroll``.
+
+    ``period`` is the first day of the month. ``salary_total`` is the sum
+    of the prorated pay of the entries, ``bonus_total`` of their bonuses
+    and ``total`` of what is paid; all are set once ``finished_at`` is.
+    """
+    period = models.DateField(unique=True)
+    employee_count = models.IntegerField(default=0)
+    salary_total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    bonus_total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f"Payroll {self.period:%Y-%m}"
+
+    class Meta:
+        db_table = 'payroll_run'
+
+
+class PayrollEntry(models.Model):
+    """
+    The pay of one employee in a payroll run, in the currency of ``salary``.
+
+    ``gross`` is a month of the annual salary, ``prorated`` the part of it
+    for the ``days_paid`` days employed in the month, ``bonus`` the tenure
+    bonus on top of that, and ``total`` what is paid.
+    """
+    run = models.ForeignKey(PayrollRun, on_delete=models.CASCADE, db_index=False, related_name='entries')
+    # No foreign key constraint: payslips are kept after the employee is deleted.
+    employee = models.ForeignKey(Employee, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+                                 related_name='payroll_entries')
+    department = models.ForeignKey(Department, on_delete=models.PROTECT, db_index=False, related_name='+')
+    salary = models.DecimalField(max_digits=10, decimal_places=2)
+    days_paid = models.SmallIntegerField()
+    gross = models.DecimalField(max_digits=10, decimal_places=2)
+    prorated = models.DecimalField(max_digits=10, decimal_places=2)
+    bonus = models.DecimalField(max_digits=10, decimal_places=2)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.run} / {self.employee_id}"
+
+    class Meta:
+        db_table = 'payroll_entry'
+        unique_together = ('run', 'employee')
+
+
+class PayrollDepartmentTotal(models.Model):
+    """The totals of a payroll run per department."""
+    run = models.ForeignKey(PayrollRun, on_delete=models.CASCADE, db_index=False, related_name='department_totals')
+    department = models.ForeignKey(Department, on_delete=models.PROTECT, db_index=False, related_name='+')
+    employee_count = models.IntegerField()
+    salary_total = models.DecimalField(max_digits=15, decimal_places=2)
+    bonus_total = models.DecimalField(max_digits=15, decimal_places=2)
+    total = models.DecimalField(max_digits=15, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.run} / {self.department}"
+
+    class Meta:
+        db_table = 'payroll_department_total'
+        unique_together = ('run', 'department')
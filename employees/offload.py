@@ -0,0 +1,78 @@
+"""
+Running the blocking parts of async views in a bounded thread pool.
+
+Under ASGI an async view only holds the event loop while it waits, so
+slow clients cost a socket rather than a worker thread. Everything that
+blocks (the ORM, sessions, template rendering) goes through
+``run_sync()``, which runs it in a pool of ASYNC_DB_THREADS threads per
+process; that also caps the database connections a process opens. The
+context variables of the caller (request metrics, replica routing) are
+copied into the pool thread.
+
+With ASYNC_DB_THREADS = 0 the work runs on the request's own sync thread
+instead, as Django does for sync views; the tests use that, since the
+data of a TestCase only exists in the transaction of that thread.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """The process wide pool, created with ASYNC_DB_THREADS threads on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.ASYNC_DB_THREADS,
+                                           thread_name_prefix='hrmanage-db')
+        return _executor
+
+
+def _call(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # Pool threads keep their connection for CONN_MAX_AGE, like WSGI threads between requests
+        close_old_connections()
+
+
+async def run_sync(func, *args, **kwargs):
+    """Run the blocking ``func(*args, **kwargs)`` without blocking the event loop and return its result."""
+    if not settings.ASYNC_DB_THREADS:
+        return await sync_to_async(func, thread_sensitive=True)(*args, **kwargs)
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, _call, func, args, kwargs)
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), call)
+
+
+def async_view(view):
+    """
+    Turn a (decorated) sync view into an async view whose body runs with ``run_sync()``.
+
+    The request is read and the response sent by the event loop; the
+    view, from the session and user lookups to the rendered template,
+    takes a pool thread only while it runs.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run_sync(view, request, *args, **kwargs)
+    return wrapper
+
+
+async def aiter_sync(iterator):
+    """Async iterator over the items of a blocking ``iterator``, each ``next()`` run with ``run_sync()``."""
+    done = object()
+    while True:
+        item = await run_sync(next, iterator, done)
+        if item is done:
+            return
+        yield item
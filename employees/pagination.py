@@ -0,0 +1,141 @@
+import base64
+import json
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+class KeysetPage:
+    """A single page of results produced by KeysetPaginator."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Cursor based paginator ordering on ``(field, pk)``.
+
+    Each page is fetched with a ``WHERE (field, pk) < (last_value, last_pk)``
+    style predicate and a ``LIMIT``, seeking the ``(field, id)`` index, so
+    the cost of a page does not depend on how deep into the result set it is
+    or on the size of the table.
+    """
+
+    def __init__(self, queryset, ordering='-created_at', page_size=50):
+        self.queryset = queryset
+        self.descending = ordering.startswith('-')
+        self.field = ordering.lstrip('-')
+        self.page_size = page_size
+        self.model_field = queryset.model._meta.get_field(self.field)
+
+    def _order_by(self, reverse=False):
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        return (prefix + self.field, prefix + 'pk')
+
+    def _seek(self, value, pk, reverse=False):
+        # ``field <= v AND (field < v OR pk < last_pk)``: the outer range lets
+        # SQLite seek the (field, id) index, which it cannot do on the OR alone.
+        lookup = 'lt' if self.descending != reverse else 'gt'
+        return (
+            Q(**{'%s__%se' % (self.field, lookup): value}) &
+            (Q(**{'%s__%s' % (self.field, lookup): value}) | Q(**{self.field: value, 'pk__%s' % lookup: pk}))
+        )
+
+    def _row_key(self, obj):
+        """Return ``(sort value, pk)`` of a model instance or a ``.values()`` dict."""
+        if isinstance(obj, dict):
+            return obj[self.field], obj['id']
+        return getattr(obj, self.model_field.attname), obj.pk
+
+    def encode_cursor(self, obj, direction):
+        value, pk = self._row_key(obj)
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        elif value is not None:
+            value = str(value)
+        payload = json.dumps({'v': value, 'pk': pk, 'd': direction})
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            direction = payload['d']
+            if direction not in ('next', 'prev'):
+                raise ValueError(direction)
+            value = self.model_field.to_python(payload['v'])
+            pk = int(payload['pk'])
+        except Exception as e:
+            raise InvalidCursor(str(e))
+        return value, pk, direction
+
+    def get_page(self, cursor=None):
+        """Return the page following (or preceding) ``cursor``."""
+        if not cursor:
+            rows = list(self.queryset.order_by(*self._order_by())[:self.page_size + 1])
+            has_more = len(rows) > self.page_size
+            rows = rows[:self.page_size]
+            return KeysetPage(
+                rows,
+                next_cursor=self.encode_cursor(rows[-1], 'next') if has_more else None,
+            )
+
+        value, pk, direction = self.decode_cursor(cursor)
+        reverse = direction == 'prev'
+        qs = self.queryset.filter(self._seek(value, pk, reverse=reverse))
+        rows = list(qs.order_by(*self._order_by(reverse=reverse))[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            next_cursor = self.encode_cursor(rows[-1], 'next') if rows else None
+            previous_cursor = self.encode_cursor(rows[0], 'prev') if has_more else None
+        else:
+            next_cursor = self.encode_cursor(rows[-1], 'next') if has_more else None
+            previous_cursor = self.encode_cursor(rows[0], 'prev') if rows else None
+        return KeysetPage(rows, next_cursor=next_cursor, previous_cursor=previous_cursor)
+
+
+class CappedCountPaginator(Paginator):
+    """
+    Page number paginator that does not count a large table row by row.
+
+    ``count``, when known (e.g. from a summary table), is used as is;
+    otherwise counting stops at ``count_limit`` rows, so at most the pages
+    up to that many rows are offered.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, count=None, count_limit=None):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.known_count = count
+        self.count_limit = count_limit
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        if self.count_limit:
+            return self.object_list[:self.count_limit].count()
+        return super().count
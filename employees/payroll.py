@@ -0,0 +1,197 @@
+"""
+Monthly payroll, computed a column at a time.
+
+``run_payroll()`` streams ``(id, salary, hire date, department)`` of the
+employees hired by the end of the month out of the employee table in
+chunks of PAYROLL_CHUNK_SIZE rows, computes each chunk with NumPy integer
+arithmetic on cents and bulk_creates its PayrollEntry rows, one
+transaction per chunk. Per employee, in cents, each step rounded half up
+like ``Decimal.quantize(ROUND_HALF_UP)``:
+
+- ``gross``: the annual salary / 12;
+- ``prorated``: gross * days employed in the month / days in the month,
+  which only differs from gross for the month of hire;
+- ``bonus``: prorated * the BONUS_TIERS rate of the full years of service
+  at the end of the month;
+- ``total``: prorated + bonus.
+
+``decimal_entry()`` computes the same for one employee with Decimal; it is
+the reference the engine is tested against.
+"""
+import calendar
+import datetime
+import time
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import PayrollDepartmentTotal, PayrollEntry, PayrollRun
+
+CENT = Decimal('0.01')
+# (full years of service, bonus in basis points of the prorated pay), longest service first
+BONUS_TIERS = ((10, 500), (5, 300), (2, 100))
+
+CHUNK_SQL = """
+    SELECT id, CAST(ROUND(salary * 100) AS INTEGER), hire_date, department_id
+    FROM employees_employee
+    WHERE id > %s AND hire_date <= %s
+    ORDER BY id LIMIT %s
+"""
+
+
+def month_bounds(period):
+    """First and last day of the month of ``period``."""
+    first = period.replace(day=1)
+    return first, first.replace(day=calendar.monthrange(first.year, first.month)[1])
+
+
+def bonus_basis_points(years):
+    for min_years, basis_points in BONUS_TIERS:
+        if years >= min_years:
+            return basis_points
+    return 0
+
+
+def decimal_entry(salary, hire_date, period):
+    """The pay of one employee for the month of ``period``, with Decimal; a dict like compute_chunk()'s rows."""
+    first, last = month_bounds(period)
+    days_in_month = last.day
+    days_paid = (last - max(hire_date, first)).days + 1
+    years = last.year - hire_date.year - ((last.month, last.day) < (hire_date.month, hire_date.day))
+    gross = (salary / 12).quantize(CENT, ROUND_HALF_UP)
+    prorated = (gross * days_paid / days_in_month).quantize(CENT, ROUND_HALF_UP)
+    bonus = (prorated * bonus_basis_points(years) / 10000).quantize(CENT, ROUND_HALF_UP)
+    return {'days_paid': days_paid, 'gross': gross, 'prorated': prorated, 'bonus': bonus, 'total': prorated + bonus}
+
+
+def round_div(numerator, denominator):
+    """numerator / denominator rounded half away from zero, on integer arrays."""
+    quotient = (2 * np.abs(numerator) + denominator) // (2 * denominator)
+    return np.where(numerator < 0, -quotient, quotient)
+
+
+def compute_chunk(salary_cents, hire_dates, period):
+    """
+    The pay of the employees of a chunk, in cents.
+
+    ``salary_cents`` is an int64 array, ``hire_dates`` a datetime64[D]
+    array of dates no later than the end of the month.
+    """
+    first, last = month_bounds(period)
+    days_in_month = last.day
+    last_day = np.datetime64(last, 'D')
+    days_paid = (last_day - np.maximum(hire_dates, np.datetime64(first, 'D'))).astype(np.int64) + 1
+
+    hire_years = hire_dates.astype('datetime64[Y]')
+    hire_months = hire_dates.astype('datetime64[M]')
+    month_of_year = (hire_months - hire_years).astype(np.int64) + 1
+    day_of_month = (hire_dates - hire_months).astype(np.int64) + 1
+    not_yet = (month_of_year > last.month) | ((month_of_year == last.month) & (day_of_month > last.day))
+    years = last.year - 1970 - hire_years.astype(np.int64) - not_yet
+    basis_points = np.select([years >= min_years for min_years, _ in BONUS_TIERS],
+                             [basis_points for _, basis_points in BONUS_TIERS], 0)
+
+    gross = round_div(salary_cents, 12)
+    prorated = round_div(gross * days_paid, days_in_month)
+    bonus = round_div(prorated * basis_points, 10000)
+    return {'days_paid': days_paid, 'gross': gross, 'prorated': prorated, 'bonus': bonus, 'total': prorated + bonus}
+
+
+def iter_chunks(last_day, chunk_size):
+    """(ids, salary cents, hire dates, department ids) arrays of the employees hired by ``last_day``."""
+    after = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(CHUNK_SQL, [after, last_day.isoformat(), chunk_size])
+            rows = cursor.fetchall()
+        if not rows:
+            return
+        ids, salaries, hire_dates, departments = zip(*rows)
+        yield (np.array(ids, dtype=np.int64), np.array(salaries, dtype=np.int64),
+               np.array(hire_dates, dtype='datetime64[D]'), np.array(departments, dtype=np.int64))
+        after = ids[-1]
+
+
+def cents(value):
+    return Decimal(int(value)).scaleb(-2)
+
+
+def run_payroll(period, user=None, replace=False, chunk_size=None, progress=None):
+    """
+    Compute and store the payroll of the month of ``period``; returns the PayrollRun.
+
+    A month already run raises ValueError unless ``replace`` is set; an
+    unfinished run (interrupted, e.g. a job being retried) is replaced.
+    ``progress(done)`` is called after each chunk. The run gets a
+    ``timings`` attribute: seconds spent reading, computing and writing.
+    """
+    first, last = month_bounds(period)
+    chunk_size = chunk_size or settings.PAYROLL_CHUNK_SIZE
+    with transaction.atomic():
+        existing = PayrollRun.objects.filter(period=first).first()
+        if existing is not None:
+            if existing.finished_at is not None and not replace:
+                raise ValueError('The payroll of %s has already been run.' % first.strftime('%Y-%m'))
+            existing.delete()
+        run = PayrollRun.objects.create(period=first, created_by=user)
+
+    timings = {'read': 0.0, 'compute': 0.0, 'write': 0.0}
+    totals = {}  # department id -> [employees, prorated, bonus, total] in cents
+    chunks = iter_chunks(last, chunk_size)
+    done = 0
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        timings['read'] += time.perf_counter() - start
+        if chunk is None:
+            break
+        ids, salary_cents, hire_dates, departments = chunk
+
+        start = time.perf_counter()
+        pay = compute_chunk(salary_cents, hire_dates, first)
+        for department in np.unique(departments):
+            rows = departments == department
+            sums = totals.setdefault(int(department), [0, 0, 0, 0])
+            sums[0] += int(rows.sum())
+            sums[1] += int(pay['prorated'][rows].sum())
+            sums[2] += int(pay['bonus'][rows].sum())
+            sums[3] += int(pay['total'][rows].sum())
+        timings['compute'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        columns = zip(ids.tolist(), departments.tolist(), salary_cents.tolist(), pay['days_paid'].tolist(),
+                      pay['gross'].tolist(), pay['prorated'].tolist(), pay['bonus'].tolist(), pay['total'].tolist())
+        with transaction.atomic():
+            PayrollEntry.objects.bulk_create([
+                PayrollEntry(run_id=run.pk, employee_id=employee, department_id=department, salary=cents(salary),
+                             days_paid=days_paid, gross=cents(gross), prorated=cents(prorated),
+                             bonus=cents(bonus), total=cents(total))
+                for employee, department, salary, days_paid, gross, prorated, bonus, total in columns
+            ])
+        timings['write'] += time.perf_counter() - start
+        done += len(ids)
+        if progress:
+            progress(done)
+
+    with transaction.atomic():
+        PayrollDepartmentTotal.objects.bulk_create([
+            PayrollDepartmentTotal(run=run, department_id=department, employee_count=count,
+                                   salary_total=cents(salary), bonus_total=cents(bonus), total=cents(total))
+            for department, (count, salary, bonus, total) in sorted(totals.items())
+        ])
+        run.employee_count = sum(sums[0] for sums in totals.values())
+        run.salary_total = cents(sum(sums[1] for sums in totals.values()))
+        run.bonus_total = cents(sum(sums[2] for sums in totals.values()))
+        run.total = cents(sum(sums[3] for sums in totals.values()))
+        run.finished_at = timezone.now()
+        run.save()
+    run.timings = timings
+    return run
+
+
+def parse_period(value):
+    """A ``YYYY-MM`` month as the date of its first day."""
+    return datetime.datetime.strptime(value, '%Y-%m').date()
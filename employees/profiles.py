@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import UserProfile
+
+CACHE_KEY = 'employees:user_profile:%s'
+
+
+def profile_cache_key(user_id):
+    return CACHE_KEY % user_id
+
+
+def get_user_profile(user):
+    """
+    Return the UserProfile of ``user``, creating the default one if missing.
+
+    Profiles are cached per user; the entry is dropped whenever the profile
+    is saved or deleted (see ``employees.signals``).
+    """
+    if not user.is_authenticated:
+        return None
+    key = profile_cache_key(user.pk)
+    profile = cache.get(key)
+    if profile is None:
+        profile, _ = UserProfile.objects.get_or_create(
+            user=user,
+            defaults={
+                'name': user.username,
+                'emp_id': f"EMP{user.id:03d}"
+            }
+        )
+        cache.set(key, profile, getattr(settings, 'USER_PROFILE_CACHE_TIMEOUT', 300))
+    return profile
+
+
+def invalidate_user_profile(user_id):
+    cache.delete(profile_cache_key(user_id))
@@ -0,0 +1,86 @@
+"""
+Cached rendering of the rows of the employee table.
+
+A row only changes when its employee does (or a department or position is
+renamed), so its HTML is cached under the employee's ``(pk, updated_at)``
+and ``lookups.version()``: a page fetches all of its rows with one
+``get_many()`` and renders only the misses, and an edit needs no
+invalidation since the next page asks for a new key. The edit and delete
+links are reversed once per page and filled in with each row's pk.
+
+With a cache backend whose sets are costly (see CACHE_HAS_CHEAP_SETS in
+the settings) a miss would pay one set per row; there the rows of a page
+are cached together, under a key made of the keys of its rows.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+
+from . import lookups
+
+ROW_TEMPLATE = 'employees/employee_row.html'
+# Bump when employee_row.html changes, so rows cached with the old markup are not served
+ROW_MARKUP_VERSION = 1
+ROW_KEY = 'employees:row:v%d:%s:%d:%s'
+PAGE_ROWS_KEY = 'employees:rows:%s'
+PK_PLACEHOLDER = 2147483647
+
+
+def _timeout():
+    return getattr(settings, 'EMPLOYEE_ROW_CACHE_TIMEOUT', 86400)
+
+
+def url_for_pk(viewname):
+    """Return a function giving the URL of ``viewname`` for a pk, with the URL reversed only once."""
+    prefix, suffix = reverse(viewname, args=[PK_PLACEHOLDER]).split(str(PK_PLACEHOLDER))
+    return lambda pk: '%s%d%s' % (prefix, pk, suffix)
+
+
+def row_key(employee, lookups_version=None):
+    if lookups_version is None:
+        lookups_version = lookups.version()
+    return ROW_KEY % (ROW_MARKUP_VERSION, lookups_version, employee.pk, employee.updated_at.timestamp())
+
+
+def render_missing(employees, keys, rows):
+    """Render the rows of ``employees`` whose key is not in ``rows``; return them by key."""
+    template = get_template(ROW_TEMPLATE)
+    lookups.with_lookups(employees)
+    edit_url = url_for_pk('employees:employee_update_form')
+    delete_url = url_for_pk('employees:employee_delete_confirm')
+    missing = {}
+    for key, employee in zip(keys, employees):
+        if key not in rows and key not in missing:
+            missing[key] = template.render({
+                'employee': employee,
+                'edit_url': edit_url(employee.pk),
+                'delete_url': delete_url(employee.pk),
+            })
+    return missing
+
+
+def render_rows(employees):
+    """Return the HTML of a table row for each of ``employees``, from the cache where possible."""
+    employees = list(employees)
+    # Renaming a department or position changes the rows of its employees
+    version = lookups.version()
+    keys = [row_key(employee, version) for employee in employees]
+    if not keys:
+        return []
+    if not getattr(settings, 'CACHE_HAS_CHEAP_SETS', True):
+        page_key = PAGE_ROWS_KEY % hashlib.md5('|'.join(keys).encode('utf-8')).hexdigest()
+        rows = cache.get(page_key)
+        if rows is None:
+            rows = render_missing(employees, keys, {})
+            cache.set(page_key, rows, _timeout())
+    else:
+        rows = cache.get_many(keys)
+        if len(rows) < len(keys):
+            missing = render_missing(employees, keys, rows)
+            cache.set_many(missing, _timeout())
+            rows.update(missing)
+    return [mark_safe(rows[key]) for key in keys]
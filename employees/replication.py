@@ -0,0 +1,29 @@
+import sqlite3
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .routers import REPLICA_DB_ALIAS
+
+
+def sync_replica(source=DEFAULT_DB_ALIAS, replica=REPLICA_DB_ALIAS):
+    """
+    Copy the ``source`` SQLite database over the ``replica`` file.
+
+    A local stand-in for real replication: SQLite's online backup API
+    copies a consistent snapshot while both databases stay in use. Pages
+    cached from the replica are keyed on the data version of the replica
+    (see ``employees.caching``), which the copy brings up to date. Returns
+    the number of pages copied.
+    """
+    for alias in (source, replica):
+        if connections[alias].vendor != 'sqlite' or connections[alias].is_in_memory_db():
+            raise ValueError('sync_replica needs file based SQLite databases (%s).' % alias)
+    src = sqlite3.connect(connections[source].settings_dict['NAME'])
+    dst = sqlite3.connect(connections[replica].settings_dict['NAME'])
+    try:
+        src.backup(dst)
+        pages = src.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        dst.close()
+        src.close()
+    return pages
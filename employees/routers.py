@@ -0,0 +1,143 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+
+# Apps whose reads must always see their own writes (a session read from a
+# lagging replica would log the user out right after logging in).
+PRIMARY_ONLY_APPS = ('sessions',)
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class RoutingState:
+    """Per request (or per ``replica_reads()`` block) routing decision."""
+
+    def __init__(self, use_replica, parent=None):
+        self.use_replica = use_replica
+        self.wrote = False
+        # Enclosing block, which wrote too when this one did
+        self.parent = parent
+        # Values read once per request or block, see remember()
+        self.memo = {}
+
+    def mark_written(self):
+        state = self
+        while state is not None and not state.wrote:
+            state.wrote = True
+            state = state.parent
+
+
+_state = ContextVar('employees_routing_state', default=None)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in connections.databases
+
+
+def read_alias():
+    """Alias reads are sent to right now; useful to pin a lazily evaluated queryset with ``using()``."""
+    state = _state.get()
+    if state is not None and state.use_replica and replica_configured():
+        return REPLICA_DB_ALIAS
+    return DEFAULT_DB_ALIAS
+
+
+def record_writes(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every connection by ``instrument()``.
+
+    Marks the RoutingState of the current context as written, so writes
+    run from another thread count for the request that started them.
+    """
+    result = execute(sql, params, many, context)
+    state = _state.get()
+    if (state is not None and not state.wrote and context['connection'].alias == DEFAULT_DB_ALIAS
+            and sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS) and context['cursor'].rowcount > 0):
+        state.mark_written()
+    return result
+
+
+def instrument(connection):
+    """Install ``record_writes()`` on ``connection`` (a DatabaseWrapper), once."""
+    if record_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_writes)
+
+
+def remember(key, compute):
+    """
+    Return ``compute()``, computed once per request (or routing block) under ``key``.
+
+    Outside of a routing block it is computed on every call. The memo is
+    shared with the threads the request runs work in.
+    """
+    state = _state.get()
+    if state is None:
+        return compute()
+    if key not in state.memo:
+        state.memo[key] = compute()
+    return state.memo[key]
+
+
+def forget(key):
+    """Drop ``key`` from the memo of the current block and the enclosing ones, e.g. after a write changed it."""
+    state = _state.get()
+    while state is not None:
+        state.memo.pop(key, None)
+        state = state.parent
+
+
+@contextmanager
+def routing(use_replica):
+    """
+    Route the reads of the enclosed block to the replica (or not); yields the RoutingState.
+
+    ``state.wrote`` tells whether the block changed any row on ``default``.
+    It is based on the statements actually run, as ``db_for_write()`` is
+    also asked about reads such as the lookup half of ``get_or_create()``.
+    """
+    state = RoutingState(use_replica, parent=_state.get())
+    token = _state.set(state)
+    instrument(connections[DEFAULT_DB_ALIAS])
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def replica_reads():
+    """Send the reads of the enclosed block to the replica, when one is configured."""
+    return routing(True)
+
+
+def primary_reads():
+    """Send the reads of the enclosed block to the primary database."""
+    return routing(False)
+
+
+class PrimaryReplicaRouter:
+    """
+    Send writes to ``default`` and, inside ``replica_reads()``, reads to ``replica``.
+
+    Outside of a routing block (management commands, the shell, tests)
+    everything goes to ``default``. Without a ``replica`` alias in
+    DATABASES the router is a no-op.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of default, never migrated on its own
+        return db != REPLICA_DB_ALIAS
@@ -0,0 +1,128 @@
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Employee
+
+SEARCH_TABLE = 'employee_search'
+SEARCH_COLUMNS = ('name', 'email', 'department', 'position')
+# The same columns for the ORM, where departments and positions are foreign keys
+FALLBACK_COLUMNS = ('name', 'email', 'department__name', 'position__name')
+# bm25() weights, in SEARCH_COLUMNS order: a name hit outranks an email hit, etc.
+SEARCH_WEIGHTS = (10.0, 5.0, 2.0, 2.0)
+# Shorter words are matched whole: as prefixes they would match most of the table
+MIN_PREFIX_LENGTH = 3
+# Matches ranked per search, those of the lowest rowids: bm25() costs per
+# match, and a common word matches a large part of the table
+RANK_LIMIT = 1000
+
+# The rowid of the RANK_LIMIT-th match (the largest rowid with fewer), which
+# FTS5 takes as a bound on the rows it ranks; parameters: match, RANK_LIMIT - 1
+RANK_BOUND_CTE = (
+    'WITH bound(rowid) AS (SELECT coalesce(('
+    'SELECT rowid FROM {table} WHERE {table} MATCH %s ORDER BY rowid LIMIT 1 OFFSET %s'
+    '), 9223372036854775807)) '
+).format(table=SEARCH_TABLE)
+# Rowids and scores of the best ranked matches; parameters: match, limit
+RANKED_SQL = (
+    'SELECT {table}.rowid, bm25({table}, {weights}) AS score FROM bound CROSS JOIN {table} '
+    'WHERE {table} MATCH %s AND {table}.rowid <= bound.rowid ORDER BY score, {table}.rowid LIMIT %s'
+).format(table=SEARCH_TABLE, weights=', '.join(str(w) for w in SEARCH_WEIGHTS))
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class SubquerySQL(RawSQL):
+    """
+    Raw subquery usable as the right-hand side of an ``__in`` lookup.
+
+    RawSQL wraps itself in parentheses and so does the lookup; SQLite reads
+    ``IN ((SELECT ...))`` as a scalar subquery and only matches its first row.
+    """
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def _read_connection():
+    return connections[router.db_for_read(Employee)]
+
+
+def fts_available():
+    return _read_connection().vendor == 'sqlite'
+
+
+def build_match_expression(query):
+    """
+    Turn free user input into a safe FTS5 MATCH expression.
+
+    Every word is quoted (so FTS5 operators typed by the user are treated as
+    text) and, from MIN_PREFIX_LENGTH characters, made a prefix query; all
+    words must match.
+    """
+    tokens = _TOKEN_RE.findall(query or '')
+    return ' AND '.join(
+        ('"%s"*' if len(token) >= MIN_PREFIX_LENGTH else '"%s"') % token for token in tokens
+    )
+
+
+def search_employees(query, limit=50):
+    """Return up to ``limit`` employees matching ``query``, best match first (of the first RANK_LIMIT)."""
+    match = build_match_expression(query)
+    if not match:
+        return []
+    if not fts_available():
+        return list(_fallback_queryset(query)[:limit])
+
+    sql = RANK_BOUND_CTE + (
+        'SELECT e.* FROM employees_employee e JOIN ({ranked}) s ON s.rowid = e.id ORDER BY s.score, e.id'
+    ).format(ranked=RANKED_SQL)
+    return list(Employee.objects.raw(sql, [match, RANK_LIMIT - 1, match, limit]))
+
+
+def search_employee_ids(query, limit=50):
+    """Return the ids of up to ``limit`` employees matching ``query``, best match first (of the first RANK_LIMIT)."""
+    match = build_match_expression(query)
+    if not match:
+        return []
+    if not fts_available():
+        return list(_fallback_queryset(query).values_list('pk', flat=True)[:limit])
+
+    with _read_connection().cursor() as cursor:
+        cursor.execute(RANK_BOUND_CTE + RANKED_SQL, [match, RANK_LIMIT - 1, match, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_filter(query):
+    """
+    Return a Q object restricting a queryset to employees matching ``query``.
+
+    Used where ranking is not needed, e.g. the admin changelist, which applies
+    its own ordering.
+    """
+    match = build_match_expression(query)
+    if not match:
+        return Q()
+    if not fts_available():
+        return _fallback_q(query)
+    ids = SubquerySQL(
+        'SELECT rowid FROM {table} WHERE {table} MATCH %s'.format(table=SEARCH_TABLE),
+        [match]
+    )
+    return Q(pk__in=ids)
+
+
+def _fallback_q(query):
+    q = Q()
+    for token in _TOKEN_RE.findall(query):
+        token_q = Q()
+        for column in FALLBACK_COLUMNS:
+            token_q |= Q(**{'%s__istartswith' % column: token})
+        q &= token_q
+    return q
+
+
+def _fallback_queryset(query):
+    return Employee.objects.filter(_fallback_q(query))
@@ -0,0 +1,181 @@
+"""
+Deterministic generation of realistic employees and users.
+
+Row ``n`` of a given seed is always the same, wherever it falls in a run, so
+seeding 1 000 rows and later extending to 100 000 yields exactly the data of
+a single 100 000 row run. Seeded rows are recognisable by their
+``SEED_PREFIX`` employee id.
+"""
+import datetime
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from . import lookups
+from .caching import data_changed
+from .models import Department, Employee, Position, UserProfile
+
+SEED_PREFIX = 'SEED'
+USER_PREFIX = 'seeduser'
+DEFAULT_SEED = 42
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_PASSWORD = 'seed-password'
+
+FIRST_NAMES = (
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David',
+    'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas',
+    'Sarah', 'Ahmed', 'Fatima', 'Wei', 'Mei', 'Raj', 'Priya', 'Carlos', 'Sofia', 'Yuki',
+    'Hana', 'Olu', 'Amara', 'Ivan', 'Olga', 'Zubair', 'Aisha', 'Lucas', 'Emma',
+)
+LAST_NAMES = (
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+    'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Taylor', 'Thomas',
+    'Moore', 'Jackson', 'Khan', 'Ali', 'Chen', 'Wang', 'Patel', 'Sharma', 'Silva', 'Santos',
+    'Tanaka', 'Sato', 'Okafor', 'Mensah', 'Ivanov', 'Petrova', 'Nguyen', 'Kim', 'Muller', 'Rossi',
+)
+
+# Department: (share of the headcount, ((position, minimum salary, maximum salary), ...))
+DEPARTMENTS = {
+    'Engineering': (30, (('Developer', 60000, 120000), ('Senior Developer', 90000, 160000),
+                         ('QA Engineer', 50000, 95000), ('Engineering Manager', 120000, 190000))),
+    'Sales': (20, (('Sales Representative', 40000, 80000), ('Account Executive', 55000, 110000),
+                   ('Sales Manager', 85000, 150000))),
+    'Support': (15, (('Support Agent', 35000, 60000), ('Support Lead', 50000, 80000))),
+    'Marketing': (10, (('Marketing Specialist', 45000, 85000), ('Content Writer', 40000, 70000),
+                       ('Marketing Manager', 80000, 140000))),
+    'Operations': (10, (('Operations Analyst', 50000, 90000), ('Operations Manager', 80000, 140000))),
+    'Finance': (7, (('Accountant', 50000, 90000), ('Financial Analyst', 60000, 105000),
+                    ('Finance Manager', 95000, 160000))),
+    'Human Resources': (5, (('HR Generalist', 45000, 75000), ('Recruiter', 45000, 85000),
+                            ('HR Manager', 80000, 130000))),
+    'Legal': (3, (('Paralegal', 45000, 75000), ('Counsel', 110000, 200000))),
+}
+_DEPARTMENT_NAMES = list(DEPARTMENTS)
+_DEPARTMENT_WEIGHTS = [DEPARTMENTS[name][0] for name in _DEPARTMENT_NAMES]
+
+FIRST_HIRE_DATE = datetime.date(2005, 1, 1)
+LAST_HIRE_DATE = datetime.date(2024, 12, 31)
+
+
+def _rng(seed, kind, n):
+    return random.Random('%s:%s:%d' % (seed, kind, n))
+
+
+def employee_id(n):
+    return '%s%07d' % (SEED_PREFIX, n)
+
+
+def seed_lookups():
+    """
+    Create the seeded departments and positions that do not exist yet.
+
+    Returns ``(departments, positions)``, each mapping a seeded name to its
+    row; existing rows are reused whatever their case.
+    """
+    position_names = sorted({position for _, positions in DEPARTMENTS.values() for position, _, _ in positions})
+    tables = ((lookups.departments, sorted(DEPARTMENTS)), (lookups.positions, position_names))
+    created = False
+    for table, names in tables:
+        missing = [name for name in names if table.find(name) is None]
+        if missing:
+            table.model.objects.bulk_create([table.model(name=name) for name in missing])
+            created = True
+    if created:
+        # bulk_create does not send post_save
+        data_changed(lookups=True)
+    return tuple({name: table.find(name) for name in names} for table, names in tables)
+
+
+def generate_employee(n, seed=DEFAULT_SEED, seeded=None):
+    """
+    Return the unsaved employee number ``n`` (1 based) of ``seed``.
+
+    ``seeded`` is the result of ``seed_lookups()``; without it the employee
+    gets unsaved departments and positions, enough to render it.
+    """
+    rng = _rng(seed, 'employee', n)
+    first = rng.choice(FIRST_NAMES)
+    last = rng.choice(LAST_NAMES)
+    department = rng.choices(_DEPARTMENT_NAMES, _DEPARTMENT_WEIGHTS)[0]
+    position, low, high = rng.choice(DEPARTMENTS[department][1])
+    hire_days = (LAST_HIRE_DATE - FIRST_HIRE_DATE).days
+    departments, positions = seeded or ({}, {})
+    return Employee(
+        employee_id=employee_id(n),
+        name='%s %s' % (first, last),
+        department=departments.get(department) or Department(name=department),
+        position=positions.get(position) or Position(name=position),
+        salary=Decimal(rng.randrange(low * 100, high * 100, 5000)) / 100,
+        email='%s.%s.%d@example.com' % (first.lower(), last.lower(), n),
+        hire_date=FIRST_HIRE_DATE + datetime.timedelta(days=rng.randrange(hire_days + 1)),
+    )
+
+
+def seeded_employee_count():
+    """Number of the last seeded employee, 0 if none; new rows continue after it."""
+    last = (Employee.objects.filter(employee_id__startswith=SEED_PREFIX)
+            .order_by('-employee_id').values_list('employee_id', flat=True).first())
+    return int(last[len(SEED_PREFIX):]) if last else 0
+
+
+def seed_users(count, seed=DEFAULT_SEED, password=DEFAULT_PASSWORD):
+    """
+    Create ``count`` more seeded users, each with a UserProfile; returns the new users.
+
+    All of them share ``password``, hashed once.
+    """
+    start = User.objects.filter(username__startswith=USER_PREFIX).count()
+    hashed = make_password(password)
+    users = []
+    for n in range(start + 1, start + count + 1):
+        rng = _rng(seed, 'user', n)
+        users.append(User(
+            username='%s%05d' % (USER_PREFIX, n),
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            email='%s%05d@example.com' % (USER_PREFIX, n),
+            password=hashed,
+        ))
+    with transaction.atomic():
+        User.objects.bulk_create(users)
+        # SQLite does not return the primary keys of bulk inserted rows
+        users = list(User.objects.filter(username__startswith=USER_PREFIX).order_by('username')[start:])
+        UserProfile.objects.bulk_create([
+            UserProfile(user=user, name='%s %s' % (user.first_name, user.last_name),
+                        emp_id='SEEDU%05d' % int(user.username[len(USER_PREFIX):]))
+            for user in users
+        ])
+    return users
+
+
+def seed_employees(count, seed=DEFAULT_SEED, batch_size=DEFAULT_BATCH_SIZE, users=(), progress=None):
+    """
+    Insert ``count`` more seeded employees in batches; returns the number created.
+
+    ``created_by`` is picked from ``users`` when given. ``progress`` is
+    called with the running total after each batch.
+    """
+    start = seeded_employee_count()
+    users = list(users)
+    seeded_lookups = seed_lookups()
+    created = 0
+    for batch_start in range(start + 1, start + count + 1, batch_size):
+        batch_end = min(batch_start + batch_size, start + count + 1)
+        batch = []
+        for n in range(batch_start, batch_end):
+            employee = generate_employee(n, seed, seeded_lookups)
+            if users:
+                employee.created_by = users[n % len(users)]
+            batch.append(employee)
+        with transaction.atomic():
+            Employee.objects.bulk_create(batch)
+        created += len(batch)
+        if progress:
+            progress(created)
+    if created:
+        # bulk_create does not send post_save
+        data_changed()
+    return created
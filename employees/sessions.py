@@ -0,0 +1,49 @@
+"""
+Pruning expired sessions.
+
+Django's ``clearsessions`` removes every expired row with one DELETE, which
+holds SQLite's write lock for as long as it runs; after a login storm that
+blocks every other write. ``prune_expired_sessions()`` deletes them in
+batches of SESSION_PRUNE_BATCH_SIZE rows, one short transaction each. The
+``prune_sessions`` job runs it; idle ``run_workers`` processes queue that
+job every SESSION_PRUNE_INTERVAL seconds.
+"""
+from importlib import import_module
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+
+def session_model():
+    """The model of the configured database backed session engine, or None."""
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    return store.get_model_class() if hasattr(store, 'get_model_class') else None
+
+
+def prune_expired_sessions(batch_size=None, progress=None):
+    """
+    Delete the sessions that expired, ``batch_size`` at a time; returns how many.
+
+    ``progress(deleted)`` is called after each batch. Engines that keep no
+    rows (cache, signed cookies) expire sessions by themselves, so there
+    is nothing to prune.
+    """
+    model = session_model()
+    if model is None:
+        import_module(settings.SESSION_ENGINE).SessionStore.clear_expired()
+        return 0
+    batch_size = batch_size or settings.SESSION_PRUNE_BATCH_SIZE
+    now = timezone.now()
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            keys = list(model.objects.filter(expire_date__lt=now)
+                        .values_list('session_key', flat=True)[:batch_size])
+            if keys:
+                model.objects.filter(session_key__in=keys).delete()
+        deleted += len(keys)
+        if progress:
+            progress(deleted)
+        if len(keys) < batch_size:
+            return deleted
@@ -0,0 +1,39 @@
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import metrics, routers
+from .backends import invalidate_user
+from .caching import data_changed
+from .models import Department, Employee, Position, UserProfile
+from .profiles import invalidate_user_profile
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def user_profile_changed(sender, instance, **kwargs):
+    invalidate_user_profile(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Employee)
+def employee_changed(sender, **kwargs):
+    data_changed()
+
+
+@receiver([post_save, post_delete], sender=Department)
+@receiver([post_save, post_delete], sender=Position)
+def lookup_changed(sender, **kwargs):
+    # A renamed department shows up in every employee that refers to it
+    data_changed(lookups=True)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # Request metrics and replica pinning follow the request into any thread
+    metrics.instrument(connection)
+    routers.instrument(connection)
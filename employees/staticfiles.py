@@ -0,0 +1,149 @@
+"""
+Static files for production: fingerprinted, precompressed, cached forever.
+
+``collectstatic`` with CompressedManifestStaticFilesStorage copies every
+file to STATIC_ROOT under a name carrying a hash of its content (so
+``{% static %}`` URLs change whenever the file does) and writes gzip and,
+with the ``brotli`` package, Brotli versions of the text files next to
+them. ``StaticFilesMiddleware`` serves them from the app process: the
+files are indexed once per worker, hashed names are sent with an
+immutable one year Cache-Control, and each client gets the smallest
+encoding it accepts. Browsers then never revalidate the assets of a page
+they have seen. With DEBUG on, ``runserver`` serves the source files
+instead, as before.
+"""
+import gzip
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.files.base import ContentFile
+from django.utils.http import quote_etag
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Text formats worth compressing; images and fonts are compressed already
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico', '.eot', '.ttf')
+# Encoding -> suffix of the precompressed file, in order of preference
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+# Compressed versions that do not save this share of the size are not kept
+MIN_SAVING = 0.05
+IMMUTABLE_CACHE_CONTROL = 'max-age=31536000, public, immutable'
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content)
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def available_encodings():
+    return [encoding for encoding in ENCODINGS if encoding != 'br' or brotli is not None]
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also writes compressed copies of text files.
+
+    Until ``collectstatic`` has run there is no manifest; ``{% static %}``
+    then links the files under their own names (as in development and
+    the tests) rather than failing on every page.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(self.hashed_files) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(name):
+                self.compress_file(name)
+
+    def compress_file(self, name):
+        with self.open(name) as original:
+            content = original.read()
+        for encoding in available_encodings():
+            compressed_name = name + ENCODINGS[encoding]
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            compressed = compress(content, encoding)
+            if len(compressed) <= len(content) * (1 - MIN_SAVING):
+                self._save(compressed_name, ContentFile(compressed))
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+
+class StaticFile:
+    """A collected file: its path and headers, per encoding it is stored in."""
+
+    def __init__(self, path, content_type, cache_control):
+        self.variants = {}
+        for encoding in [None] + available_encodings():
+            variant = path + ENCODINGS[encoding] if encoding else path
+            if not os.path.isfile(variant):
+                continue
+            stat = os.stat(variant)
+            headers = {
+                'Content-Type': content_type,
+                'Content-Length': str(stat.st_size),
+                'Last-Modified': formatdate(stat.st_mtime, usegmt=True),
+                'ETag': quote_etag('%x-%x' % (int(stat.st_mtime), stat.st_size)),
+                'Cache-Control': cache_control,
+            }
+            if encoding:
+                headers['Content-Encoding'] = encoding
+            self.variants[encoding] = (variant, headers)
+        if len(self.variants) > 1:
+            for _, headers in self.variants.values():
+                headers['Vary'] = 'Accept-Encoding'
+
+    def variant(self, accept_encoding):
+        """(path, headers) of the smallest encoding in the Accept-Encoding header."""
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in ENCODINGS:
+            if encoding in accepted and encoding in self.variants:
+                return self.variants[encoding]
+        return self.variants[None]
+
+
+def accepted_encodings(header):
+    """Encodings an Accept-Encoding header allows, i.e. not given q=0."""
+    accepted = set()
+    for part in header.split(','):
+        encoding, _, params = part.partition(';')
+        if not re.search(r'\bq=0(\.0*)?\s*$', params):
+            accepted.add(encoding.strip().lower())
+    return accepted
+
+
+def index_static_root():
+    """URL path -> StaticFile of every file collected in STATIC_ROOT."""
+    root = settings.STATIC_ROOT
+    hashed_names = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+    suffixes = tuple(ENCODINGS.values())
+    files = {}
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            if name.endswith(suffixes) and os.path.isfile(path.rsplit('.', 1)[0]):
+                continue  # a compressed copy, served for its original
+            content_type, _ = mimetypes.guess_type(name)
+            content_type = content_type or 'application/octet-stream'
+            if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+                content_type += '; charset="utf-8"'
+            if name in hashed_names:
+                cache_control = IMMUTABLE_CACHE_CONTROL
+            else:
+                cache_control = 'max-age=%d, public' % settings.STATIC_MAX_AGE
+            files[settings.STATIC_URL + name] = StaticFile(path, content_type, cache_control)
+    return files
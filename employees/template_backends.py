@@ -0,0 +1,21 @@
+from django.template.backends.django import DjangoTemplates, Template
+
+from .metrics import measure_template
+
+
+class InstrumentedTemplate(Template):
+    """Template whose render time is added to the current request's metrics."""
+
+    def render(self, context=None, request=None):
+        with measure_template():
+            return super().render(context, request)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing every top level render."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name).template, self)
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class QueryBudgetTestRunner(DiscoverRunner):
+    """
+    Test runner that fails any request running more queries than its view's budget.
+
+    It also runs the blocking part of async views on the test thread
+    (ASYNC_DB_THREADS = 0): a TestCase's data is only visible to the
+    connection of that thread.
+
+    Sessions and users are cached as with a shared cache: the local memory
+    cache of the test process is shared by every request it makes.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_BUDGETS_ENFORCED = True
+        settings.ASYNC_DB_THREADS = 0
+        settings.SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+        settings.AUTHENTICATION_BACKENDS = ['employees.backends.CachedModelBackend']
+        settings.QUERY_BUDGET_AUTH_QUERIES = 0
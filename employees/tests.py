@@ -1,3 +1,2447 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import random
+import re
+import runpy
+import shutil
+import sqlite3
+import tempfile
+import threading
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django import forms
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, connections, router, transaction
+from django.db.models import Q
+from django.test import AsyncClient, Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+
+from hrmanage.sqlite.base import apply_pragmas
+
+from . import api, views
+from .constants import EmployeeConstants
+from . import analytics, audit, jobs, lookups, payroll
+from .bulk import bulk_delete, bulk_update
+from .caching import get_version
+from .exporters import iter_employee_rows
+from .forms import EmployeeForm, SignUpForm
+from .importers import EmployeeImporter
+from .metrics import (DURATION_BUCKETS, MetricsRegistry, QueryBudgetExceeded, RequestMetrics, get_query_budget,
+                      registry)
+from .models import (
+    Department, Employee, EmployeeChange, EmployeeHistory, EmployeeStats, Job, PayrollEntry, PayrollRun, Position,
+    UserProfile,
+)
+from .offload import run_sync
+from .pagination import KeysetPaginator
+from .rendering import render_rows, row_key
+from .replication import sync_replica
+from .routers import REPLICA_DB_ALIAS, primary_reads, read_alias, replica_reads
+from .search import build_match_expression, search_employee_ids, search_employees
+from .sessions import prune_expired_sessions
+
+
+class EmployeesTestCase(TestCase):
+    """
+    TestCase that starts every test with an empty cache and no request metrics.
+
+    Departments and positions are loaded again right away, as a running
+    process already holds them, so that query counts are those of a warm
+    process.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        registry.reset()
+        warm_lookups()
+
+
+def warm_lookups():
+    for table in lookups.TABLES.values():
+        table.by_pk()
+
+
+def department(name):
+    return Department.objects.get_or_create(name=name)[0]
+
+
+def position(name):
+    return Position.objects.get_or_create(name=name)[0]
+
+
+def make_employee(n, **kwargs):
+    defaults = {
+        'employee_id': 'E%05d' % n,
+        'name': 'Employee %d' % n,
+        'department': 'Engineering',
+        'position': 'Developer',
+        'salary': Decimal('50000.00') + n,
+        'email': 'employee%d@example.com' % n,
+        'hire_date': datetime.date(2020, 1, 1) + datetime.timedelta(days=n),
+    }
+    defaults.update(kwargs)
+    if isinstance(defaults['department'], str):
+        defaults['department'] = department(defaults['department'])
+    if isinstance(defaults['position'], str):
+        defaults['position'] = position(defaults['position'])
+    return Employee.objects.create(**defaults)
+
+
+class EmployeeListPaginationTests(EmployeesTestCase):
+    page_size = EmployeeConstants.LIST_PAGE_SIZE
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='hr', password='secret-pass')
+        cls.employees = [make_employee(i) for i in range(cls.page_size * 2 + 5)]
+        department('Sales'), position('Manager')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def get_list(self, **params):
+        return self.client.get(reverse('employees:employee_list'), params)
+
+    def test_first_page_is_bounded(self):
+        response = self.get_list()
+        page = response.context['page']
+        self.assertEqual(len(page), self.page_size)
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+        self.assertEqual(page.object_list[0], self.employees[-1])
+
+    def test_walking_all_pages_visits_every_row_once(self):
+        seen = []
+        cursor = None
+        while True:
+            page = self.get_list(**({'cursor': cursor} if cursor else {})).context['page']
+            seen.extend(e.pk for e in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(sorted(seen), sorted(e.pk for e in self.employees))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_previous_cursor_returns_preceding_page(self):
+        first = self.get_list().context['page']
+        second = self.get_list(cursor=first.next_cursor).context['page']
+        back = self.get_list(cursor=second.previous_cursor).context['page']
+        self.assertEqual([e.pk for e in back], [e.pk for e in first])
+        self.assertFalse(back.has_previous())
+
+    def test_sort_by_salary_ascending(self):
+        page = self.get_list(sort='salary').context['page']
+        salaries = [e.salary for e in page]
+        self.assertEqual(salaries, sorted(salaries))
+        self.assertEqual(page.object_list[0], self.employees[0])
+
+    def test_filters_are_applied(self):
+        make_employee(999, department='Sales', position='Manager', salary=Decimal('90000.00'))
+        page = self.get_list(department='Sales', salary_min='80000').context['page']
+        self.assertEqual([e.employee_id for e in page], ['E00999'])
+
+        page = self.get_list(hire_date_from='2020-01-01', hire_date_to='2020-01-03').context['page']
+        self.assertEqual(len(page), 3)
+
+    def test_filters_are_kept_in_page_links(self):
+        response = self.get_list(department='Engineering', sort='name')
+        self.assertContains(response, 'department=Engineering')
+        self.assertContains(response, 'sort=name')
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        page = self.get_list(cursor='not-a-cursor').context['page']
+        self.assertEqual(page.object_list[0], self.employees[-1])
+
+    def test_query_count_does_not_depend_on_depth(self):
+        with CaptureQueriesContext(connection) as first_queries:
+            first = self.get_list().context['page']
+        second = self.get_list(cursor=first.next_cursor).context['page']
+        with CaptureQueriesContext(connection) as deep_queries:
+            self.get_list(cursor=second.next_cursor)
+        self.assertEqual(len(deep_queries), len(first_queries))
+        limit = 'LIMIT %d' % (self.page_size + 1)
+        self.assertTrue(any(limit in q['sql'] for q in deep_queries.captured_queries))
+
+
+class EmployeeIndexUsageTests(EmployeesTestCase):
+    """The hot Employee queries must be served by an index, never a full scan."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(20):
+            make_employee(i, department='Dept %d' % (i % 4), position='Pos %d' % (i % 3))
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return ' | '.join(row[-1] for row in cursor.fetchall())
+
+    def assertUsesIndex(self, queryset, *index_names, seek=False):
+        """
+        Assert the query is served by one of the given indexes, without sorting.
+
+        With ``seek`` the index must be searched, not scanned from one end.
+        """
+        plan = self.query_plan(queryset)
+        access = 'SEARCH' if seek else '(SEARCH|SCAN)'
+        self.assertRegex(plan, r'%s \S+ USING (COVERING )?INDEX (%s)\b' % (access, '|'.join(index_names)))
+        if seek:
+            self.assertNotIn('SCAN', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_default_ordering_uses_created_index(self):
+        self.assertUsesIndex(
+            Employee.objects.order_by('-created_at', '-pk')[:51],
+            'employee_created_id_idx'
+        )
+
+    def test_keyset_seek_uses_created_index(self):
+        last = Employee.objects.order_by('-created_at', '-pk')[10]
+        qs = KeysetPaginator(Employee.objects.all())
+        self.assertUsesIndex(
+            qs.queryset.filter(qs._seek(last.created_at, last.pk)).order_by(*qs._order_by())[:51],
+            'employee_created_id_idx', seek=True
+        )
+
+    def test_keyset_pages_seek_their_index_at_any_depth(self):
+        indexes = {'created_at': 'employee_created_id_idx', 'name': 'employee_name_id_idx',
+                   'hire_date': 'employee_hire_date_id_idx', 'salary': 'employee_salary_id_idx'}
+        for sort, _ in EmployeeConstants.SORT_CHOICES:
+            paginator = KeysetPaginator(Employee.objects.all(), ordering=sort)
+            deep = Employee.objects.order_by(*paginator._order_by())[18]
+            value, pk = paginator._row_key(deep)
+            for backwards in (False, True):
+                with self.subTest(sort=sort, backwards=backwards):
+                    plan = self.query_plan(
+                        Employee.objects.filter(paginator._seek(value, pk, reverse=backwards))
+                        .order_by(*paginator._order_by(reverse=backwards))[:51]
+                    )
+                    self.assertRegex(plan, r'SEARCH \S+ USING (COVERING )?INDEX %s \(%s[<>]\?\)' % (
+                        indexes[paginator.field], paginator.field))
+                    self.assertNotIn('SCAN', plan)
+                    self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_uniqueness_probe_uses_unique_indexes(self):
+        plan = self.query_plan(
+            Employee.objects.filter(Q(employee_id='E00001') | Q(email='employee1@example.com'))
+            .exclude(pk=1).order_by().values_list('employee_id', 'email')
+        )
+        self.assertIn('MULTI-INDEX OR', plan)
+        self.assertIn('(employee_id=?)', plan)
+        self.assertIn('(email=?)', plan)
+        self.assertNotIn('SCAN', plan)
+
+    def test_department_position_filter_uses_composite_index(self):
+        dept, pos = department('Dept 1'), position('Pos 1')
+        self.assertUsesIndex(
+            Employee.objects.filter(department=dept, position=pos).order_by(),
+            'employee_dept_position_idx', seek=True
+        )
+        # Both indexes leading with the department serve it
+        self.assertUsesIndex(
+            Employee.objects.filter(department=dept).order_by(),
+            'employee_dept_position_idx', 'employee_dept_created_idx', seek=True
+        )
+
+    def test_department_grouping_uses_composite_index(self):
+        self.assertUsesIndex(
+            Employee.objects.order_by('department_id').values_list('department_id', flat=True).distinct(),
+            'employee_dept_position_idx', 'employee_dept_created_idx'
+        )
+
+    def test_hire_date_range_uses_hire_date_index(self):
+        self.assertUsesIndex(
+            Employee.objects.filter(
+                hire_date__gte=datetime.date(2020, 1, 5),
+                hire_date__lte=datetime.date(2020, 1, 10)
+            ).order_by('hire_date', 'pk'),
+            'employee_hire_date_id_idx', seek=True
+        )
+
+    def test_department_filter_newest_first_uses_department_created_index(self):
+        self.assertUsesIndex(
+            Employee.objects.filter(department=department('Dept 1')).order_by('-created_at', '-pk')[:100],
+            'employee_dept_created_idx', seek=True
+        )
+
+    def test_name_ordering_uses_name_index(self):
+        last = Employee.objects.order_by('name', 'pk')[10]
+        qs = KeysetPaginator(Employee.objects.all(), ordering='name')
+        self.assertUsesIndex(
+            qs.queryset.filter(qs._seek(last.name, last.pk)).order_by(*qs._order_by())[:51],
+            'employee_name_id_idx', seek=True
+        )
+        self.assertUsesIndex(Employee.objects.order_by('-name', '-pk')[:51], 'employee_name_id_idx')
+
+    def test_salary_ordering_uses_salary_index(self):
+        self.assertUsesIndex(
+            Employee.objects.order_by('-salary', '-pk')[:51],
+            'employee_salary_id_idx'
+        )
+
+
+class EmployeeSearchTests(EmployeesTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(username='admin', email='admin@example.com', password='secret-pass')
+        UserProfile.objects.create(user=cls.user, name='Admin', emp_id='EMP001')
+        cls.alice = make_employee(1, name='Alice Johnson', email='alice@example.com', department='Finance')
+        cls.bob = make_employee(2, name='Bob Smith', email='alicia.fan@example.com', department='Engineering')
+        cls.carol = make_employee(3, name='Carol Allison', email='carol@example.com', department='Finance', position='Analyst')
+        department('Marketing'), department('Legal'), position('Lead'), position('Counsel')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def search(self, query):
+        return self.client.get(reverse('employees:employee_search'), {'q': query})
+
+    def test_prefix_matching(self):
+        results = search_employees('fin')
+        self.assertEqual({e.pk for e in results}, {self.alice.pk, self.carol.pk})
+
+    def test_all_terms_must_match(self):
+        results = search_employees('carol anal')
+        self.assertEqual([e.pk for e in results], [self.carol.pk])
+
+    def test_name_matches_rank_above_email_matches(self):
+        results = search_employees('alic')
+        self.assertEqual(results[0].pk, self.alice.pk)
+        self.assertIn(self.bob.pk, [e.pk for e in results])
+
+    def test_short_words_are_matched_whole(self):
+        self.assertEqual(build_match_expression('al jo alice'), '"al" AND "jo" AND "alice"*')
+        self.assertEqual(search_employees('al'), [])
+        li = make_employee(4, name='Li Alvarez', email='li@example.com')
+        self.assertEqual([e.pk for e in search_employees('li')], [li.pk])
+        self.assertEqual(search_employee_ids('li'), [li.pk])
+
+    def test_only_the_first_matches_are_ranked(self):
+        with mock.patch('employees.search.RANK_LIMIT', 1):
+            self.assertEqual([e.pk for e in search_employees('fin')], [self.alice.pk])
+            self.assertEqual(search_employee_ids('fin'), [self.alice.pk])
+        self.assertEqual(len(search_employee_ids('fin')), 2)
+
+    def test_fts_operators_in_input_are_treated_as_text(self):
+        self.assertEqual(search_employees('"NEAR(alice OR'), search_employees('near alice or'))
+        self.assertEqual(search_employees('***'), [])
+
+    def test_search_view_renders_results(self):
+        response = self.search('johnson')
+        self.assertEqual(list(response.context['employees']), [self.alice])
+        self.assertContains(response, 'Alice Johnson')
+
+    def test_empty_query_redirects_to_list(self):
+        response = self.search('')
+        self.assertRedirects(response, reverse('employees:employee_list'))
+
+    def test_index_follows_update_and_delete_views(self):
+        data = {
+            'employee_id': self.bob.employee_id, 'name': 'Robert Smith', 'department': 'Marketing',
+            'position': 'Lead', 'salary': '60000.00', 'email': 'robert@example.com',
+            'hire_date': '2021-05-01',
+        }
+        self.client.post(reverse('employees:employee_update', args=[self.bob.pk]), data)
+        self.assertEqual([e.pk for e in search_employees('robert market')], [self.bob.pk])
+        self.assertEqual(search_employees('bob'), [])
+
+        self.client.post(reverse('employees:employee_delete', args=[self.bob.pk]))
+        self.assertEqual(search_employees('robert'), [])
+
+    def test_index_follows_create_view(self):
+        data = {
+            'employee_id': 'E09999', 'name': 'Zed Newcomer', 'department': 'Legal',
+            'position': 'Counsel', 'salary': '70000.00', 'email': 'zed@example.com',
+            'hire_date': '2022-02-01',
+        }
+        self.client.post(reverse('employees:employee_create'), data)
+        self.assertEqual([e.name for e in search_employees('newcom')], ['Zed Newcomer'])
+
+    def test_admin_search_uses_index(self):
+        response = self.client.get(reverse('admin:employees_employee_changelist'), {'q': 'finance'})
+        self.assertEqual(
+            {e.pk for e in response.context['cl'].result_list},
+            {self.alice.pk, self.carol.pk}
+        )
+        response = self.client.get(reverse('admin:employees_employee_changelist'), {'q': self.bob.employee_id})
+        self.assertEqual([e.pk for e in response.context['cl'].result_list], [self.bob.pk])
+
+
+class EmployeeImportTests(EmployeesTestCase):
+    header = 'employee_id,name,department,position,salary,email,hire_date\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='hr', password='secret-pass')
+        UserProfile.objects.create(user=cls.user, name='HR', emp_id='EMP001')
+        make_employee(1)
+        department('Ops'), position('Clerk')
+
+    def write_file(self, name, content):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_command_imports_csv_in_batches(self):
+        rows = ''.join(
+            'N%04d,Person %d,Ops,Clerk,1000.50,person%d@example.com,2021-03-04\n' % (i, i, i)
+            for i in range(25)
+        )
+        path = self.write_file('staff.csv', self.header + rows)
+        out = io.StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_employees', path, '--batch-size', '10', '--user', 'hr', stdout=out)
+
+        self.assertEqual(Employee.objects.filter(department__name='Ops', created_by=self.user).count(), 25)
+        uniqueness_checks = [q for q in queries.captured_queries if 'WHERE ("employees_employee"."employee_id" IN' in q['sql']]
+        self.assertEqual(len(uniqueness_checks), 3)
+        self.assertIn('25 rows read, 25 created, 0 rejected', out.getvalue())
+
+    def test_command_reports_bad_rows(self):
+        rows = (
+            'N0001,Good,ops,CLERK,1000,good@example.com,2021-03-04\n'
+            'E00001,Taken Id,Ops,Clerk,1000,new@example.com,2021-03-04\n'
+            'N0002,Taken Email,Ops,Clerk,1000,employee1@example.com,2021-03-04\n'
+            'N0003,Bad Salary,Ops,Clerk,lots,bad@example.com,2021-03-04\n'
+            'N0001,Duplicate In File,Ops,Clerk,1000,dup@example.com,2021-03-04\n'
+            'N0004,Unknown Department,Nowhere,Clerk,1000,nowhere@example.com,2021-03-04\n'
+        )
+        path = self.write_file('staff.csv', self.header + rows)
+        call_command('import_employees', path, stdout=io.StringIO())
+
+        good = Employee.objects.get(employee_id='N0001', name='Good')
+        self.assertEqual((good.department.name, good.position.name), ('Ops', 'Clerk'))
+        self.assertEqual(Employee.objects.count(), 2)
+        with open(path + '.errors.csv') as f:
+            report = sorted(csv.DictReader(f), key=lambda r: int(r['line']))
+        self.assertEqual([r['line'] for r in report], ['3', '4', '5', '6', '7'])
+        self.assertIn('salary', report[2]['error'])
+        self.assertIn('department', report[4]['error'])
+
+    def test_concurrent_insert_rejects_only_the_conflicting_rows(self):
+        importer = EmployeeImporter(batch_size=10)
+        check = importer.existing_values
+
+        def racing_check(batch):
+            taken = check(batch)
+            if not Employee.objects.filter(employee_id='R2').exists():
+                # Another writer inserts one of the IDs between the check and the insert
+                make_employee(2, employee_id='R2')
+            return taken
+
+        rows = iter([(n + 2, {
+            'employee_id': 'R%d' % n, 'name': 'Racer %d' % n, 'department': 'Ops', 'position': 'Clerk',
+            'salary': '1000', 'email': 'racer%d@example.com' % n, 'hire_date': '2021-03-04',
+        }) for n in range(1, 4)])
+        with mock.patch.object(importer, 'existing_values', side_effect=racing_check):
+            result = importer.run(rows)
+
+        self.assertEqual((result.created, result.rejected), (2, 1))
+        self.assertEqual(result.errors, [(4, 'employee_id: This Employee ID is already in use.')])
+        self.assertEqual(set(Employee.objects.filter(name__startswith='Racer').values_list('employee_id', flat=True)),
+                         {'R1', 'R3'})
+
+    def test_command_imports_jsonl(self):
+        rows = [
+            {'employee_id': 'J1', 'name': 'Json One', 'department': 'Ops', 'position': 'Clerk',
+             'salary': 1200, 'email': 'j1@example.com', 'hire_date': '2020-02-02'},
+            'not json',
+        ]
+        content = json.dumps(rows[0]) + '\n\n' + rows[1] + '\n'
+        path = self.write_file('staff.jsonl', content)
+        out = io.StringIO()
+        call_command('import_employees', path, stdout=out)
+        self.assertTrue(Employee.objects.filter(employee_id='J1').exists())
+        self.assertIn('2 rows read, 1 created, 1 rejected', out.getvalue())
+
+    def test_upload_view(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile(
+            'staff.csv',
+            (self.header + 'U1,Uploaded,Ops,Clerk,900,u1@example.com,2022-01-01\n').encode()
+        )
+        response = self.client.post(reverse('employees:employee_import'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result'].created, 1)
+        self.assertEqual(Employee.objects.get(employee_id='U1').created_by, self.user)
+
+
+class EmployeeExportTests(EmployeesTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='hr', password='secret-pass')
+        for i in range(7):
+            make_employee(i, department='Sales' if i % 2 else 'Engineering')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def export(self, **params):
+        response = self.client.get(reverse('employees:employee_export'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_chunked_rows_cover_table_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            with replica_reads():
+                lookups.version()
+                rows = list(iter_employee_rows(chunk_size=3))
+        self.assertEqual([r[0] for r in rows], sorted(Employee.objects.values_list('pk', flat=True)))
+        queries = queries.captured_queries[1:]
+        self.assertEqual(len(queries), 3)
+        self.assertTrue(all('LIMIT 3' in q['sql'] for q in queries))
+
+    def test_csv_export_applies_list_filters(self):
+        response, body = self.export(department='Sales')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({r['department'] for r in rows}, {'Sales'})
+        self.assertEqual(rows[0]['salary'], '50001.00')
+
+    def test_jsonl_export(self):
+        response, body = self.export(format='jsonl')
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[0]['hire_date'], '2020-01-01')
+
+    def test_gzip_export(self):
+        response, body = self.export(format='csv', gzip='1')
+        self.assertIn('.csv.gz', response['Content-Disposition'])
+        self.assertEqual(len(gzip.decompress(body).decode().splitlines()), 8)
+
+    def test_invalid_parameters_are_rejected(self):
+        response = self.client.get(reverse('employees:employee_export'), {'format': 'xlsx'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('employees:employee_export'), {'salary_min': 'lots'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_command(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'roster.jsonl.gz')
+        call_command('export_employees', '--format', 'jsonl', '--gzip', '--output', path,
+                     '--department', 'Engineering', '--chunk-size', '2')
+        with gzip.open(path, 'rt') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(len(rows), 4)
+
+        out = io.StringIO()
+        call_command('export_employees', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 8)
+
+
+class UserProfileMiddlewareTests(EmployeesTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='hr', password='secret-pass')
+        cls.employee = make_employee(1)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def get_detail(self):
+        return self.client.get(reverse('employees:employee_detail', args=[self.employee.pk]))
+
+    def test_default_profile_is_created_once(self):
+        response = self.get_detail()
+        self.assertEqual(response.status_code, 200)
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.emp_id, 'EMP%03d' % self.user.pk)
+        self.assertEqual(response.context['user_profile'], profile)
+        self.get_detail()
+        self.assertEqual(UserProfile.objects.filter(user=self.user).count(), 1)
+
+    def test_profile_is_served_from_cache(self):
+        self.get_detail()
+        with CaptureQueriesContext(connection) as queries:
+            self.get_detail()
+        self.assertFalse(any('user_profile' in q['sql'] for q in queries.captured_queries))
+
+    def test_profile_change_invalidates_cache(self):
+        self.get_detail()
+        profile = UserProfile.objects.get(user=self.user)
+        profile.name = 'Renamed'
+        profile.save()
+        response = self.get_detail()
+        self.assertContains(response, 'Welcome, Renamed')
+
+    def test_profile_not_resolved_when_unused(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('employees:employee_export'))
+        self.assertFalse(any('user_profile' in q['sql'] for q in queries.captured_queries))
+
+    def test_login_creates_profile(self):
+        self.client.logout()
+        self.client.post(reverse('employees:login'), {'username': 'hr', 'password': 'secret-pass'})
+        self.assertTrue(UserProfile.objects.filter(user=self.user).exists())
+
+
+class EmployeeQueryCacheTests(EmployeesTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='hr', password='secret-pass', is_staff=True)
+        cls.employee = make_employee(1)
+        department('Ops'), position('Clerk'), position('Architect')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def employee_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        return response, [q for q in queries.captured_queries if 'employees_employee' in q['sql']]
+
+    def test_list_page_is_served_from_cache_until_a_write(self):
+        url = reverse('employees:employee_list')
+        _, queries = self.employee_queries(url, sort='name')
+        self.assertEqual(len(queries), 1)
+        _, queries = self.employee_queries(url, sort='name')
+        self.assertEqual(queries, [])
+
+        make_employee(2, name='Newcomer')
+        response, queries = self.employee_queries(url, sort='name')
+        self.assertEqual(len(queries), 1)
+        self.assertContains(response, 'Newcomer')
+
+    def test_detail_is_invalidated_by_update(self):
+        url = reverse('employees:employee_detail', args=[self.employee.pk])
+        self.employee_queries(url)
+        _, queries = self.employee_queries(url)
+        self.assertEqual(queries, [])
+
+        self.employee.position = Position.objects.get(name='Architect')
+        self.employee.save()
+        response, queries = self.employee_queries(url)
+        self.assertEqual(len(queries), 1)
+        self.assertContains(response, 'Architect')
+
+    def test_import_invalidates_cache(self):
+        version = get_version()
+        EmployeeImporter().run(iter([(2, {
+            'employee_id': 'B1', 'name': 'Bulk', 'department': 'Ops', 'position': 'Clerk',
+            'salary': '1', 'email': 'bulk@example.com', 'hire_date': '2020-01-01',
+        })]))
+        self.assertNotEqual(get_version(), version)
+
+    def test_writes_of_other_processes_change_the_list_etag(self):
+        url = reverse('employees:employee_list')
+        response = self.client.get(url)
+        etag = response['ETag']
+        # Without the signals of this process, as another worker or a job writes
+        Employee.objects.filter(pk=self.employee.pk).update(name='Renamed Elsewhere', updated_at=timezone.now())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, 'Renamed Elsewhere')
+
+    def test_detail_conditional_get(self):
+        url = reverse('employees:employee_detail', args=[self.employee.pk])
+        response = self.client.get(url)
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+        )
+
+        self.employee.salary = Decimal('1.00')
+        self.employee.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_conditional_get(self):
+        url = reverse('employees:employee_list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, {'sort': 'name'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        self.employee.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_pending_messages_are_not_dropped_by_a_304(self):
+        url = reverse('employees:employee_list')
+        etag = self.client.get(url)['ETag']
+        response = self.client.post(reverse('employees:employee_bulk_action'), {})
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(list(response.context['messages']))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        detail_url = reverse('employees:employee_detail', args=[self.employee.pk])
+        etag = self.client.get(detail_url)['ETag']
+        self.client.post(reverse('employees:employee_bulk_action'), {})
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_employee_redirects(self):
+        response = self.client.get(reverse('employees:employee_detail', args=[999]))
+        self.assertRedirects(response, reverse('employees:employee_list'))
+
+    def test_cache_stats(self):
+        url = reverse('employees:employee_list')
+        self.client.get(url)
+        # A hit only reads the cache
+        with mock.patch.object(cache, 'set') as set_, mock.patch.object(cache, 'incr') as incr:
+            self.client.get(url)
+        set_.assert_not_called()
+        incr.assert_not_called()
+        self.assertEqual(registry.counter_totals(), {'cache_hits': 1, 'cache_misses': 1})
+        stats = self.client.get(reverse('employees:employee_cache_stats')).json()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('employees:employee_cache_stats')).status_code, 403)
+
+
+class EmployeeApiTests(EmployeesTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='svc', password='secret-pass')
+        cls.employees = [make_employee(i) for i in range(EmployeeConstants.API_PAGE_SIZE + 3)]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def get_json(self, name, *args, **params):
+        response = self.client.get(reverse(name, args=args), params)
+        return response, response.json() if response.status_code != 304 else None
+
+    def test_requires_authentication(self):
+        self.client.logout()
+        response = self.client.get(reverse('employees:api_employee_list'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_list_pages_with_cursor(self):
+        _, first = self.get_json('employees:api_employee_list')
+        self.assertEqual(len(first['results']), EmployeeConstants.API_PAGE_SIZE)
+        self.assertEqual(first['results'][0]['id'], self.employees[-1].pk)
+        _, second = self.get_json('employees:api_employee_list', cursor=first['next_cursor'])
+        self.assertEqual(len(second['results']), 3)
+        self.assertIsNone(second['next_cursor'])
+
+    def test_field_selection_and_filters(self):
+        _, data = self.get_json(
+            'employees:api_employee_list', fields='name,salary', sort='salary', salary_max='50001.00'
+        )
+        self.assertEqual(data['results'], [
+            {'name': 'Employee 0', 'salary': '50000.00'},
+            {'name': 'Employee 1', 'salary': '50001.00'},
+        ])
+        _, data = self.get_json('employees:api_employee_list', fields='name', sort='salary')
+        _, data = self.get_json(
+            'employees:api_employee_list', fields='name', sort='salary', cursor=data['next_cursor']
+        )
+        self.assertEqual(data['results'][0], {'name': 'Employee %d' % EmployeeConstants.API_PAGE_SIZE})
+
+    def test_unknown_field_is_rejected(self):
+        response, data = self.get_json('employees:api_employee_list', fields='name,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', data['error'])
+
+    def test_values_query_only_selects_requested_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.get_json('employees:api_employee_detail', self.employees[0].pk, fields='email')
+        sql = [q['sql'] for q in queries.captured_queries if 'employees_employee' in q['sql']][-1]
+        self.assertIn('"email"', sql)
+        self.assertNotIn('"salary"', sql)
+
+    def test_detail(self):
+        employee = self.employees[0]
+        response, data = self.get_json('employees:api_employee_detail', employee.pk)
+        self.assertEqual(data['employee_id'], employee.employee_id)
+        self.assertEqual(data['hire_date'], '2020-01-01')
+        response, data = self.get_json('employees:api_employee_detail', 99999)
+        self.assertEqual(response.status_code, 404)
+
+    def test_detail_conditional_get(self):
+        employee = self.employees[0]
+        url = reverse('employees:api_employee_detail', args=[employee.pk])
+        response = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+        )
+        employee.name = 'Changed'
+        employee.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_list_conditional_get(self):
+        url = reverse('employees:api_employee_list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.employees[1].delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_search(self):
+        make_employee(9000, name='Zora Unique', email='zora@example.com')
+        _, data = self.get_json('employees:api_employee_search', q='zor', fields='name')
+        self.assertEqual(data['results'], [{'name': 'Zora Unique'}])
+        response, _ = self.get_json('employees:api_employee_search')
+        self.assertEqual(response.status_code, 400)
+
+    def test_benchmark_command(self):
+        out = io.StringIO()
+        call_command('benchmark_api', '--rows', '20', '--repeat', '1', '--json', stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual(results['rows'], 20)
+        self.assertGreater(results['template']['us_per_row'], 0)
+        self.assertGreater(results['api']['us_per_row'], 0)
+
+
+class EmployeeBulkActionTests(EmployeesTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(username='admin', email='admin@example.com', password='secret-pass')
+        cls.engineers = [make_employee(i, salary=Decimal('1000.00')) for i in range(5)]
+        cls.sales = [make_employee(10 + i, department='Sales', salary=Decimal('2000.00')) for i in range(3)]
+        department('Platform'), position('Senior Developer')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_bulk_update_is_one_statement(self):
+        with CaptureQueriesContext(connection) as queries:
+            count = bulk_update(
+                Employee.objects.filter(department__name='Engineering'), self.user,
+                position=Position.objects.get(name='Senior Developer'), salary_percent=Decimal('4')
+            )
+        self.assertEqual(count, 5)
+        self.assertEqual(len([q for q in queries.captured_queries if q['sql'].startswith('UPDATE')]), 1)
+        for employee in Employee.objects.filter(department__name='Engineering'):
+            self.assertEqual(employee.position.name, 'Senior Developer')
+            self.assertEqual(employee.salary, Decimal('1040.00'))
+            self.assertEqual(employee.updated_by, self.user)
+            self.assertGreater(employee.updated_at, self.engineers[0].updated_at)
+        self.assertEqual(Employee.objects.get(pk=self.sales[0].pk).salary, Decimal('2000.00'))
+
+    def test_salary_adjustments_round_to_cents(self):
+        bulk_update(Employee.objects.filter(pk=self.engineers[0].pk), self.user,
+                    salary_percent=Decimal('3.333'), salary_amount=Decimal('-0.5'))
+        self.assertEqual(Employee.objects.get(pk=self.engineers[0].pk).salary, Decimal('1032.83'))
+
+    def test_bulk_delete_is_one_statement(self):
+        with CaptureQueriesContext(connection) as queries:
+            count = bulk_delete(Employee.objects.filter(department__name='Sales'))
+        self.assertEqual(count, 3)
+        self.assertEqual(len([q for q in queries.captured_queries if q['sql'].startswith('DELETE')]), 1)
+        self.assertFalse(Employee.objects.filter(department__name='Sales').exists())
+        self.assertEqual(search_employees('sales'), [])
+
+    def test_view_updates_selected_employees(self):
+        response = self.client.post(reverse('employees:employee_bulk_action'), {
+            'action': 'update', 'scope': 'selected',
+            'ids': [self.engineers[0].pk, self.engineers[1].pk], 'department': 'Platform',
+        })
+        self.assertRedirects(response, reverse('employees:employee_list'))
+        self.assertEqual(Employee.objects.filter(department__name='Platform').count(), 2)
+
+    def test_view_updates_all_matching_filters(self):
+        response = self.client.post(reverse('employees:employee_bulk_action'), {
+            'action': 'update', 'scope': 'filtered', 'filter-department': 'Sales',
+            'salary_amount': '100',
+        }, follow=True)
+        self.assertContains(response, '3 employees updated.')
+        self.assertEqual(set(Employee.objects.filter(department__name='Sales').values_list('salary', flat=True)),
+                         {Decimal('2100.00')})
+
+    def test_view_refuses_unfiltered_scope(self):
+        self.client.post(reverse('employees:employee_bulk_action'), {
+            'action': 'delete', 'scope': 'filtered',
+        })
+        self.assertEqual(Employee.objects.count(), 8)
+
+    def test_view_deletes_selected(self):
+        self.client.post(reverse('employees:employee_bulk_action'), {
+            'action': 'delete', 'scope': 'selected', 'ids': [self.sales[0].pk],
+        })
+        self.assertFalse(Employee.objects.filter(pk=self.sales[0].pk).exists())
+
+    def test_admin_bulk_update_action(self):
+        url = reverse('admin:employees_employee_changelist')
+        selected = [str(e.pk) for e in self.engineers[:3]]
+        response = self.client.post(url, {'action': 'bulk_update_selected', '_selected_action': selected})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Apply')
+
+        self.client.post(url, {
+            'action': 'bulk_update_selected', '_selected_action': selected, 'apply': '1',
+            'salary_percent': '10',
+        })
+        self.assertEqual(Employee.objects.filter(salary=Decimal('1100.00')).count(), 3)
+
+    def test_admin_delete_uses_single_statement(self):
+        url = reverse('admin:employees_employee_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(url, {
+                'action': 'delete_selected', 'post': 'yes',
+                '_selected_action': [str(e.pk) for e in self.sales],
+            })
+        self.assertFalse(Employee.objects.filter(department__name='Sales').exists())
+        deletes = [q for q in queries.captured_queries
+                   if q['sql'].startswith('DELETE FROM "employees_employee"')]
+        self.assertEqual(len(deletes), 1)
+
+
+class EmployeeAnalyticsTests(EmployeesTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='hr', password='secret-pass')
+        cls.a = make_employee(1, salary=Decimal('1000.10'), hire_date=datetime.date(2021, 1, 5))
+        cls.b = make_employee(2, salary=Decimal('2000.20'), hire_date=datetime.date(2021, 1, 20))
+        cls.c = make_employee(3, department='Sales', position='Rep', salary=Decimal('500.05'),
+                              hire_date=datetime.date(2021, 2, 1))
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def stats(self, department='Engineering', position='Developer'):
+        return {
+            row['position']: row for row in analytics.position_summary()
+            if row['department'] == department
+        }.get(position)
+
+    def assertInSync(self):
+        self.assertEqual(analytics.find_drift(), [])
+
+    def test_insert_is_aggregated(self):
+        row = self.stats()
+        self.assertEqual(row['headcount'], 2)
+        self.assertEqual(row['salary_total'], Decimal('3000.30'))
+        self.assertEqual(row['avg_salary'], Decimal('1500.15'))
+        self.assertEqual((row['min_salary'], row['max_salary']), (Decimal('1000.10'), Decimal('2000.20')))
+        self.assertEqual(analytics.hiring_trend(), [
+            {'month': '2021-01', 'hires': 2}, {'month': '2021-02', 'hires': 1},
+        ])
+        self.assertInSync()
+
+    def test_update_moves_employee_between_groups(self):
+        self.b.department = Department.objects.get(name='Sales')
+        self.b.position = Position.objects.get(name='Rep')
+        self.b.hire_date = datetime.date(2021, 2, 10)
+        self.b.save()
+        self.assertEqual(self.stats()['headcount'], 1)
+        self.assertEqual(self.stats()['max_salary'], Decimal('1000.10'))
+        self.assertEqual(self.stats('Sales', 'Rep')['salary_total'], Decimal('2500.25'))
+        self.assertInSync()
+
+    def test_unrelated_update_does_not_touch_stats(self):
+        self.a.name = 'Renamed'
+        self.a.save()
+        self.assertFalse(EmployeeStats.objects.filter(minmax_stale=True).exists())
+
+    def test_delete_removes_empty_groups(self):
+        self.c.delete()
+        self.assertIsNone(self.stats('Sales', 'Rep'))
+        self.assertEqual(analytics.hiring_trend(), [{'month': '2021-01', 'hires': 2}])
+        self.assertInSync()
+
+    def test_bulk_paths_keep_stats_in_sync(self):
+        bulk_update(Employee.objects.filter(department__name='Engineering'), self.user, salary_percent=Decimal('4'))
+        self.assertInSync()
+        EmployeeImporter().run(iter([(2, {
+            'employee_id': 'B1', 'name': 'Bulk', 'department': 'Sales', 'position': 'Rep',
+            'salary': '10.00', 'email': 'bulk@example.com', 'hire_date': '2022-03-01',
+        })]))
+        self.assertInSync()
+        bulk_delete(Employee.objects.filter(department__name='Sales'))
+        self.assertInSync()
+
+    def test_dashboard_reads_summary_tables_only(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('employees:employee_analytics'))
+        self.assertContains(response, 'Engineering')
+        self.assertEqual(response.context['total_headcount'], 3)
+        reads = [q['sql'] for q in queries.captured_queries
+                 if q['sql'].startswith('SELECT') and 'employees_employee' in q['sql']]
+        self.assertEqual(reads, [])
+
+    def test_dashboard_only_writes_when_a_group_is_stale(self):
+        url = reverse('employees:employee_analytics')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([q['sql'] for q in queries.captured_queries if 'UPDATE employee_stats' in q['sql']])
+        self.a.delete()
+        self.assertTrue(EmployeeStats.objects.filter(minmax_stale=True).exists())
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertTrue([q['sql'] for q in queries.captured_queries if 'UPDATE employee_stats' in q['sql']])
+        self.assertFalse(EmployeeStats.objects.filter(minmax_stale=True).exists())
+        self.assertEqual(response.context['total_headcount'], 2)
+        self.assertInSync()
+
+    def test_rebuild_command_fixes_drift(self):
+        EmployeeStats.objects.filter(department__name='Sales').update(headcount=42)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_employee_stats', '--check', stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('rebuild_employee_stats', stdout=out)
+        self.assertIn('1 drifted rows fixed', out.getvalue())
+        self.assertInSync()
+
+
+class UniquenessValidationTests(EmployeesTestCase):
+    """Unique fields are checked with one query and enforced by the database."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='hr', password='secret-pass')
+        UserProfile.objects.create(user=cls.user, name='HR', emp_id='HR001')
+        cls.existing = make_employee(1)
+        cls.other = make_employee(2)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def employee_data(self, **kwargs):
+        data = {
+            'employee_id': 'E09999', 'name': 'New Hire', 'department': 'Engineering',
+            'position': 'Developer', 'salary': '1000.00', 'email': 'new@example.com',
+            'hire_date': '2022-01-01',
+        }
+        data.update(kwargs)
+        return data
+
+    def assertUniquenessQueries(self, form, count):
+        with CaptureQueriesContext(connection) as queries:
+            form.is_valid()
+        # Not counting the token of the department and position tables
+        self.assertEqual(len([q for q in queries.captured_queries if 'employee_lookups_version' not in q['sql']]),
+                         count)
+
+    def test_create_checks_both_fields_in_one_query(self):
+        form = EmployeeForm(self.employee_data(employee_id='E00001', email='employee2@example.com'))
+        self.assertUniquenessQueries(form, 1)
+        self.assertEqual(form.errors['employee_id'], [EmployeeForm.UNIQUE_ERRORS['employee_id']])
+        self.assertEqual(form.errors['email'], [EmployeeForm.UNIQUE_ERRORS['email']])
+
+    def test_update_excludes_own_row(self):
+        data = self.employee_data(employee_id='E00001', email='employee1@example.com')
+        form = EmployeeForm(data, instance=self.existing)
+        self.assertUniquenessQueries(form, 1)
+        self.assertEqual(form.errors, {})
+
+        form = EmployeeForm(dict(data, email='employee2@example.com'), instance=self.existing)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(list(form.errors), ['email'])
+
+    def test_invalid_values_skip_the_query(self):
+        form = EmployeeForm(self.employee_data(employee_id='', email='not-an-email'))
+        self.assertUniquenessQueries(form, 0)
+
+    def test_signup_checks_both_fields_in_one_query(self):
+        form = SignUpForm({
+            'name': 'Someone', 'emp_id': 'HR001', 'username': 'new-user',
+            'password': 'pw-12345', 'confirm_password': 'pw-12345',
+        })
+        self.assertUniquenessQueries(form, 1)
+        self.assertEqual(form.non_field_errors(), [SignUpForm.UNIQUE_ERRORS['emp_id']])
+
+    def test_create_race_is_reported_as_field_error(self):
+        # Skip the pre-check so that only the database constraint can catch it
+        with mock.patch.object(EmployeeForm, 'clean', forms.ModelForm.clean):
+            response = self.client.post(
+                reverse('employees:employee_create'), self.employee_data(email='employee1@example.com')
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['form'].errors['email'], [EmployeeForm.UNIQUE_ERRORS['email']])
+        self.assertFalse(Employee.objects.filter(employee_id='E09999').exists())
+
+    def test_update_race_is_reported_as_field_error(self):
+        with mock.patch.object(EmployeeForm, 'clean', forms.ModelForm.clean):
+            response = self.client.post(
+                reverse('employees:employee_update', args=[self.existing.pk]),
+                self.employee_data(employee_id='E00002')
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.context['form'].errors['employee_id'], [EmployeeForm.UNIQUE_ERRORS['employee_id']]
+        )
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.employee_id, 'E00001')
+
+    def test_signup_race_is_reported(self):
+        self.client.logout()
+        with mock.patch.object(SignUpForm, 'clean', forms.Form.clean):
+            response = self.client.post(reverse('employees:signup'), {
+                'name': 'Someone', 'emp_id': 'HR001', 'username': 'new-user',
+                'password': 'pw-12345', 'confirm_password': 'pw-12345',
+            }, follow=True)
+        self.assertContains(response, SignUpForm.UNIQUE_ERRORS['emp_id'])
+        self.assertFalse(User.objects.filter(username='new-user').exists())
+
+    def test_email_is_unique_in_the_database(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            make_employee(3, email='employee1@example.com')
+
+
+class ConcurrentEmployeeCreateTests(TransactionTestCase):
+    """Many simultaneous submissions of the same employee create exactly one row."""
+
+    threads = 8
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='hr', password='secret-pass')
+        UserProfile.objects.create(user=self.user, name='HR', emp_id='HR001')
+        department('Engineering'), position('Developer')
+        warm_lookups()
+
+    def test_duplicate_submissions_create_one_employee(self):
+        barrier = threading.Barrier(self.threads)
+        statuses = []
+
+        def submit(n):
+            client = Client()
+            try:
+                client.force_login(self.user)
+                barrier.wait(timeout=10)
+                response = client.post(reverse('employees:employee_create'), {
+                    'employee_id': 'RACE1', 'name': 'Racer %d' % n, 'department': 'Engineering',
+                    'position': 'Developer', 'salary': '1000.00', 'email': 'race@example.com',
+                    'hire_date': '2022-01-01',
+                })
+                statuses.append(response.status_code)
+            except Exception as e:
+                statuses.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=submit, args=(n,)) for n in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(len(statuses), self.threads)
+        self.assertNotIn(500, statuses)
+        self.assertEqual(Employee.objects.filter(employee_id='RACE1').count(), 1)
+
+
+class SQLiteTuningTests(TransactionTestCase):
+    """Connections get the pragmas and transaction mode from the database OPTIONS."""
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA %s' % name)
+            return cursor.fetchone()[0]
+
+    def test_connections_are_tuned(self):
+        connection.close()
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('cache_size'), -20000)
+
+    def test_atomic_takes_the_write_lock_up_front(self):
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            Employee.objects.exists()
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+    def test_empty_values_are_skipped(self):
+        raw = sqlite3.connect(':memory:')
+        apply_pragmas(raw, {'busy_timeout': '1234', 'cache_size': ''})
+        self.assertEqual(raw.execute('PRAGMA busy_timeout').fetchone()[0], 1234)
+        self.assertEqual(raw.execute('PRAGMA cache_size').fetchone()[0], -2000)
+        raw.close()
+
+    def test_invalid_pragmas_are_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            apply_pragmas(connection.connection, {'cache_size': '1; DROP TABLE employees_employee'})
+
+    def test_benchmark_command(self):
+        for n in range(20):
+            make_employee(n)
+        out = io.StringIO()
+        call_command('benchmark_sqlite', '--workers', '1,2', '--seconds', '0.2', '--json', stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual(results['employees'], 20)
+        for name in ('default', 'tuned'):
+            self.assertEqual([run['workers'] for run in results['runs'][name]], [1, 2])
+            self.assertTrue(all(run['reads_per_s'] > 0 for run in results['runs'][name]))
+        # The benchmark works on copies of the database
+        self.assertFalse(Employee.objects.filter(salary__gt=Decimal('50100')).exists())
+
+
+class PrimaryReplicaRouterTests(EmployeesTestCase):
+    """Without a replica alias, every read goes to default."""
+
+    def test_reads_stay_on_default_without_replica(self):
+        with replica_reads():
+            self.assertEqual(read_alias(), 'default')
+            self.assertEqual(router.db_for_read(Employee), 'default')
+
+    def test_sync_command_needs_a_replica(self):
+        with self.assertRaises(CommandError):
+            call_command('sync_replica', stdout=io.StringIO())
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """GET traffic reads a second SQLite file kept in sync with sync_replica()."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        connections.databases[REPLICA_DB_ALIAS] = dict(
+            connections['default'].settings_dict,
+            NAME=os.path.join(cls.directory, 'replica.sqlite3'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA_DB_ALIAS].close()
+        del connections.databases[REPLICA_DB_ALIAS]
+        delattr(connections._connections, REPLICA_DB_ALIAS)
+        shutil.rmtree(cls.directory)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='hr', password='secret-pass')
+        UserProfile.objects.create(user=self.user, name='HR', emp_id='HR001')
+        make_employee(1, name='Synced Employee')
+        sync_replica()
+        warm_lookups()
+        self.client.force_login(self.user)
+
+    def list_page(self):
+        return self.client.get(reverse('employees:employee_list'))
+
+    def test_get_reads_from_replica(self):
+        make_employee(2, name='Lagging Employee')
+        with replica_reads():
+            self.assertEqual(read_alias(), REPLICA_DB_ALIAS)
+        self.assertNotContains(self.list_page(), 'Lagging Employee')
+        self.assertNotContains(
+            self.client.get(reverse('employees:employee_search'), {'q': 'lagging'}), 'Lagging Employee'
+        )
+        export = b''.join(self.client.get(reverse('employees:employee_export')).streaming_content)
+        self.assertNotIn(b'Lagging Employee', export)
+
+        sync_replica()
+        self.assertContains(self.list_page(), 'Lagging Employee')
+
+    def test_writer_reads_its_own_writes(self):
+        response = self.client.post(reverse('employees:employee_create'), {
+            'employee_id': 'E09999', 'name': 'Fresh Hire', 'department': 'Engineering',
+            'position': 'Developer', 'salary': '1000.00', 'email': 'fresh@example.com',
+            'hire_date': '2022-01-01',
+        })
+        self.assertRedirects(response, reverse('employees:employee_list'))
+        self.assertContains(self.list_page(), 'Fresh Hire')
+
+        # Once the pin expires reads go back to the (still lagging) replica
+        with override_settings(REPLICA_PIN_SECONDS=-1):
+            self.client.post(reverse('employees:employee_update', args=[Employee.objects.get(employee_id='E09999').pk]), {
+                'employee_id': 'E09999', 'name': 'Renamed Hire', 'department': 'Engineering',
+                'position': 'Developer', 'salary': '1000.00', 'email': 'fresh@example.com',
+                'hire_date': '2022-01-01',
+            })
+        self.assertNotContains(self.list_page(), 'Fresh Hire')
+        self.assertNotContains(self.list_page(), 'Renamed Hire')
+
+    def test_other_sessions_are_not_pinned(self):
+        self.client.post(reverse('employees:employee_create'), {
+            'employee_id': 'E09999', 'name': 'Fresh Hire', 'department': 'Engineering',
+            'position': 'Developer', 'salary': '1000.00', 'email': 'fresh@example.com',
+            'hire_date': '2022-01-01',
+        })
+        other = Client()
+        other.force_login(self.user)
+        self.assertNotContains(other.get(reverse('employees:employee_list')), 'Fresh Hire')
+
+    def test_primary_reads_override(self):
+        make_employee(2)
+        with replica_reads():
+            self.assertEqual(Employee.objects.count(), 1)
+            with primary_reads():
+                self.assertEqual(Employee.objects.count(), 2)
+
+
+class RequestMetricsTests(EmployeesTestCase):
+    """Per view query counts, timings and query budgets."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='hr', password='secret-pass')
+        cls.staff = User.objects.create_user(username='ops', password='secret-pass', is_staff=True)
+        for n in range(3):
+            make_employee(n)
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.client.force_login(self.user)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('employees:employee_list'))
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=[\d.]+$'
+        )
+
+    def test_totals_are_recorded_per_view(self):
+        self.client.get(reverse('employees:employee_list'))
+        self.client.get(reverse('employees:employee_list'))
+        totals = registry.snapshot()['employees:employee_list']
+        self.assertEqual(totals['requests'], 2)
+        self.assertGreater(totals['queries'], 0)
+        self.assertGreater(totals['template_seconds'], 0)
+        self.assertLessEqual(totals['sql_seconds'] + totals['template_seconds'], totals['seconds'])
+        self.assertEqual(totals['budget'], views.employee_list.query_budget)
+
+    def test_totals_are_added_up_across_processes(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        first, second = MetricsRegistry(), MetricsRegistry()
+        metrics = RequestMetrics()
+        metrics.queries = 3
+        with override_settings(METRICS_DIR=directory, METRICS_FLUSH_SECONDS=3600):
+            first.observe('employees:employee_list', metrics, 0.002, budget=6)
+            second.observe('employees:employee_list', metrics, 0.2, budget=6)
+            second.observe('employees:employee_list', metrics, 0.2, budget=6)
+            # Written at most every METRICS_FLUSH_SECONDS, and by the process scraped
+            self.assertEqual(first.snapshot()['employees:employee_list']['requests'], 2)
+            totals = second.snapshot()['employees:employee_list']
+            self.assertEqual((totals['requests'], totals['queries'], totals['budget']), (3, 9, 6))
+            self.assertEqual(totals['buckets'][DURATION_BUCKETS.index(0.005)], 1)
+            self.assertEqual(totals['buckets'][DURATION_BUCKETS.index(0.25)], 3)
+            self.assertEqual(first.snapshot()['employees:employee_list'], totals)
+            # A worker that exits keeps its counts in the totals
+            del second
+            self.assertEqual(first.snapshot()['employees:employee_list']['requests'], 3)
+            self.assertIn('hrmanage_requests_total{view="employees:employee_list"} 3', first.render())
+
+            first.count('cache_hits')
+            second = MetricsRegistry()
+            second.count('cache_hits')
+            second.count('cache_misses')
+            # Once METRICS_FLUSH_SECONDS have passed
+            first.flush(force=True)
+            self.assertEqual(second.counter_totals(), {'cache_hits': 2, 'cache_misses': 1})
+            self.assertIn('hrmanage_cache_hits_total 2', first.render())
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('employees:employee_list'))
+        self.assertEqual(self.client.get(reverse('employees:metrics')).status_code, 403)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('employees:metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('# TYPE hrmanage_db_queries_total counter', body)
+        self.assertIn('hrmanage_requests_total{view="employees:employee_list"} 1', body)
+        self.assertIn('hrmanage_query_budget{view="employees:employee_list"} 6', body)
+        self.assertIn('hrmanage_request_duration_seconds_bucket{view="employees:employee_list",le="+Inf"} 1', body)
+
+    def test_metrics_endpoint_accepts_token(self):
+        self.client.logout()
+        with self.settings(METRICS_TOKEN='scrape-me'):
+            response = self.client.get(reverse('employees:metrics'), HTTP_AUTHORIZATION='Bearer scrape-me')
+            self.assertEqual(response.status_code, 200)
+            response = self.client.get(reverse('employees:metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+            self.assertEqual(response.status_code, 403)
+
+    def test_budget_is_enforced_in_tests(self):
+        with mock.patch.object(views.employee_list, 'query_budget', 1):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('employees:employee_list'))
+
+    def test_budget_overrun_is_logged_in_production(self):
+        with mock.patch.object(views.employee_list, 'query_budget', 1), \
+                self.settings(QUERY_BUDGETS_ENFORCED=False), \
+                self.assertLogs('employees.metrics', 'WARNING') as logs:
+            response = self.client.get(reverse('employees:employee_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('employees:employee_list ran', logs.output[0])
+        self.assertEqual(registry.snapshot()['employees:employee_list']['over_budget'], 1)
+
+    def test_every_employees_view_has_a_budget(self):
+        missing = []
+        for pattern in get_resolver('employees.urls').url_patterns:
+            if pattern.name != 'logout' and get_query_budget(pattern.callback) is None:
+                missing.append(pattern.name)
+        self.assertEqual(missing, [])
+
+    def test_form_pages_stay_within_budget(self):
+        employee = Employee.objects.first()
+        for name, args in (('employee_create_form', []), ('employee_update_form', [employee.pk]),
+                           ('employee_delete_confirm', [employee.pk]), ('employee_import', [])):
+            self.assertEqual(self.client.get(reverse('employees:' + name, args=args)).status_code, 200)
+
+
+class SeedEmployeesTests(EmployeesTestCase):
+
+    def test_seeding_is_deterministic_and_extends_previous_runs(self):
+        call_command('seed_employees', '--count', '30', '--users', '3', stdout=io.StringIO())
+        call_command('seed_employees', '--count', '20', stdout=io.StringIO())
+        self.assertEqual(Employee.objects.count(), 50)
+        self.assertEqual(User.objects.filter(username__startswith='seeduser').count(), 3)
+        self.assertEqual(UserProfile.objects.filter(emp_id__startswith='SEEDU').count(), 3)
+
+        rows = list(Employee.objects.order_by('employee_id').values_list(
+            'employee_id', 'name', 'department', 'position', 'salary', 'email', 'hire_date'))
+        self.assertEqual(rows[0][0], 'SEED0000001')
+        self.assertEqual(rows[-1][0], 'SEED0000050')
+        self.assertEqual(Employee.objects.filter(created_by__isnull=True).count(), 0)
+
+        Employee.objects.all().delete()
+        call_command('seed_employees', '--count', '50', stdout=io.StringIO())
+        again = list(Employee.objects.order_by('employee_id').values_list(
+            'employee_id', 'name', 'department', 'position', 'salary', 'email', 'hire_date'))
+        self.assertEqual(again, rows)
+
+    def test_seeded_rows_keep_aggregates_in_sync(self):
+        version = get_version()
+        call_command('seed_employees', '--count', '40', '--batch-size', '7', stdout=io.StringIO())
+        self.assertNotEqual(get_version(), version)
+        stats = EmployeeStats.objects.all()
+        self.assertEqual(sum(s.headcount for s in stats), 40)
+        self.assertEqual(len(search_employees('Smith')), Employee.objects.filter(name__contains='Smith').count())
+
+    def test_benchmark_views_reports_every_view(self):
+        path = os.path.join(tempfile.mkdtemp(), 'views.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        call_command('benchmark_views', '--in-place', '--rows', '10,25', '--requests', '2',
+                     '--output', path, stdout=io.StringIO(), stderr=io.StringIO())
+        with open(path) as f:
+            results = json.load(f)
+        self.assertEqual(results['runs'][0]['rows'], 10)
+        scenario_views = set(results['runs'][0]['views'])
+        self.assertTrue({'employee_list', 'employee_create', 'admin_changelist'} <= scenario_views)
+        for run in results['runs']:
+            for name, view in run['views'].items():
+                self.assertNotIn('error', view, name)
+                self.assertTrue(all(status < 400 for status in view['status']), name)
+                self.assertLessEqual(view['p50_ms'], view['p95_ms'])
+                self.assertGreater(view['peak_memory_kb'], 0)
+        self.assertGreater(results['runs'][0]['views']['employee_create']['queries'], 0)
+
+
+class EmployeeHistoryTests(EmployeesTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(username='admin', email='admin@example.com', password='secret-pass')
+        cls.employees = [make_employee(i, salary=Decimal('1000.00')) for i in range(3)]
+        department('Sales'), position('Lead')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def history_inserts(self, queries):
+        return [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "employee_history"')]
+
+    def test_update_view_records_changed_fields_only(self):
+        employee = self.employees[0]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('employees:employee_update', args=[employee.pk]), {
+                'employee_id': employee.employee_id, 'name': employee.name, 'department': 'Sales',
+                'position': employee.position.name, 'salary': '1200.00', 'email': employee.email,
+                'hire_date': employee.hire_date,
+            })
+        self.assertEqual(len(self.history_inserts(queries)), 1)
+        entry = EmployeeHistory.objects.get(employee=employee)
+        self.assertEqual(entry.action, EmployeeHistory.ACTION_UPDATE)
+        self.assertEqual(entry.get_changes(), {
+            'department': ['Engineering', 'Sales'], 'salary': ['1000.00', '1200.00']
+        })
+        self.assertEqual(entry.salary, Decimal('1200.00'))
+        self.assertEqual(entry.changed_by, self.user)
+
+    def test_unchanged_update_records_nothing(self):
+        employee = self.employees[0]
+        audit.record_update(employee, audit.snapshot(employee), self.user)
+        self.assertFalse(EmployeeHistory.objects.exists())
+
+    def test_delete_view_keeps_history_of_deleted_employee(self):
+        employee = self.employees[1]
+        self.client.post(reverse('employees:employee_delete', args=[employee.pk]))
+        self.assertFalse(Employee.objects.filter(pk=employee.pk).exists())
+        entry = EmployeeHistory.objects.get(employee_id=employee.pk)
+        self.assertEqual(entry.action, EmployeeHistory.ACTION_DELETE)
+        self.assertEqual(entry.employee_code, employee.employee_id)
+        self.assertEqual(entry.get_changes()['salary'], ['1000.00', None])
+
+        response = self.client.get(reverse('employees:employee_history', args=[employee.pk]))
+        self.assertContains(response, 'deleted employee #%d' % employee.pk)
+        self.assertContains(response, employee.email)
+
+    def test_bulk_operations_write_history_with_one_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            bulk_update(Employee.objects.all(), self.user, position=Position.objects.get(name='Lead'),
+                        salary_percent=Decimal('3.333'))
+        self.assertEqual(len(self.history_inserts(queries)), 1)
+        for employee in Employee.objects.all():
+            entry = EmployeeHistory.objects.get(employee=employee)
+            self.assertEqual(entry.salary, employee.salary)
+            self.assertEqual(entry.get_changes()['position'], ['Developer', 'Lead'])
+
+        with CaptureQueriesContext(connection) as queries:
+            bulk_delete(Employee.objects.filter(pk__in=[e.pk for e in self.employees[:2]]), self.user)
+        self.assertEqual(len(self.history_inserts(queries)), 1)
+        self.assertEqual(EmployeeHistory.objects.filter(action=EmployeeHistory.ACTION_DELETE).count(), 2)
+
+    def test_failed_change_records_nothing(self):
+        with self.assertRaises(ZeroDivisionError):
+            with transaction.atomic(), audit.batch():
+                audit.record_delete(self.employees[0], self.user)
+                1 / 0
+        self.assertFalse(EmployeeHistory.objects.exists())
+
+    def test_admin_edits_are_recorded(self):
+        employee = self.employees[2]
+        self.client.post(reverse('admin:employees_employee_change', args=[employee.pk]), {
+            'employee_id': employee.employee_id, 'name': 'Renamed', 'department': employee.department_id,
+            'position': employee.position_id, 'salary': '1000.00', 'email': employee.email,
+            'hire_date': employee.hire_date, 'created_by': self.user.pk, 'updated_by': self.user.pk,
+        })
+        self.assertEqual(EmployeeHistory.objects.get(employee=employee).get_changes(),
+                         {'name': [employee.name, 'Renamed']})
+        self.client.post(reverse('admin:employees_employee_delete', args=[employee.pk]), {'post': 'yes'})
+        self.assertEqual(EmployeeHistory.objects.filter(employee_id=employee.pk).count(), 2)
+
+    def test_history_is_append_only(self):
+        clerk = User.objects.create_user(username='clerk', password='secret-pass')
+        audit.record_delete(self.employees[0], clerk)
+        entry = EmployeeHistory.objects.get()
+        with self.assertRaises(ValueError):
+            entry.save()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            EmployeeHistory.objects.update(salary=Decimal('1.00'))
+        # Deleting the user who made the change is still allowed
+        clerk.delete()
+        self.assertIsNone(EmployeeHistory.objects.get().changed_by)
+
+    def test_timeline_and_salary_history_use_index(self):
+        for queryset in (audit.timeline(self.employees[0].pk)[:51], audit.salary_history(self.employees[0].pk)):
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = ' | '.join(row[-1] for row in cursor.fetchall())
+            self.assertIn('INDEX employee_history_timeline_idx', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_history_view_pages_and_lists_salary_changes(self):
+        employee = self.employees[0]
+        for amount in ('10', '20', '30'):
+            bulk_update(Employee.objects.filter(pk=employee.pk), self.user, salary_amount=Decimal(amount))
+        with mock.patch.object(EmployeeConstants, 'HISTORY_PAGE_SIZE', 2):
+            response = self.client.get(reverse('employees:employee_history', args=[employee.pk]))
+            self.assertEqual(len(response.context['page']), 2)
+            self.assertTrue(response.context['page'].has_next())
+        self.assertEqual([salary for _, salary in response.context['salaries']],
+                         [Decimal('1060.00'), Decimal('1030.00'), Decimal('1010.00')])
+
+
+class EmployeeChangeFeedTests(EmployeesTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='sync', password='secret-pass')
+        cls.employees = [make_employee(i) for i in range(5)]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def feed(self, **params):
+        response = self.client.get(reverse('employees:api_employee_changes'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_through_every_employee_in_change_order(self):
+        first = self.feed(limit=3)
+        self.assertEqual([c['id'] for c in first['results']], [e.pk for e in self.employees[:3]])
+        self.assertTrue(first['has_more'])
+        self.assertEqual(first['results'][0]['employee']['email'], self.employees[0].email)
+        second = self.feed(cursor=first['next_cursor'], limit=3)
+        self.assertEqual([c['id'] for c in second['results']], [e.pk for e in self.employees[3:]])
+        self.assertFalse(second['has_more'])
+        empty = self.feed(cursor=second['next_cursor'])
+        self.assertEqual(empty, {'results': [], 'next_cursor': second['next_cursor'], 'has_more': False})
+
+    def test_changes_and_tombstones_after_cursor(self):
+        cursor = self.feed()['next_cursor']
+        updated, deleted, bulk_deleted = self.employees[1], self.employees[2], self.employees[3]
+        Employee.objects.filter(pk=updated.pk).update(name='Renamed')
+        bulk_update(Employee.objects.filter(pk=updated.pk), self.user, salary_amount=Decimal('5'))
+        self.client.post(reverse('employees:employee_delete', args=[deleted.pk]))
+        bulk_delete(Employee.objects.filter(pk=bulk_deleted.pk))
+
+        data = self.feed(cursor=cursor, fields='name,salary')
+        self.assertEqual([(c['id'], c['action']) for c in data['results']], [
+            (updated.pk, 'upsert'), (deleted.pk, 'delete'), (bulk_deleted.pk, 'delete'),
+        ])
+        self.assertEqual(data['results'][0]['employee'], {'name': 'Renamed', 'salary': '50006.00'})
+        self.assertIsNone(data['results'][1]['employee'])
+        seqs = [c['seq'] for c in data['results']]
+        self.assertEqual(seqs, sorted(seqs))
+        self.assertGreater(seqs[0], int(cursor))
+
+    def test_since_starts_at_a_point_in_time(self):
+        later = timezone.now() + datetime.timedelta(seconds=1)
+        Employee.objects.filter(pk=self.employees[4].pk).update(name='Moved', updated_at=later)
+        data = self.feed(since=later.isoformat())
+        self.assertEqual([c['id'] for c in data['results']], [self.employees[4].pk])
+        self.assertEqual(self.feed(since=(later + datetime.timedelta(days=1)).isoformat())['results'], [])
+
+    def test_invalid_parameters(self):
+        for params in ({'cursor': 'abc'}, {'since': 'yesterday'}, {'limit': 'many'}, {'fields': 'password'}):
+            response = self.client.get(reverse('employees:api_employee_changes'), params)
+            self.assertEqual(response.status_code, 400, params)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('employees:api_employee_changes')).status_code, 401)
+
+    def test_limit_is_bounded(self):
+        with mock.patch.object(EmployeeConstants, 'CHANGE_FEED_PAGE_SIZE', 2):
+            self.assertEqual(len(self.feed(limit=1000)['results']), 2)
+
+    def test_feed_queries_use_indexes(self):
+        def plan(queryset):
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                return ' | '.join(row[-1] for row in cursor.fetchall())
+
+        page = plan(EmployeeChange.objects.filter(seq__gt=3).order_by('seq')
+                    .values('seq', 'employee_id', 'deleted', 'changed_at')[:501])
+        self.assertIn('INTEGER PRIMARY KEY', page)
+        self.assertNotIn('TEMP B-TREE', page)
+        since = plan(EmployeeChange.objects.filter(changed_at__gte=timezone.now()).values_list('seq'))
+        self.assertIn('COVERING INDEX employee_change_time_idx', since)
+
+
+class JobQueueTests(EmployeesTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='hr', password='secret-pass')
+        cls.other = User.objects.create_user(username='other', password='secret-pass')
+        for i in range(5):
+            make_employee(i)
+        department('Ops'), position('Clerk')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        files = override_settings(JOB_FILES_DIR=directory)
+        files.enable()
+        self.addCleanup(files.disable)
+
+    def run_next(self):
+        job = jobs.claim('test')
+        self.assertIsNotNone(job)
+        return jobs.run_job(job)
+
+    def test_claim_takes_each_due_job_once(self):
+        first = jobs.enqueue('rebuild_stats', user=self.user)
+        later = jobs.enqueue('rebuild_stats')
+        Job.objects.filter(pk=later.pk).update(run_after=timezone.now() + datetime.timedelta(hours=1))
+
+        job = jobs.claim('worker-1')
+        self.assertEqual(job.pk, first.pk)
+        self.assertEqual((job.status, job.worker, job.attempts), (Job.STATUS_RUNNING, 'worker-1', 1))
+        self.assertIsNone(jobs.claim('worker-2'))
+
+    def test_export_job_writes_a_downloadable_file(self):
+        make_employee(10, department='Sales')
+        job = jobs.enqueue('export_employees', {'filters': 'department=Sales', 'format': 'csv'}, self.user)
+        job = self.run_next()
+
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED)
+        self.assertEqual((job.progress_done, job.progress_total), (1, 1))
+        response = self.client.get(reverse('employees:job_download', args=[job.pk]))
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row[1] for row in rows[1:]], ['E00010'])
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = jobs.enqueue('export_employees', {'filters': 'hire_date_from=bad'}, max_attempts=2)
+        job = self.run_next()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        self.assertIn('Invalid filters', job.error)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIsNone(jobs.claim('test'))
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        job = self.run_next()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_FAILED, 2))
+
+        self.assertTrue(jobs.retry(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_QUEUED, 0))
+
+    def test_cancel(self):
+        queued = jobs.enqueue('rebuild_stats', user=self.user)
+        response = self.client.post(reverse('employees:job_cancel', args=[queued.pk]))
+        self.assertRedirects(response, reverse('employees:job_detail', args=[queued.pk]))
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.STATUS_CANCELLED)
+
+        # A running job stops at its next progress report
+        running = jobs.enqueue('rebuild_stats')
+        running = jobs.claim('test')
+        self.assertTrue(jobs.cancel(running))
+        self.assertEqual(jobs.run_job(running).status, Job.STATUS_CANCELLED)
+
+    def test_requeue_stale(self):
+        job = jobs.enqueue('rebuild_stats')
+        jobs.claim('dead')
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(jobs.requeue_stale(60), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (Job.STATUS_QUEUED, ''))
+
+    def test_status_page_and_api(self):
+        job = jobs.enqueue('rebuild_stats', user=self.user)
+        response = self.client.get(reverse('employees:job_detail', args=[job.pk]))
+        self.assertContains(response, 'http-equiv="refresh"')
+        response = self.client.get(reverse('employees:api_job_status', args=[job.pk]))
+        self.assertEqual(response.json()['status'], Job.STATUS_QUEUED)
+
+        self.run_next()
+        data = self.client.get(reverse('employees:api_job_status', args=[job.pk])).json()
+        self.assertEqual((data['status'], data['finished']), (Job.STATUS_SUCCEEDED, True))
+        self.assertNotContains(self.client.get(reverse('employees:job_detail', args=[job.pk])), 'http-equiv')
+
+        # Other users cannot see the job
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(reverse('employees:job_detail', args=[job.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('employees:api_job_status', args=[job.pk])).status_code, 404)
+
+    def test_large_import_runs_as_a_job(self):
+        content = EmployeeImportTests.header + ''.join(
+            'J%04d,Person %d,Ops,Clerk,1000,job%d@example.com,2021-03-04\n' % (i, i, i) for i in range(30)
+        )
+        upload = SimpleUploadedFile('staff.csv', content.encode(), content_type='text/csv')
+        with override_settings(JOB_INLINE_IMPORT_MAX_BYTES=100):
+            response = self.client.post(reverse('employees:employee_import'), {'file': upload})
+        job = Job.objects.get(kind='import_employees')
+        self.assertRedirects(response, reverse('employees:job_detail', args=[job.pk]))
+        self.assertFalse(Employee.objects.filter(department__name='Ops').exists())
+
+        job = self.run_next()
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED, job.error)
+        self.assertEqual(job.get_result()['created'], 30)
+        self.assertEqual(Employee.objects.filter(department__name='Ops', created_by=self.user).count(), 30)
+        self.assertEqual(os.listdir(settings.JOB_FILES_DIR), [])
+
+    def test_large_bulk_action_runs_as_a_job(self):
+        with override_settings(JOB_INLINE_BULK_MAX_ROWS=2):
+            response = self.client.post(reverse('employees:employee_bulk_action'), {
+                'action': 'update', 'scope': 'filtered', 'filter-department': 'Engineering',
+                'salary_percent': '10',
+            })
+        job = Job.objects.get(kind='bulk_action')
+        self.assertRedirects(response, reverse('employees:job_detail', args=[job.pk]))
+
+        self.assertEqual(self.run_next().get_result(), {'count': 5})
+        self.assertEqual(Employee.objects.get(employee_id='E00000').salary, Decimal('55000.00'))
+        self.assertEqual(EmployeeHistory.objects.filter(changed_by=self.user).count(), 5)
+
+
+class RunWorkersTests(TransactionTestCase):
+    """``run_workers`` processes spread the queue between them."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='hr', password='secret-pass')
+        make_employee(1)
+
+    @override_settings(SESSION_PRUNE_INTERVAL=0)
+    def test_workers_run_every_job(self):
+        for _ in range(6):
+            jobs.enqueue('rebuild_stats', user=self.user)
+        out = io.StringIO()
+        call_command('run_workers', '--processes', '2', '--burst', stdout=out)
+        self.assertIn('6 jobs run by 2 workers', out.getvalue())
+        self.assertEqual(Job.objects.filter(status=Job.STATUS_SUCCEEDED).count(), 6)
+        self.assertEqual(Job.objects.filter(attempts=1).count(), 6)
+
+
+class AsyncViewTests(EmployeesTestCase):
+    """The read views through the async (ASGI) handler and middleware chain."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='hr', password='secret-pass')
+        cls.employees = [make_employee(n) for n in range(3)]
+
+    def setUp(self):
+        super().setUp()
+        self.async_client.force_login(self.user)
+
+    def query_count(self, response):
+        return int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+
+    async def test_views_are_async(self):
+        for view in (views.employee_list, views.employee_detail, views.employee_search,
+                     api.employee_list, api.employee_detail, api.employee_search, api.employee_changes):
+            self.assertTrue(asyncio.iscoroutinefunction(view), view)
+
+    async def test_list_and_api_through_asgi(self):
+        response = await self.async_client.get(reverse('employees:employee_list'))
+        self.assertContains(response, 'E00002')
+        # Queries run in another thread still count for the request
+        self.assertGreater(self.query_count(response), 0)
+
+        response = await self.async_client.get(reverse('employees:api_employee_detail', args=[self.employees[0].pk]))
+        self.assertEqual(response.json()['employee_id'], 'E00000')
+
+    async def test_export_streams_asynchronously(self):
+        response = await self.async_client.get(reverse('employees:employee_export'), {'format': 'jsonl'})
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(body.splitlines()), 3)
+
+
+class GunicornConfigTests(SimpleTestCase):
+    """The workers started by gunicorn.conf.py share their cache."""
+
+    def load_config(self, **environ):
+        with mock.patch.dict(os.environ):
+            for name in ('CACHE_BACKEND', 'REDIS_URL', 'METRICS_DIR'):
+                os.environ.pop(name, None)
+            os.environ.update(environ)
+            config = runpy.run_path(os.path.join(settings.BASE_DIR, 'gunicorn.conf.py'))
+            self.metrics_dir = os.environ.get('METRICS_DIR')
+            return config, os.environ.get('CACHE_BACKEND')
+
+    def test_several_workers_default_to_a_file_based_cache(self):
+        config, backend = self.load_config(WEB_CONCURRENCY='3')
+        self.assertEqual(config['workers'], 3)
+        self.assertEqual(backend, 'django.core.cache.backends.filebased.FileBasedCache')
+        self.assertEqual(self.load_config(WEB_CONCURRENCY='1')[1], None)
+
+    def test_several_workers_use_redis_when_configured(self):
+        config, backend = self.load_config(WEB_CONCURRENCY='3', REDIS_URL='redis://cache:6379/0')
+        self.assertEqual(backend, None)
+        with mock.patch.dict(os.environ, REDIS_URL='redis://cache:6379/0'):
+            os.environ.pop('CACHE_BACKEND', None)
+            local = runpy.run_path(os.path.join(settings.BASE_DIR, 'hrmanage', 'settings.py'))
+        self.assertEqual(local['CACHES']['default']['BACKEND'], 'django.core.cache.backends.redis.RedisCache')
+        self.assertEqual(local['CACHES']['default']['LOCATION'], 'redis://cache:6379/0')
+        self.assertEqual(local['CACHES']['default']['OPTIONS'], {})
+
+    def test_file_based_cache_keeps_few_entries(self):
+        with mock.patch.dict(os.environ, CACHE_BACKEND='django.core.cache.backends.filebased.FileBasedCache'):
+            for name in ('CACHE_MAX_ENTRIES', 'CACHE_LOCATION'):
+                os.environ.pop(name, None)
+            local = runpy.run_path(os.path.join(settings.BASE_DIR, 'hrmanage', 'settings.py'))
+        self.assertEqual(local['CACHES']['default']['LOCATION'], os.path.join(settings.BASE_DIR, 'cache'))
+        self.assertEqual(local['CACHES']['default']['OPTIONS'], {'MAX_ENTRIES': local['FILE_CACHE_MAX_ENTRIES']})
+
+    def test_several_workers_add_up_their_metrics(self):
+        self.load_config(WEB_CONCURRENCY='3')
+        self.assertEqual(self.metrics_dir, os.path.join(tempfile.gettempdir(), 'hrmanage-metrics'))
+        self.load_config(WEB_CONCURRENCY='1')
+        self.assertIsNone(self.metrics_dir)
+
+    def test_several_workers_refuse_a_local_memory_cache(self):
+        with self.assertRaisesMessage(RuntimeError, '3 workers need a cache they share'):
+            self.load_config(WEB_CONCURRENCY='3', CACHE_BACKEND='django.core.cache.backends.locmem.LocMemCache')
+        self.load_config(WEB_CONCURRENCY='1', CACHE_BACKEND='django.core.cache.backends.locmem.LocMemCache')
+
+
+class OffloadPoolTests(TransactionTestCase):
+    """``run_sync()`` with a thread pool, as in production."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='hr', password='secret-pass')
+        make_employee(1)
+        warm_lookups()
+
+    @override_settings(ASYNC_DB_THREADS=2)
+    def test_pool_runs_views_and_keeps_request_context(self):
+        client = AsyncClient()
+        client.force_login(self.user)
+
+        async def get(path):
+            return await client.get(path)
+
+        response = async_to_sync(get)(reverse('employees:api_employee_list'))
+        self.assertEqual([row['employee_id'] for row in response.json()['results']], ['E00001'])
+
+        def write():
+            Employee.objects.filter(employee_id='E00001').update(name='Renamed')
+            return threading.current_thread().name
+
+        with primary_reads() as state:
+            thread_name = async_to_sync(run_sync)(write)
+        self.assertTrue(thread_name.startswith('hrmanage-db'))
+        self.assertTrue(state.wrote)
+
+
+class EmployeeRowCacheTests(EmployeesTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='hr', password='secret-pass')
+        cls.employees = [make_employee(n) for n in range(3)]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_rows_match_the_per_row_markup(self):
+        response = self.client.get(reverse('employees:employee_list'))
+        employee = self.employees[1]
+        self.assertContains(response, reverse('employees:employee_update_form', args=[employee.pk]))
+        self.assertContains(response, reverse('employees:employee_delete_confirm', args=[employee.pk]))
+        self.assertContains(response, '$50001.00')
+        self.assertContains(response, 'Jan 03, 2020')
+        self.assertEqual(len(cache.get_many([row_key(e) for e in self.employees])), 3)
+
+    def test_cached_rows_are_reused_until_the_employee_changes(self):
+        employee = self.employees[0]
+        first = render_rows([employee])
+        with mock.patch('employees.rendering.get_template') as get_template:
+            self.assertEqual(render_rows([employee]), first)
+        get_template.assert_not_called()
+
+        employee.name = 'Renamed Employee'
+        employee.save()
+        response = self.client.get(reverse('employees:employee_list'))
+        self.assertContains(response, 'Renamed Employee')
+        self.assertNotContains(response, '>Employee 0<')
+
+    @override_settings(CACHE_HAS_CHEAP_SETS=False)
+    def test_rows_of_a_page_are_cached_together_when_sets_are_costly(self):
+        first = render_rows(self.employees)
+        with mock.patch('employees.rendering.get_template') as get_template, \
+                mock.patch.object(cache, 'set_many') as set_many:
+            self.assertEqual(render_rows(self.employees), first)
+        get_template.assert_not_called()
+        set_many.assert_not_called()
+        self.assertEqual(cache.get_many([row_key(e) for e in self.employees]), {})
+
+        self.employees[0].name = 'Renamed Employee'
+        self.employees[0].save()
+        self.assertIn('Renamed Employee', render_rows(self.employees)[0])
+
+    def test_search_results_use_the_row_cache(self):
+        response = self.client.get(reverse('employees:employee_search'), {'q': 'Employee'})
+        self.assertContains(response, reverse('employees:employee_update_form', args=[self.employees[2].pk]))
+
+    def test_benchmark_render_reports_each_strategy(self):
+        out = io.StringIO()
+        call_command('benchmark_render', '--rows', '20', '--repeat', '1', '--json', stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual(set(results['render_ms_per_1000_rows']),
+                         {'per_row_tags', 'fragments_cold', 'fragments_warm'})
+        self.assertEqual(set(results['load_ms']), {'uncached_loader', 'cached_loader'})
+
+
+class LookupTableTests(EmployeesTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(username='admin', email='admin@example.com', password='secret-pass')
+        cls.engineer = make_employee(1)
+        cls.seller = make_employee(2, department='Sales', position='Sales Representative')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_migration_merges_spellings_of_a_name(self):
+        migration = import_module('employees.migrations.0011_department_position')
+        names = migration.canonical_names({'Sales': 5, ' sales ': 1, 'SALES': 2, 'Field  Ops': 1, '': 3})
+        self.assertEqual(names, {
+            'Sales': 'Sales', ' sales ': 'Sales', 'SALES': 'Sales', 'Field  Ops': 'Field Ops', '': 'Unassigned',
+        })
+
+    def test_form_matches_names_ignoring_case_and_spaces(self):
+        data = {
+            'employee_id': 'E09999', 'name': 'New Hire', 'department': '  sales ', 'position': 'DEVELOPER',
+            'salary': '1000.00', 'email': 'new@example.com', 'hire_date': '2022-01-01',
+        }
+        form = EmployeeForm(data)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['department'], self.seller.department)
+        self.assertEqual(form.cleaned_data['position'], self.engineer.position)
+
+        form = EmployeeForm(dict(data, department='Nowhere'))
+        self.assertFalse(form.is_valid())
+        self.assertIn('department', form.errors)
+
+    def test_choices_are_served_from_memory_until_a_write(self):
+        with primary_reads():
+            # Only the token of the tables is read, once per request
+            with self.assertNumQueries(1):
+                self.assertEqual(lookups.departments.choices(), [('Engineering', 'Engineering'), ('Sales', 'Sales')])
+                self.assertEqual(EmployeeForm(instance=self.seller)['department'].value(), 'Sales')
+            department('Legal')
+            with self.assertNumQueries(2):
+                self.assertIn(('Legal', 'Legal'), lookups.departments.choices())
+
+    def test_writes_of_other_processes_show_in_the_next_request(self):
+        data = {
+            'employee_id': 'E09999', 'name': 'New Hire', 'department': 'Legal', 'position': 'Developer',
+            'salary': '1000.00', 'email': 'new@example.com', 'hire_date': '2022-01-01',
+        }
+        with primary_reads():
+            self.assertFalse(EmployeeForm(data).is_valid())
+        # Without the signals of this process, as another worker writes
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO employee_department (name) VALUES ('Legal')")
+        with primary_reads():
+            self.assertTrue(EmployeeForm(data).is_valid())
+
+    def test_rename_shows_in_rows_and_search(self):
+        self.client.get(reverse('employees:employee_list'))
+        # update() sends no signal; the triggers change the token all the same
+        Department.objects.filter(pk=self.engineer.department_id).update(name='Platform Engineering')
+        response = self.client.get(reverse('employees:employee_list'))
+        self.assertContains(response, '<td>Platform Engineering</td>', html=True)
+        self.assertEqual([e.pk for e in search_employees('platform')], [self.engineer.pk])
+
+    def test_admin_filters_list_every_department(self):
+        response = self.client.get(reverse('admin:employees_employee_changelist'),
+                                   {'department__id__exact': self.seller.department_id})
+        self.assertEqual(list(response.context['cl'].result_list), [self.seller])
+        self.assertContains(response, '?department__id__exact=%d' % self.engineer.department_id)
+
+    def test_benchmark_lookups_reports_sizes_and_queries(self):
+        out = io.StringIO()
+        call_command('benchmark_lookups', '--rows', '200', '--repeat', '1', '--json', stdout=out, stderr=io.StringIO())
+        results = json.loads(out.getvalue())
+        self.assertEqual(set(results['sizes']), {'names', 'ids'})
+        self.assertLess(results['sizes']['ids']['index_bytes']['employee_dept_position_idx'],
+                        results['sizes']['names']['index_bytes']['employee_dept_position_idx'])
+        self.assertEqual(set(results['query_ms']['group_by_department_position']), {'names', 'ids'})
+
+
+class SessionAuthTests(EmployeesTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='hr', password='secret-pass')
+        make_employee(1)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def get_list(self):
+        return self.client.get(reverse('employees:employee_list'))
+
+    def test_authenticated_requests_read_session_and_user_from_cache(self):
+        self.get_list()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get_list().status_code, 200)
+        tables = ' '.join(q['sql'] for q in queries.captured_queries)
+        self.assertNotIn('django_session', tables)
+        self.assertNotIn('auth_user', tables)
+
+    def load_settings(self, **environ):
+        with mock.patch.dict(os.environ):
+            for name in ('CACHE_BACKEND', 'REDIS_URL', 'SESSION_ENGINE', 'QUERY_BUDGET_AUTH_QUERIES'):
+                os.environ.pop(name, None)
+            os.environ.update(environ)
+            return runpy.run_path(os.path.join(settings.BASE_DIR, 'hrmanage', 'settings.py'))
+
+    def test_sessions_and_users_are_only_cached_in_a_shared_cache(self):
+        local = self.load_settings()
+        self.assertEqual(local['SESSION_ENGINE'], 'django.contrib.sessions.backends.db')
+        self.assertEqual(local['AUTHENTICATION_BACKENDS'], ['django.contrib.auth.backends.ModelBackend'])
+        shared = self.load_settings(CACHE_BACKEND='django.core.cache.backends.filebased.FileBasedCache')
+        self.assertEqual(shared['SESSION_ENGINE'], 'django.contrib.sessions.backends.cached_db')
+        self.assertEqual(shared['AUTHENTICATION_BACKENDS'], ['employees.backends.CachedModelBackend'])
+
+    def test_logout_in_one_process_ends_the_session_in_the_others(self):
+        local = self.load_settings()
+
+        def process(location):
+            return override_settings(
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': location}},
+                SESSION_ENGINE=local['SESSION_ENGINE'], AUTHENTICATION_BACKENDS=local['AUTHENTICATION_BACKENDS'],
+                QUERY_BUDGET_AUTH_QUERIES=local['QUERY_BUDGET_AUTH_QUERIES'],
+            )
+
+        url = reverse('employees:api_employee_list')
+        with process('worker-a'):
+            self.client.force_login(self.user)
+        with process('worker-b'):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        with process('worker-a'):
+            self.client.post(reverse('employees:logout'))
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        with process('worker-b'):
+            self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_deactivated_user_is_logged_out(self):
+        self.get_list()
+        self.user.is_active = False
+        self.user.save()
+        self.assertRedirects(self.get_list(), '%s?next=%s' % (reverse('employees:login'),
+                                                             reverse('employees:employee_list')))
+
+    def test_password_change_ends_other_sessions(self):
+        self.get_list()
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('new-secret-pass')
+        user.save()
+        self.assertEqual(self.get_list().status_code, 302)
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_login_rehashes_with_configured_iterations(self):
+        self.assertTrue(make_password('x').startswith('pbkdf2_sha256$1000$'))
+        self.client.logout()
+        response = self.client.post(reverse('employees:login'), {'username': 'hr', 'password': 'secret-pass'})
+        self.assertRedirects(response, reverse('employees:employee_list'), fetch_redirect_response=False)
+        self.assertTrue(User.objects.get(pk=self.user.pk).password.startswith('pbkdf2_sha256$1000$'))
+
+    def test_expired_sessions_are_pruned_in_batches(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key='expired%02d' % n, session_data='', expire_date=now - datetime.timedelta(days=1))
+             for n in range(5)]
+            + [Session(session_key='current', session_data='', expire_date=now + datetime.timedelta(days=1))]
+        )
+        batches = []
+        self.assertEqual(prune_expired_sessions(batch_size=2, progress=batches.append), 5)
+        self.assertEqual(batches, [2, 4, 5])
+        self.assertTrue(Session.objects.filter(session_key='current').exists())
+        self.assertFalse(Session.objects.filter(session_key__startswith='expired').exists())
+        self.assertEqual(self.get_list().status_code, 200)
+
+    def test_pruning_job_is_queued_once_per_interval(self):
+        job = jobs.enqueue_periodic('prune_sessions', 3600)
+        self.assertIsNotNone(job)
+        self.assertIsNone(jobs.enqueue_periodic('prune_sessions', 3600))
+        self.assertIsNone(jobs.enqueue_periodic('prune_sessions', 0))
+        job = jobs.run_job(jobs.claim('test'))
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED, job.error)
+        self.assertEqual(job.get_result(), {'deleted': 0})
+
+    def test_benchmark_login_reports_logins_and_auth_overhead(self):
+        out = io.StringIO()
+        call_command('benchmark_login', '--in-place', '--iterations', '1000', '--logins', '2', '--users', '2',
+                     '--requests', '3', '--json', stdout=out, stderr=io.StringIO())
+        results = json.loads(out.getvalue())
+        self.assertEqual([run['iterations'] for run in results['logins']], [1000])
+        self.assertGreater(results['logins'][0]['logins_per_s'], 0)
+        overhead = results['auth_per_request']
+        self.assertEqual(overhead['db']['queries'], 2)
+        self.assertEqual(overhead['cached_db+cached_user']['queries'], 0)
+
+
+class EmployeeAdminChangelistTests(EmployeesTestCase):
+    """The employee changelist must stay index bound and never count the whole table."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(username='admin', email='admin@example.com', password='secret-pass')
+        for i in range(6):
+            make_employee(i, department='Sales' if i % 2 else 'Engineering', created_by=cls.user, updated_by=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def changelist(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:employees_employee_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        counts = [q['sql'] for q in queries.captured_queries
+                  if 'COUNT(' in q['sql'] and 'employees_employee' in q['sql']]
+        return response.context['cl'], counts
+
+    def test_filtered_count_comes_from_summary_table(self):
+        sales = department('Sales')
+        cl, counts = self.changelist(department__id__exact=sales.pk, o='-6')
+        self.assertEqual(cl.result_count, 3)
+        self.assertEqual(len(cl.result_list), 3)
+        self.assertEqual(counts, [])
+
+    def test_other_counts_stop_at_the_limit(self):
+        with override_settings(ADMIN_COUNT_LIMIT=4):
+            cl, counts = self.changelist(q='employee')
+        self.assertEqual(cl.result_count, 4)
+        self.assertIsNone(cl.full_result_count)
+        self.assertEqual(len(counts), 1)
+        self.assertIn('LIMIT 4', counts[0])
+
+        with override_settings(ADMIN_COUNT_LIMIT=0):
+            cl, counts = self.changelist(q='employee')
+        self.assertEqual(cl.result_count, 6)
+
+    def test_ordering_and_users_need_no_extra_queries(self):
+        cl, _ = self.changelist()
+        self.assertEqual(list(cl.result_list), list(Employee.objects.order_by('-created_at', '-pk')))
+        with self.assertNumQueries(0):
+            [(e.created_by.username, e.updated_by.username) for e in cl.result_list]
+        # Ascending sorts only order ties on the id by a temporary B-tree
+        for params in ({}, {'o': '-6'}, {'o': '5'}, {'o': '1'}, {'department__id__exact': department('Sales').pk}):
+            cl, _ = self.changelist(**params)
+            sql, params = cl.queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = ' | '.join(row[-1] for row in cursor.fetchall())
+            self.assertIn('USING INDEX', plan)
+            self.assertNotIn('TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_only_indexed_columns_are_sortable(self):
+        response = self.client.get(reverse('admin:employees_employee_changelist'))
+        sortable = {header['text'] for header in response.context['result_headers'] if header['sortable']}
+        self.assertEqual(sortable, {'employee id', 'salary', 'hire date', 'email'})
+
+    def test_benchmark_admin_compares_configurations(self):
+        out = io.StringIO()
+        call_command('benchmark_admin', '--in-place', '--rows', '20', '--repeat', '1', '--json',
+                     stdout=out, stderr=io.StringIO())
+        results = json.loads(out.getvalue())
+        self.assertEqual(results['rows'], 20)
+        for name, scenario in results['scenarios'].items():
+            self.assertLess(scenario['tuned']['queries'], scenario['stock']['queries'], name)
+
+
+class StaticFilesTests(EmployeesTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        static_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, static_root)
+        collected = override_settings(STATIC_ROOT=static_root)
+        collected.enable()
+        cls.addClassCleanup(collected.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        cls.static_root = static_root
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='hr', password='secret-pass')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def stylesheet_url(self):
+        response = self.client.get(reverse('employees:employee_list'))
+        return re.search(r'href="(/static/hr_app/css/styles\.\w+\.css)"', response.content.decode()).group(1)
+
+    def test_collected_files_are_hashed_and_compressed(self):
+        url = self.stylesheet_url()
+        path = os.path.join(self.static_root, url[len(settings.STATIC_URL):])
+        with open(path, 'rb') as f:
+            content = f.read()
+        with gzip.open(path + '.gz') as f:
+            self.assertEqual(f.read(), content)
+        self.assertTrue(os.path.exists(path + '.br'))
+        self.assertFalse(os.path.exists(re.sub(r'\.png$', '.png.gz', path.replace('css/styles', 'images/HR'))))
+
+    def test_hashed_files_are_served_immutable_in_the_best_encoding(self):
+        url = self.stylesheet_url()
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'max-age=31536000, public, immutable')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertTrue(response['Content-Type'].startswith('text/css'))
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'body', gzip.decompress(response.content))
+        self.assertNotIn('Content-Encoding', self.client.get(url))
+
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    async def asgi_get(self, application, path, headers=()):
+        """Status, headers and body of a GET request sent to an ASGI application."""
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'testserver')] + list(headers),
+            'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+        }
+        communicator = ApplicationCommunicator(application, scope)
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        start = await communicator.receive_output(5)
+        body = b''
+        while True:
+            message = await communicator.receive_output(5)
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        await communicator.wait()
+        return start['status'], {name.decode().lower(): value.decode() for name, value in start['headers']}, body
+
+    @override_settings(DEBUG=False)
+    async def test_asgi_application_serves_hashed_files_immutable(self):
+        # What the image runs: DJANGO_DEBUG=0 and the files collected
+        application = runpy.run_path(os.path.join(settings.BASE_DIR, 'hrmanage', 'asgi.py'))['application']
+        status, _, body = await self.asgi_get(application, reverse('employees:login'))
+        self.assertEqual(status, 200)
+        url = re.search(r'href="(/static/hr_app/css/styles\.[0-9a-f]{12}\.css)"', body.decode()).group(1)
+
+        status, headers, body = await self.asgi_get(application, url, [(b'accept-encoding', b'gzip')])
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['cache-control'], 'max-age=31536000, public, immutable')
+        self.assertEqual(headers['content-encoding'], 'gzip')
+        self.assertIn(b'body', gzip.decompress(body))
+
+    def test_other_requests_pass_through(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/static/hr_app/css/styles.css')
+        self.assertEqual(response['Cache-Control'], 'max-age=%d, public' % settings.STATIC_MAX_AGE)
+        self.assertEqual(self.client.post('/static/hr_app/css/styles.css').status_code, 405)
+        self.assertEqual(self.client.get('/static/hr_app/missing.css').status_code, 404)
+        self.assertEqual(self.client.get(reverse('employees:employee_list')).status_code, 200)
+
+    def test_uncollected_files_are_linked_by_name(self):
+        with override_settings(STATIC_ROOT=tempfile.mkdtemp()):
+            self.addCleanup(shutil.rmtree, settings.STATIC_ROOT)
+            response = self.client.get(reverse('employees:employee_list'))
+        self.assertContains(response, 'href="/static/hr_app/css/styles.css"')
+
+    def test_benchmark_static_reports_no_revalidation_on_repeat_loads(self):
+        out = io.StringIO()
+        call_command('benchmark_static', '--in-place', '--loads', '2', '--json', stdout=out, stderr=io.StringIO())
+        results = json.loads(out.getvalue())
+        self.assertEqual(results['runserver']['repeat']['revalidated'], results['runserver']['first']['assets'])
+        self.assertEqual(results['collected']['repeat']['requests'], 0)
+        self.assertLess(results['collected']['first']['bytes'], results['runserver']['first']['bytes'])
+
+
+class PayrollTests(EmployeesTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.veteran = make_employee(1, salary=Decimal('120000.00'), hire_date=datetime.date(2010, 6, 30))
+        cls.mid_month = make_employee(2, salary=Decimal('61234.57'), hire_date=datetime.date(2024, 6, 17),
+                                      department='Sales', position='Sales Representative')
+        cls.anniversary = make_employee(3, salary=Decimal('50000.06'), hire_date=datetime.date(2019, 7, 1))
+        cls.future = make_employee(4, hire_date=datetime.date(2024, 7, 1))
+
+    def test_engine_matches_decimal_reference(self):
+        rng = random.Random(7)
+        salaries = [rng.randrange(100, 10 ** 9) for _ in range(3000)]
+        salaries += [12 * n + 6 for n in range(1, 500)]  # exact half cents after / 12
+        periods = [datetime.date(2024, 2, 1), datetime.date(2023, 2, 1), datetime.date(2024, 12, 1)]
+        for period in periods:
+            last = payroll.month_bounds(period)[1]
+            hire_dates = [last - datetime.timedelta(days=rng.randrange(0, 6000)) for _ in salaries]
+            hire_dates[:5] = [datetime.date(2020, 2, 29), datetime.date(2014, 2, 28), last, period,
+                              period.replace(year=period.year - 10)]
+            pay = payroll.compute_chunk(np.array(salaries, dtype=np.int64),
+                                        np.array(hire_dates, dtype='datetime64[D]'), period)
+            for n, (salary, hire_date) in enumerate(zip(salaries, hire_dates)):
+                expected = payroll.decimal_entry(Decimal(salary) / 100, hire_date, period)
+                self.assertEqual(pay['days_paid'][n], expected['days_paid'])
+                for field in ('gross', 'prorated', 'bonus', 'total'):
+                    self.assertEqual(payroll.cents(pay[field][n]), expected[field], (field, salary, hire_date))
+
+    def test_run_stores_entries_and_department_totals(self):
+        run = payroll.run_payroll(datetime.date(2024, 6, 5), chunk_size=2)
+        self.assertEqual(run.period, datetime.date(2024, 6, 1))
+        entries = {entry.employee_id: entry for entry in run.entries.all()}
+        self.assertEqual(set(entries), {self.veteran.pk, self.mid_month.pk, self.anniversary.pk})
+        for employee in (self.veteran, self.mid_month, self.anniversary):
+            expected = payroll.decimal_entry(employee.salary, employee.hire_date, run.period)
+            entry = entries[employee.pk]
+            self.assertEqual((entry.days_paid, entry.gross, entry.prorated, entry.bonus, entry.total),
+                             tuple(expected[field] for field in ('days_paid', 'gross', 'prorated', 'bonus', 'total')))
+        self.assertEqual(entries[self.veteran.pk].bonus, Decimal('500.00'))
+        self.assertEqual(entries[self.mid_month.pk].days_paid, 14)
+        self.assertEqual(entries[self.anniversary.pk].bonus, Decimal('41.67'))  # 4 full years at the end of June
+
+        self.assertEqual(run.employee_count, 3)
+        self.assertEqual(run.total, sum(entry.total for entry in entries.values()))
+        self.assertEqual(run.salary_total + run.bonus_total, run.total)
+        totals = {row.department.name: row for row in run.department_totals.select_related('department')}
+        self.assertEqual(totals['Sales'].employee_count, 1)
+        self.assertEqual(totals['Sales'].total, entries[self.mid_month.pk].total)
+        self.assertEqual(totals['Engineering'].total,
+                         entries[self.veteran.pk].total + entries[self.anniversary.pk].total)
+
+    def test_a_month_is_run_once_unless_replaced(self):
+        first = payroll.run_payroll(datetime.date(2024, 6, 1))
+        with self.assertRaises(ValueError):
+            payroll.run_payroll(datetime.date(2024, 6, 30))
+        second = payroll.run_payroll(datetime.date(2024, 6, 1), replace=True)
+        self.assertFalse(PayrollEntry.objects.filter(run_id=first.pk).exists())
+        self.assertEqual(second.entries.count(), 3)
+
+        PayrollRun.objects.filter(pk=second.pk).update(finished_at=None)
+        third = payroll.run_payroll(datetime.date(2024, 6, 1))
+        self.assertEqual(list(PayrollRun.objects.values_list('pk', flat=True)), [third.pk])
+
+    def test_command_and_job(self):
+        out = io.StringIO()
+        call_command('run_payroll', '2024-06', '--json', stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual(results['employees'], 3)
+        self.assertEqual(Decimal(results['total']), PayrollRun.objects.get().total)
+        self.assertEqual([row['department'] for row in results['departments']], ['Engineering', 'Sales'])
+        with self.assertRaises(CommandError):
+            call_command('run_payroll', '2024-06', stdout=io.StringIO())
+
+        jobs.enqueue('run_payroll', {'period': '2024-07'})
+        job = jobs.run_job(jobs.claim('test'))
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED, job.error)
+        self.assertEqual(job.get_result()['employees'], 4)
+
+    def test_benchmark_payroll_checks_every_entry(self):
+        out = io.StringIO()
+        call_command('benchmark_payroll', '--in-place', '--period', '2024-06', '--chunk-size', '2', '--json',
+                     stdout=out, stderr=io.StringIO())
+        results = json.loads(out.getvalue())
+        self.assertEqual(results['mismatches'], 0)
+        for name in ('decimal', 'numpy', 'run_payroll'):
+            self.assertEqual(results[name]['employees'], 3)
@@ -1,6 +1,6 @@
 from django.urls import path
 from django.contrib.auth.views import LogoutView  # Add this import
-from . import views
+from . import api, views
 
 app_name = 'employees'
 
@@ -9,11 +9,30 @@ urlpatterns = [
     path('login/', views.CustomLoginView.as_view(), name='login'),
     path('signup/', views.signup, name='signup'),
     path('logout/', LogoutView.as_view(next_page='employees:login'), name='logout'),  # Fixed this line
+    path('search/', views.employee_search, name='employee_search'),
     path('create/', views.employee_create_form, name='employee_create_form'),
     path('create/submit/', views.employee_create, name='employee_create'),
+    path('import/', views.employee_import, name='employee_import'),
+    path('export/', views.employee_export, name='employee_export'),
+    path('export/background/', views.employee_export_background, name='employee_export_background'),
+    path('bulk/', views.employee_bulk_action, name='employee_bulk_action'),
+    path('analytics/', views.employee_analytics, name='employee_analytics'),
+    path('analytics/rebuild/', views.employee_analytics_rebuild, name='employee_analytics_rebuild'),
+    path('cache-stats/', views.employee_cache_stats, name='employee_cache_stats'),
+    path('metrics/', views.metrics, name='metrics'),
     path('<int:pk>/', views.employee_detail, name='employee_detail'),
     path('<int:pk>/edit/', views.employee_update_form, name='employee_update_form'),
     path('<int:pk>/edit/submit/', views.employee_update, name='employee_update'),
     path('<int:pk>/delete/', views.employee_delete_confirm, name='employee_delete_confirm'),
     path('<int:pk>/delete/submit/', views.employee_delete, name='employee_delete'),
+    path('<int:pk>/history/', views.employee_history, name='employee_history'),
+    path('jobs/<int:pk>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:pk>/cancel/', views.job_cancel, name='job_cancel'),
+    path('jobs/<int:pk>/retry/', views.job_retry, name='job_retry'),
+    path('jobs/<int:pk>/download/', views.job_download, name='job_download'),
+    path('api/employees/', api.employee_list, name='api_employee_list'),
+    path('api/employees/search/', api.employee_search, name='api_employee_search'),
+    path('api/employees/changes/', api.employee_changes, name='api_employee_changes'),
+    path('api/employees/<int:pk>/', api.employee_detail, name='api_employee_detail'),
+    path('api/jobs/<int:pk>/', api.job_status, name='api_job_status'),
 ]
\ No newline at end of file
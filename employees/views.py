@@ -1,17 +1,38 @@
 from django.contrib.auth.views import LoginView
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.http import require_http_methods, require_POST, require_GET
-from django.db import transaction
-from django.urls import reverse_lazy
+from django.db import IntegrityError, transaction
+from django.urls import reverse, reverse_lazy
+from django import forms
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIRequest
 from .models import Employee, UserProfile
-from .forms import EmployeeForm, SignUpForm
+from .forms import EmployeeForm, SignUpForm, EmployeeFilterForm, EmployeeUploadForm, BulkActionForm, BulkUpdateForm
+from .bulk import bulk_delete, bulk_update
+from . import analytics, audit, jobs, lookups
+from .importers import EmployeeImporter, detect_format, iter_rows
+from .exporters import EXPORT_FORMATS, iter_employee_rows, iter_encoded, iter_export
+from .constants import EmployeeConstants
+from .pagination import KeysetPaginator, InvalidCursor
+from .search import search_employees
+from .profiles import get_user_profile
+from .caching import cache_stats, cached, etag_for, get_last_modified, get_version
+from .routers import read_alias
+from .metrics import query_budget, registry
+from .offload import aiter_sync, async_view
+from .rendering import render_rows
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+@query_budget(4)
 def signup(request):
     """View to handle user signup."""
     if request.user.is_authenticated:
@@ -37,6 +58,13 @@ def signup(request):
                     
                     messages.success(request, 'Account created successfully. Please login.')
                     return redirect('employees:login')
+            except IntegrityError as e:
+                # Username or employee ID taken between validation and insert
+                message = form.integrity_error_message(e)
+                if message is None:
+                    logger.error(f"Error in signup: {str(e)}")
+                    message = 'Error creating account. Please try again.'
+                messages.error(request, message)
             except Exception as e:
                 logger.error(f"Error in signup: {str(e)}")
                 messages.error(request, 'Error creating account. Please try again.')
@@ -51,40 +79,60 @@ def signup(request):
 class CustomLoginView(LoginView):
     template_name = 'employees/login.html'
     redirect_authenticated_user = True
+    # One more than usual on the first login after PASSWORD_HASH_ITERATIONS changed (the rehash)
+    query_budget = 8
 
     def get_success_url(self):
         return reverse_lazy('employees:employee_list')
 
     def form_valid(self, form):
         response = super().form_valid(form)
-        try:
-            UserProfile.objects.get(user=self.request.user)
-        except UserProfile.DoesNotExist:
-            # Create a default UserProfile for the user
-            UserProfile.objects.create(
-                user=self.request.user,
-                name=self.request.user.username,
-                emp_id=f"EMP{self.request.user.id:03d}"
-            )
+        # Make sure the user has a profile (created with defaults if missing)
+        get_user_profile(self.request.user)
         return response
 
+def _has_pending_messages(request):
+    """Whether a flash message waits to be shown; a 304 would drop it, so such a page is never validated."""
+    return len(messages.get_messages(request)) > 0
+
+def _list_etag(request):
+    if _has_pending_messages(request):
+        return None
+    return etag_for(request, get_version())
+
+def _list_last_modified(request):
+    if _has_pending_messages(request):
+        return None
+    return get_last_modified()
+
+@query_budget(6)
+@async_view
 @login_required
+@condition(etag_func=_list_etag, last_modified_func=_list_last_modified)
+@cache_control(private=True, no_cache=True)
 def employee_list(request):
-    """View to display list of employees."""
+    """View to display a keyset-paginated, filterable list of employees."""
     try:
-        employees = Employee.objects.all().order_by('-created_at')
+        filter_form = EmployeeFilterForm(request.GET)
+        querystring = filter_form.querystring()
+        paginator = KeysetPaginator(
+            filter_form.filter_queryset(Employee.objects.all()),
+            ordering=filter_form.get_sort(),
+            page_size=EmployeeConstants.LIST_PAGE_SIZE
+        )
+        cursor = request.GET.get('cursor')
         try:
-            user_profile = UserProfile.objects.get(user=request.user)
-        except UserProfile.DoesNotExist:
-            user_profile = UserProfile.objects.create(
-                user=request.user,
-                name=request.user.username,
-                emp_id=f"EMP{request.user.id:03d}"
-            )
-        
+            page = cached(('list', querystring, cursor), lambda: paginator.get_page(cursor))
+        except InvalidCursor:
+            messages.error(request, EmployeeConstants.MSG_INVALID_CURSOR)
+            page = cached(('list', querystring, None), paginator.get_page)
         context = {
-            'employees': employees,
-            'user_profile': user_profile
+            'employees': page,
+            'rows': render_rows(page),
+            'page': page,
+            'filter_form': filter_form,
+            'querystring': querystring,
+            'user_profile': request.user_profile
         }
         return render(request, 'employees/employee_list.html', context)
     except Exception as e:
@@ -92,37 +140,133 @@ def employee_list(request):
         messages.error(request, 'Error fetching employee list.')
         return redirect('employees:login')
 
+@query_budget(6)
+@async_view
+@login_required
+@require_GET
+def employee_search(request):
+    """View to display ranked full-text search results."""
+    try:
+        query = request.GET.get('q', '').strip()
+        if not query:
+            return redirect('employees:employee_list')
+        employees = search_employees(query, limit=EmployeeConstants.LIST_PAGE_SIZE)
+        return render(request, 'employees/employee_list.html', {
+            'employees': employees,
+            'rows': render_rows(employees),
+            'query': query,
+            'filter_form': EmployeeFilterForm(),
+            'user_profile': request.user_profile
+        })
+    except Exception as e:
+        logger.error(f"Error searching employees: {str(e)}")
+        messages.error(request, EmployeeConstants.MSG_SEARCH_ERROR)
+        return redirect('employees:employee_list')
+
+@query_budget(2)
+@login_required
+@require_GET
+def employee_export(request):
+    """View to stream the (filtered) employee roster as CSV or JSONL."""
+    fmt = request.GET.get('format', 'csv')
+    filter_form = EmployeeFilterForm(request.GET)
+    if fmt not in EXPORT_FORMATS or not filter_form.is_valid():
+        return HttpResponseBadRequest(EmployeeConstants.MSG_EXPORT_INVALID)
+
+    compress = request.GET.get('gzip') in ('1', 'true', 'yes')
+    content_type, extension = EXPORT_FORMATS[fmt]
+    filename = 'employees.%s' % extension
+    # Rows are read after the view returns, outside of the request's routing
+    rows = iter_employee_rows(filter_form.filter_queryset(Employee.objects.using(read_alias())))
+    chunks = iter_encoded(iter_export(fmt, rows), compress=compress)
+    if isinstance(request, ASGIRequest):
+        # An ASGI server would otherwise read the whole export into memory first
+        chunks = aiter_sync(chunks)
+    response = StreamingHttpResponse(
+        chunks,
+        content_type='application/gzip' if compress else content_type + '; charset=utf-8'
+    )
+    if compress:
+        filename += '.gz'
+    response['Content-Disposition'] = 'attachment; filename="%s"' % filename
+    return response
+
+@query_budget(5)
+@login_required
+@require_POST
+def employee_export_background(request):
+    """View to export the (filtered) roster to a file in a background job."""
+    fmt = request.GET.get('format', 'csv')
+    filter_form = EmployeeFilterForm(request.GET)
+    if fmt not in EXPORT_FORMATS or not filter_form.is_valid():
+        return HttpResponseBadRequest(EmployeeConstants.MSG_EXPORT_INVALID)
+    job = jobs.enqueue('export_employees', {
+        'filters': filter_form.querystring(),
+        'format': fmt,
+        'compress': request.GET.get('gzip') in ('1', 'true', 'yes'),
+    }, request.user)
+    messages.success(request, EmployeeConstants.MSG_JOB_QUEUED)
+    return redirect('employees:job_detail', job.pk)
+
+def _get_cached_employee(request, pk):
+    """Return employee ``pk`` from the versioned cache, memoized on the request."""
+    memo = request.__dict__.setdefault('_employee_cache', {})
+    if pk not in memo:
+        memo[pk] = cached(('employee', pk), lambda: Employee.objects.filter(pk=pk).first())
+    return memo[pk]
+
+def _detail_etag(request, pk):
+    if _has_pending_messages(request):
+        return None
+    employee = _get_cached_employee(request, pk)
+    if employee is None:
+        return None
+    return etag_for(request, employee.pk, employee.updated_at.isoformat())
+
+def _detail_last_modified(request, pk):
+    if _has_pending_messages(request):
+        return None
+    employee = _get_cached_employee(request, pk)
+    return employee.updated_at if employee else None
+
+@query_budget(6)
+@async_view
 @login_required
+@condition(etag_func=_detail_etag, last_modified_func=_detail_last_modified)
+@cache_control(private=True, no_cache=True)
 def employee_detail(request, pk):
     """View to display detailed employee information."""
     try:
-        employee = get_object_or_404(Employee, pk=pk)
-        user_profile = get_object_or_404(UserProfile, user=request.user)
+        employee = _get_cached_employee(request, pk)
+        if employee is None:
+            raise Http404(EmployeeConstants.MSG_NOT_FOUND)
+        lookups.with_lookups([employee])
         return render(request, 'employees/employee_detail.html', {
             'employee': employee,
-            'user_profile': user_profile
+            'user_profile': request.user_profile
         })
     except Exception as e:
         logger.error(f"Error displaying employee details: {str(e)}")
         messages.error(request, 'Error displaying employee details.')
         return redirect('employees:employee_list')
 
+@query_budget(5)
 @login_required
 def employee_create_form(request):
     """View to display employee creation form."""
     try:
         form = EmployeeForm()
-        user_profile = get_object_or_404(UserProfile, user=request.user)
         return render(request, 'employees/employee_form.html', {
             'form': form,
             'action': 'Add',
-            'user_profile': user_profile
+            'user_profile': request.user_profile
         })
     except Exception as e:
         logger.error(f"Error displaying create form: {str(e)}")
         messages.error(request, 'Error displaying create form.')
         return redirect('employees:employee_list')
 
+@query_budget(5)
 @login_required
 @require_POST
 def employee_create(request):
@@ -130,95 +274,335 @@ def employee_create(request):
     try:
         form = EmployeeForm(request.POST)
         if form.is_valid():
-            with transaction.atomic():
-                employee = form.save(commit=False)
-                employee.created_by = request.user
-                employee.save()
+            try:
+                with transaction.atomic():
+                    employee = form.save(commit=False)
+                    employee.created_by = request.user
+                    employee.save()
+            except IntegrityError as e:
+                # A concurrent request took the employee_id or email
+                if not form.add_integrity_error(e):
+                    raise
+            else:
                 messages.success(request, 'Employee created successfully.')
                 return redirect('employees:employee_list')
-        else:
-            user_profile = get_object_or_404(UserProfile, user=request.user)
-            return render(request, 'employees/employee_form.html', {
-                'form': form,
-                'action': 'Add',
-                'user_profile': user_profile
-            })
+        return render(request, 'employees/employee_form.html', {
+            'form': form,
+            'action': 'Add',
+            'user_profile': request.user_profile
+        })
     except Exception as e:
         logger.error(f"Error creating employee: {str(e)}")
         messages.error(request, 'Error creating employee.')
         return redirect('employees:employee_list')
 
+@query_budget(6)
+@login_required
+@require_http_methods(['GET', 'POST'])
+def employee_import(request):
+    """View to bulk import employees from an uploaded CSV or JSONL file."""
+    try:
+        result = None
+        if request.method == 'POST':
+            form = EmployeeUploadForm(request.POST, request.FILES)
+            if form.is_valid():
+                upload = form.cleaned_data['file']
+                fmt = form.cleaned_data['format'] or detect_format(upload.name)
+                if upload.size > settings.JOB_INLINE_IMPORT_MAX_BYTES:
+                    # Too long for a request: saved, then imported by a worker
+                    path = jobs.job_file_path(upload.name)
+                    with open(path, 'wb') as saved:
+                        for chunk in upload.chunks():
+                            saved.write(chunk)
+                    job = jobs.enqueue('import_employees', {
+                        'path': path, 'format': fmt, 'user_id': request.user.pk
+                    }, request.user)
+                    messages.success(request, EmployeeConstants.MSG_JOB_QUEUED)
+                    return redirect('employees:job_detail', job.pk)
+                importer = EmployeeImporter(user=request.user)
+                upload.seek(0)
+                result = importer.run(iter_rows(upload.file, fmt))
+                if result.created:
+                    messages.success(request, EmployeeConstants.MSG_IMPORT_SUCCESS % result.created)
+                if result.rejected:
+                    messages.error(request, EmployeeConstants.MSG_IMPORT_REJECTED % result.rejected)
+        else:
+            form = EmployeeUploadForm()
+        return render(request, EmployeeConstants.TEMPLATE_IMPORT, {
+            'form': form,
+            'result': result,
+            'user_profile': request.user_profile
+        })
+    except Exception as e:
+        logger.error(f"Error importing employees: {str(e)}")
+        messages.error(request, EmployeeConstants.MSG_IMPORT_ERROR)
+        return redirect('employees:employee_list')
+
+@query_budget(6)
 @login_required
 def employee_update_form(request, pk):
     """View to display employee update form."""
     try:
         employee = get_object_or_404(Employee, pk=pk)
         form = EmployeeForm(instance=employee)
-        user_profile = get_object_or_404(UserProfile, user=request.user)
         return render(request, 'employees/employee_form.html', {
             'form': form,
             'employee': employee,
             'action': 'Update',
-            'user_profile': user_profile
+            'user_profile': request.user_profile
         })
     except Exception as e:
         logger.error(f"Error displaying update form: {str(e)}")
         messages.error(request, 'Error displaying update form.')
         return redirect('employees:employee_list')
 
+@query_budget(7)
 @login_required
 @require_POST
 def employee_update(request, pk):
     """View to handle employee update."""
     try:
         employee = get_object_or_404(Employee, pk=pk)
+        # Validating the form updates the instance
+        before = audit.snapshot(employee)
         form = EmployeeForm(request.POST, instance=employee)
         if form.is_valid():
-            with transaction.atomic():
-                employee = form.save(commit=False)
-                employee.updated_by = request.user
-                employee.save()
+            try:
+                with transaction.atomic(), audit.batch():
+                    employee = form.save(commit=False)
+                    employee.updated_by = request.user
+                    employee.save()
+                    audit.record_update(employee, before, request.user)
+            except IntegrityError as e:
+                # A concurrent request took the employee_id or email
+                if not form.add_integrity_error(e):
+                    raise
+            else:
                 messages.success(request, 'Employee updated successfully.')
                 return redirect('employees:employee_list')
-        else:
-            user_profile = get_object_or_404(UserProfile, user=request.user)
-            return render(request, 'employees/employee_form.html', {
-                'form': form,
-                'employee': employee,
-                'action': 'Update',
-                'user_profile': user_profile
-            })
+        return render(request, 'employees/employee_form.html', {
+            'form': form,
+            'employee': employee,
+            'action': 'Update',
+            'user_profile': request.user_profile
+        })
     except Exception as e:
         logger.error(f"Error updating employee: {str(e)}")
         messages.error(request, 'Error updating employee.')
         return redirect('employees:employee_list')
 
+@query_budget(7)
+@login_required
+@require_POST
+def employee_bulk_action(request):
+    """View to update or delete many employees with a single statement."""
+    filter_form = EmployeeFilterForm(request.POST, prefix='filter')
+    list_url = reverse('employees:employee_list')
+    if filter_form.is_valid() and filter_form.querystring():
+        list_url += '?' + filter_form.querystring()
+    try:
+        form = BulkActionForm(request.POST)
+        if not form.is_valid():
+            for error in form.errors.values():
+                messages.error(request, error)
+            return redirect(list_url)
+        queryset = form.get_queryset(filter_form)
+        if (form.cleaned_data['scope'] == BulkActionForm.SCOPE_FILTERED
+                and queryset.count() > settings.JOB_INLINE_BULK_MAX_ROWS):
+            job = jobs.enqueue('bulk_action', {
+                'action': form.cleaned_data['action'],
+                'filters': filter_form.querystring(),
+                # As posted: the worker validates them again when the job runs
+                'changes': {f: form.data.get(f, '') for f in BulkUpdateForm.base_fields},
+                'user_id': request.user.pk,
+            }, request.user)
+            messages.success(request, EmployeeConstants.MSG_JOB_QUEUED)
+            return redirect('employees:job_detail', job.pk)
+        if form.cleaned_data['action'] == BulkActionForm.ACTION_DELETE:
+            count = bulk_delete(queryset, request.user)
+            messages.success(request, EmployeeConstants.MSG_BULK_DELETE_SUCCESS % count)
+        else:
+            count = bulk_update(
+                queryset,
+                request.user,
+                department=form.cleaned_data['department'],
+                position=form.cleaned_data['position'],
+                salary_percent=form.cleaned_data['salary_percent'],
+                salary_amount=form.cleaned_data['salary_amount']
+            )
+            messages.success(request, EmployeeConstants.MSG_BULK_UPDATE_SUCCESS % count)
+    except forms.ValidationError as e:
+        messages.error(request, ' '.join(e.messages))
+    except Exception as e:
+        logger.error(f"Error in bulk action: {str(e)}")
+        messages.error(request, EmployeeConstants.MSG_BULK_ERROR)
+    return redirect(list_url)
+
+@query_budget(6)
 @login_required
 def employee_delete_confirm(request, pk):
     """View to display delete confirmation page."""
     try:
         employee = get_object_or_404(Employee, pk=pk)
-        user_profile = get_object_or_404(UserProfile, user=request.user)
         return render(request, 'employees/employee_confirm_delete.html', {
             'employee': employee,
-            'user_profile': user_profile
+            'user_profile': request.user_profile
         })
     except Exception as e:
         logger.error(f"Error displaying delete confirmation: {str(e)}")
         messages.error(request, 'Error displaying delete confirmation.')
         return redirect('employees:employee_list')
 
+@query_budget(6)
 @login_required
 @require_POST
 def employee_delete(request, pk):
     """View to handle employee deletion."""
     try:
         employee = get_object_or_404(Employee, pk=pk)
-        with transaction.atomic():
+        with transaction.atomic(), audit.batch():
+            audit.record_delete(employee, request.user)
             employee.delete()
             messages.success(request, 'Employee deleted successfully.')
             return redirect('employees:employee_list')
     except Exception as e:
         logger.error(f"Error deleting employee: {str(e)}")
         messages.error(request, 'Error deleting employee.')
-        return redirect('employees:employee_list')
\ No newline at end of file
+        return redirect('employees:employee_list')
+
+@query_budget(8)
+@login_required
+@require_GET
+def employee_history(request, pk):
+    """View to display the change history of an employee, including a deleted one."""
+    try:
+        employee = Employee.objects.filter(pk=pk).first()
+        paginator = KeysetPaginator(
+            audit.timeline(pk),
+            ordering='-changed_at',
+            page_size=EmployeeConstants.HISTORY_PAGE_SIZE
+        )
+        cursor = request.GET.get('cursor')
+        try:
+            page = paginator.get_page(cursor)
+        except InvalidCursor:
+            messages.error(request, EmployeeConstants.MSG_INVALID_CURSOR)
+            page = paginator.get_page()
+        if employee is None and not page.object_list:
+            raise Http404(EmployeeConstants.MSG_NOT_FOUND)
+        return render(request, EmployeeConstants.TEMPLATE_HISTORY, {
+            'employee': employee,
+            'employee_pk': pk,
+            'page': page,
+            'salaries': audit.salary_history(pk)[:EmployeeConstants.SALARY_HISTORY_LIMIT],
+            'user_profile': request.user_profile
+        })
+    except Exception as e:
+        logger.error(f"Error displaying employee history: {str(e)}")
+        messages.error(request, EmployeeConstants.MSG_HISTORY_ERROR)
+        return redirect('employees:employee_list')
+
+@query_budget(9)
+@login_required
+@require_GET
+def employee_analytics(request):
+    """View to display headcount, salary and hiring analytics."""
+    try:
+        stats = analytics.fresh_stats()
+        departments = analytics.department_summary(stats)
+        return render(request, EmployeeConstants.TEMPLATE_ANALYTICS, {
+            'departments': departments,
+            'positions': analytics.position_summary(stats),
+            'hiring': analytics.hiring_trend(),
+            'total_headcount': sum(d['headcount'] for d in departments),
+            'user_profile': request.user_profile
+        })
+    except Exception as e:
+        logger.error(f"Error displaying analytics: {str(e)}")
+        messages.error(request, EmployeeConstants.MSG_ANALYTICS_ERROR)
+        return redirect('employees:employee_list')
+
+@query_budget(5)
+@login_required
+@require_POST
+def employee_analytics_rebuild(request):
+    """View to rebuild the analytics summary tables in a background job (staff only)."""
+    if not request.user.is_staff:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    job = jobs.enqueue('rebuild_stats', user=request.user)
+    messages.success(request, EmployeeConstants.MSG_JOB_QUEUED)
+    return redirect('employees:job_detail', job.pk)
+
+def _get_job(request, pk):
+    """Return job ``pk`` if the user may see it (their own, or any for staff)."""
+    return get_object_or_404(jobs.for_user(request.user), pk=pk)
+
+@query_budget(6)
+@login_required
+@require_GET
+def job_detail(request, pk):
+    """View to display the status and progress of a background job."""
+    job = _get_job(request, pk)
+    return render(request, EmployeeConstants.TEMPLATE_JOB, {
+        'job': job,
+        'result': job.get_result(),
+        'has_file': jobs.result_file(job) is not None,
+        'refresh_seconds': EmployeeConstants.JOB_REFRESH_SECONDS,
+        'user_profile': request.user_profile
+    })
+
+@query_budget(6)
+@login_required
+@require_POST
+def job_cancel(request, pk):
+    """View to cancel a queued or running background job."""
+    job = _get_job(request, pk)
+    if jobs.cancel(job):
+        messages.success(request, EmployeeConstants.MSG_JOB_CANCELLED)
+    else:
+        messages.error(request, EmployeeConstants.MSG_JOB_NOT_CANCELLABLE)
+    return redirect('employees:job_detail', job.pk)
+
+@query_budget(6)
+@login_required
+@require_POST
+def job_retry(request, pk):
+    """View to queue a failed or cancelled background job again."""
+    job = _get_job(request, pk)
+    if jobs.retry(job):
+        messages.success(request, EmployeeConstants.MSG_JOB_QUEUED)
+    else:
+        messages.error(request, EmployeeConstants.MSG_JOB_NOT_RETRYABLE)
+    return redirect('employees:job_detail', job.pk)
+
+@query_budget(5)
+@login_required
+@require_GET
+def job_download(request, pk):
+    """View to download the file written by a background export."""
+    job = _get_job(request, pk)
+    path = jobs.result_file(job)
+    if path is None:
+        raise Http404(EmployeeConstants.MSG_JOB_NO_FILE)
+    filename = job.get_result().get('filename', os.path.basename(path))
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=filename)
+
+@query_budget(2)
+@login_required
+@require_GET
+def employee_cache_stats(request):
+    """View to expose the employee query cache counters to staff."""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'forbidden'}, status=403)
+    return JsonResponse(cache_stats())
+
+@query_budget(2)
+def metrics(request):
+    """View to expose per view request metrics in the Prometheus text format."""
+    token = settings.METRICS_TOKEN
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if token and request.META.get('HTTP_AUTHORIZATION') == 'Bearer %s' % token:
+        authorized = True
+    if not authorized:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,48 @@
+"""
+Gunicorn settings for production.
+
+    gunicorn -c gunicorn.conf.py
+
+serves hrmanage.asgi with uvicorn workers: each worker process handles
+any number of connections from its event loop, and runs the blocking part
+of the views in ASYNC_DB_THREADS threads. GUNICORN_APP=hrmanage.wsgi:application
+GUNICORN_WORKER_CLASS=gthread serves the WSGI application instead.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+LOCMEM_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+wsgi_app = os.environ.get('GUNICORN_APP', 'hrmanage.asgi:application')
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+# Writes to SQLite are serialized anyway; more processes only help the reads
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Sessions and cached users live in the cache, so the workers must share it:
+# set REDIS_URL to use Redis. Without it the default with more than one worker
+# is a FileBasedCache directory, whose sets get slower as it fills (see CACHES
+# in the settings), and a cache kept in the memory of each process is refused.
+if workers > 1:
+    if not os.environ.get('REDIS_URL'):
+        os.environ.setdefault('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache')
+    if os.environ.get('CACHE_BACKEND') == LOCMEM_CACHE_BACKEND:
+        raise RuntimeError('CACHE_BACKEND=%s is private to each process; %d workers need a cache they share.'
+                           % (LOCMEM_CACHE_BACKEND, workers))
+    # Request metrics of all the workers, added up by whichever one is scraped
+    os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'hrmanage-metrics'))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then, against slow leaks
+max_requests = 10000
+max_requests_jitter = 1000
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+
+
+def on_starting(server):
+    # The counters of a previous run of the server start again from zero
+    if os.environ.get('METRICS_DIR'):
+        shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
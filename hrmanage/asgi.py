@@ -0,0 +1,25 @@
+"""
+ASGI config for hrmanage project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+In production it is served by gunicorn with uvicorn workers, see
+``gunicorn.conf.py``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hrmanage.settings')
+
+application = get_asgi_application()
+
+if settings.DEBUG:
+    # What runserver does for WSGI
+    from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+
+    application = ASGIStaticFilesHandler(application)
@@ -23,7 +23,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = '5x6v=ff+5iy@$y^hpqlztn(o4c-b(8&4-y%0u3czo=a-r=pc9#'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
 
 ALLOWED_HOSTS = ['d1b65c9a9bfa4f19a83f9a74dd7af63f.vfs.cloud9.eu-west-1.amazonaws.com', '*']
 
@@ -41,11 +41,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'employees.middleware.StaticFilesMiddleware',
+    'employees.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'employees.middleware.ReplicaRoutingMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'employees.middleware.UserProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -54,10 +58,17 @@ ROOT_URLCONF = 'hrmanage.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'employees.template_backends.InstrumentedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Templates are compiled once per process; runserver's autoreloader
+            # resets the cache when a template changes.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -70,17 +81,206 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'hrmanage.wsgi.application'
 
+# Served by `gunicorn -c gunicorn.conf.py` (uvicorn workers, see that file).
+ASGI_APPLICATION = 'hrmanage.asgi.application'
+
+# Threads per process running the blocking work of async views (see
+# employees.offload); also the most database connections they open.
+ASYNC_DB_THREADS = int(os.environ.get('ASYNC_DB_THREADS', 8))
+
+
+# Request metrics
+# Per view query counts and timings are served in the Prometheus format at
+# /metrics/ to staff users, or to scrapers sending "Authorization: Bearer
+# <METRICS_TOKEN>". Views declare query budgets with employees.metrics.query_budget;
+# going over one is logged, or raises when QUERY_BUDGETS_ENFORCED is on.
+# The totals are kept per process; with METRICS_DIR set every process writes
+# them there at most every METRICS_FLUSH_SECONDS and /metrics/ adds up those
+# of all processes, so any worker can be scraped (gunicorn.conf.py sets it
+# when it runs more than one).
+
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') == '1'
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 1))
+
+QUERY_BUDGETS_ENFORCED = os.environ.get('QUERY_BUDGETS_ENFORCED', '0') == '1'
+
+# Runs the tests with QUERY_BUDGETS_ENFORCED on
+TEST_RUNNER = 'employees.test_runner.QueryBudgetTestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
+# hrmanage.sqlite is the stock SQLite backend plus the pragmas and
+# transaction_mode options. WAL lets readers run next to the single writer
+# and, with synchronous=NORMAL, only fsyncs on checkpoints; busy_timeout
+# (milliseconds) together with IMMEDIATE transactions makes concurrent
+# writers queue instead of failing with "database is locked". Set any
+# SQLITE_* variable to an empty string to keep SQLite's default.
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'ENGINE': 'hrmanage.sqlite',
+        'NAME': os.environ.get('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+        'OPTIONS': {
+            'transaction_mode': os.environ.get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+            'pragmas': {
+                'busy_timeout': os.environ.get('SQLITE_BUSY_TIMEOUT', '5000'),
+                'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'wal'),
+                'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'normal'),
+                'mmap_size': os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)),
+                'cache_size': os.environ.get('SQLITE_CACHE_SIZE', '-20000'),
+            },
+        },
+        # Seconds a connection is kept open between requests; 0 closes it
+        # after every request, None keeps it forever.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'TEST': {
+            # A file rather than the shared-cache in-memory database, so that
+            # concurrent connections in tests wait for locks like in production
+            'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+        },
+    }
+}
+
+# Read replica. Point DB_REPLICA_NAME at a second SQLite file to serve GET
+# requests from it; locally `manage.py sync_replica --interval 5` keeps it in
+# sync. A session that wrote reads from default for REPLICA_PIN_SECONDS.
+
+if os.environ.get('DB_REPLICA_NAME'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        NAME=os.environ['DB_REPLICA_NAME'],
+        TEST={'MIRROR': 'default'},
+    )
+
+DATABASE_ROUTERS = ['employees.routers.PrimaryReplicaRouter']
+
+REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 10))
+
+
+# Cache
+# Local memory by default, which is private to each process. REDIS_URL (e.g.
+# redis://cache:6379/0) selects Redis, shared by every process and the
+# recommended cache of a deployment with several workers. Without it
+# gunicorn.conf.py switches to
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache when it
+# runs more than one worker; set CACHE_BACKEND (and CACHE_LOCATION, by default
+# the cache directory of the project for FileBasedCache) to share the cache
+# between any other processes.
+#
+# FileBasedCache lists its directory on every set to decide whether to cull:
+# about 1.4 ms per set at 300 entries, 2.5 ms at 1000 and 16 ms at 5000. Its
+# MAX_ENTRIES defaults to FILE_CACHE_MAX_ENTRIES to keep that bounded, and
+# CACHE_HAS_CHEAP_SETS is off (as for DatabaseCache, which counts its table
+# on every set): the rows of the employee table are cached a
+# page at a time instead of one entry per row. Redis takes no MAX_ENTRIES;
+# bound it with its maxmemory setting instead.
+
+REDIS_URL = os.environ.get('REDIS_URL', '')
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', (
+    'django.core.cache.backends.redis.RedisCache' if REDIS_URL else 'django.core.cache.backends.locmem.LocMemCache'
+))
+FILE_CACHE = CACHE_BACKEND.endswith('.FileBasedCache')
+FILE_CACHE_MAX_ENTRIES = 1000
+CACHE_HAS_CHEAP_SETS = not FILE_CACHE and not CACHE_BACKEND.endswith('.DatabaseCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('CACHE_LOCATION', (
+            REDIS_URL if CACHE_BACKEND.endswith('.RedisCache')
+            else os.path.join(BASE_DIR, 'cache') if FILE_CACHE else 'hrmanage'
+        )),
+        'OPTIONS': {} if CACHE_BACKEND.endswith('.RedisCache') else {
+            # Room for the rendered rows of the employee table next to the cached pages
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', FILE_CACHE_MAX_ENTRIES if FILE_CACHE else 20000)),
+        },
     }
 }
 
+# Seconds a cached employee list page or detail record is kept; entries are
+# also invalidated as soon as any Employee is written.
+EMPLOYEE_CACHE_TIMEOUT = int(os.environ.get('EMPLOYEE_CACHE_TIMEOUT', 600))
+
+# Seconds a rendered row of the employee table is kept. Rows are keyed on the
+# employee's last update, so a long timeout never serves a stale row.
+EMPLOYEE_ROW_CACHE_TIMEOUT = int(os.environ.get('EMPLOYEE_ROW_CACHE_TIMEOUT', 86400))
+
+
+# Employees read, computed and written per transaction by run_payroll
+# (see employees.payroll).
+PAYROLL_CHUNK_SIZE = int(os.environ.get('PAYROLL_CHUNK_SIZE', 10000))
+
+
+# Rows the employee admin counts at most when the number of matches cannot be
+# read from the summary tables; only that many rows can be paged through.
+# 0 counts every row.
+ADMIN_COUNT_LIMIT = int(os.environ.get('ADMIN_COUNT_LIMIT', 10000))
+
+
+# Background jobs
+# Run by `manage.py run_workers --processes N`. Uploads and exports handled by
+# jobs are kept in JOB_FILES_DIR. A failed job is retried after
+# JOB_RETRY_BACKOFF_SECONDS, doubled at each attempt; a running job that has
+# not reported progress for JOB_STALE_SECONDS is requeued. Imports larger than
+# JOB_INLINE_IMPORT_MAX_BYTES and bulk actions on more than
+# JOB_INLINE_BULK_MAX_ROWS employees run as jobs instead of in the request.
+
+JOB_FILES_DIR = os.environ.get('JOB_FILES_DIR', os.path.join(BASE_DIR, 'job_files'))
+JOB_RETRY_BACKOFF_SECONDS = int(os.environ.get('JOB_RETRY_BACKOFF_SECONDS', 30))
+JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', 900))
+JOB_INLINE_IMPORT_MAX_BYTES = int(os.environ.get('JOB_INLINE_IMPORT_MAX_BYTES', 256 * 1024))
+JOB_INLINE_BULK_MAX_ROWS = int(os.environ.get('JOB_INLINE_BULK_MAX_ROWS', 1000))
+
+
+# Sessions and authentication
+# With a cache shared by every process, cached_db sessions are read from the
+# cache and written through to the database, so an authenticated request
+# usually runs no session query, and CachedModelBackend likewise serves the
+# user of a session from the cache for USER_CACHE_TIMEOUT seconds
+# (invalidated on save). With the local memory cache a logout, deactivation
+# or password change would only reach the cache of the process handling it,
+# so sessions and users are read from the database instead.
+# SESSION_ENGINE=django.contrib.sessions.backends.signed_cookies keeps the
+# session in the cookie. Idle job workers prune expired sessions every
+# SESSION_PRUNE_INTERVAL seconds (0 disables it; `manage.py prune_sessions`
+# does it by hand), in transactions of SESSION_PRUNE_BATCH_SIZE rows.
+
+CACHE_IS_SHARED = not CACHE_BACKEND.endswith('.LocMemCache')
+
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', (
+    'django.contrib.sessions.backends.cached_db' if CACHE_IS_SHARED else 'django.contrib.sessions.backends.db'
+))
+SESSION_PRUNE_INTERVAL = int(os.environ.get('SESSION_PRUNE_INTERVAL', 3600))
+SESSION_PRUNE_BATCH_SIZE = int(os.environ.get('SESSION_PRUNE_BATCH_SIZE', 500))
+
+AUTHENTICATION_BACKENDS = [
+    'employees.backends.CachedModelBackend' if CACHE_IS_SHARED else 'django.contrib.auth.backends.ModelBackend'
+]
+
+# Query budgets count the queries of a view with sessions and users cached;
+# this many more are allowed per request when they are read from the database.
+QUERY_BUDGET_AUTH_QUERIES = int(os.environ.get('QUERY_BUDGET_AUTH_QUERIES', 0 if CACHE_IS_SHARED else 2))
+USER_CACHE_TIMEOUT = int(os.environ.get('USER_CACHE_TIMEOUT', 300))
+
+# PBKDF2 iterations of new password hashes; 0 keeps Django's default. Existing
+# hashes are rehashed at the next login. `manage.py benchmark_login` reports
+# the logins per second of a given count.
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 0))
+
+PASSWORD_HASHERS = [
+    'employees.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -110,8 +310,6 @@ TIME_ZONE = 'UTC'
 
 USE_I18N = True
 
-USE_L10N = True
-
 USE_TZ = True
 
 
@@ -122,6 +320,19 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'employees/static'),
 ]
+# collectstatic writes the files here under hashed names, with gzip and
+# Brotli copies; StaticFilesMiddleware serves them when DEBUG is off, as in
+# the Docker image (see employees.staticfiles). Hashed names are cached by
+# browsers for a year, other files for STATIC_MAX_AGE seconds.
+STATIC_ROOT = os.environ.get('STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 60))
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'employees.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+
+# Seconds a resolved UserProfile stays cached (invalidated on profile save/delete).
+USER_PROFILE_CACHE_TIMEOUT = int(os.environ.get('USER_PROFILE_CACHE_TIMEOUT', 300))
 
 LOGIN_URL = 'employees:login'
 LOGIN_REDIRECT_URL = 'employees:employee_list'
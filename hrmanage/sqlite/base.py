@@ -0,0 +1,64 @@
+"""
+SQLite backend with per-connection tuning.
+
+Accepts two extra OPTIONS on top of the ones of the stock backend:
+
+``pragmas``
+    A dict of ``PRAGMA name = value`` statements run on every new
+    connection. Empty values are skipped.
+``transaction_mode``
+    ``DEFERRED``, ``IMMEDIATE`` or ``EXCLUSIVE``; how ``atomic()`` blocks
+    begin. ``IMMEDIATE`` takes the write lock up front, so a transaction
+    waits for ``busy_timeout`` instead of failing with "database is locked"
+    when SQLite cannot upgrade a read lock (which also happens for writes
+    that go through the full-text search triggers).
+"""
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+PRAGMA_NAME = re.compile(r'^[a-z_]+$')
+PRAGMA_VALUE = re.compile(r'^-?\w+$')
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+# What SQLite does when nothing is configured.
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'delete',
+    'synchronous': 'full',
+    'mmap_size': 0,
+    'cache_size': -2000,
+}
+
+
+def apply_pragmas(connection, pragmas):
+    """Run ``PRAGMA name = value`` on a raw sqlite3 connection for each item of ``pragmas``."""
+    for name, value in pragmas.items():
+        if value is None or value == '':
+            continue
+        value = str(value)
+        if not PRAGMA_NAME.match(name) or not PRAGMA_VALUE.match(value):
+            raise ImproperlyConfigured('Invalid SQLite pragma: %s = %s' % (name, value))
+        # Pragmas such as journal_mode return a row; an unread cursor would
+        # keep a read transaction (and a stale WAL snapshot) open.
+        connection.execute('PRAGMA %s = %s' % (name, value)).close()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        mode = (params.pop('transaction_mode', None) or 'DEFERRED').upper()
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured('Invalid SQLite transaction_mode: %s' % mode)
+        self.transaction_mode = mode
+        return params
+
+    def init_connection_state(self):
+        super().init_connection_state()
+        apply_pragmas(self.connection, self.pragmas)
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN %s' % self.transaction_mode)